@@ -0,0 +1,27 @@
+# the pipeline modules are loaded from the entry of pipeline, as the app does, to resolve their circular imports
+import watchmen.pipeline.index  # noqa: F401
+import pytest
+
+from watchmen.common.cache.cache_manage import cacheman, TOPIC_BY_ID, TOPIC_BY_NAME, PIPELINE_PLAN_BY_ID
+from watchmen.topic.topic import Topic
+
+
+@pytest.fixture
+def topics():
+    """
+    register topics to the schema caches, so they are found without storage
+    """
+
+    def register(*topic_list: dict) -> list:
+        result = []
+        for topic_dict in topic_list:
+            topic = Topic.parse_obj(topic_dict)
+            cacheman[TOPIC_BY_ID].set(topic.topicId, topic)
+            cacheman[TOPIC_BY_NAME].set(topic.name, topic)
+            result.append(topic)
+        return result
+
+    yield register
+    cacheman[TOPIC_BY_ID].clear()
+    cacheman[TOPIC_BY_NAME].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+from collections import namedtuple
+
+from watchmen.connector.kafka.kafka_connector import KafkaBatchConsumer
+from watchmen.raw_data.service.import_raw_data import build_batch_status, FAILED, RECEIVED
+
+TopicPartition = namedtuple("TopicPartition", ["topic", "partition"])
+Record = namedtuple("Record", ["offset", "value"])
+
+ORDERS_0 = TopicPartition("orders", 0)
+ORDERS_1 = TopicPartition("orders", 1)
+
+
+class FakeBroker:
+    """
+    the records of partitions are fetched from the position of consumer, which is moved by fetch and seek
+    """
+
+    def __init__(self, records_by_partition: dict):
+        self.records = {tp: [Record(offset, json.dumps({"code": "order", "data": value}) if value is not None
+                                    else "not json")
+                             for offset, value in enumerate(values)]
+                        for tp, values in records_by_partition.items()}
+        self.positions = {tp: 0 for tp in self.records}
+        self.committed = {}
+
+    async def getmany(self, timeout_ms: int = 0, max_records: int = None):
+        result = {}
+        for tp, records in self.records.items():
+            batch = records[self.positions[tp]:self.positions[tp] + max_records]
+            if batch:
+                result[tp] = batch
+                self.positions[tp] = batch[-1].offset + 1
+        return result
+
+    async def commit(self, offsets: dict):
+        self.committed.update(offsets)
+
+    def seek(self, tp, offset: int):
+        self.positions[tp] = offset
+
+    def highwater(self, tp):
+        return len(self.records[tp])
+
+
+class FakeIngest:
+    """
+    the events ingested by partition of the order no, the ingestion fails for the first fail_times calls
+    which have the failing no
+    """
+
+    def __init__(self, failing_no=None, fail_times: int = 0, rejected_no=None):
+        self.failing_no = failing_no
+        self.fail_times = fail_times
+        self.rejected_no = rejected_no
+        self.calls = []
+
+    async def __call__(self, topic_events: list, current_user) -> list:
+        numbers = [topic_event.data["no"] for _, topic_event in topic_events]
+        self.calls.append(numbers)
+        # let the other partitions run, the order in partition is kept anyway
+        await asyncio.sleep(0)
+        if self.failing_no in numbers and self.fail_times > 0:
+            self.fail_times = self.fail_times - 1
+            raise ValueError("ingest failed")
+        return [build_batch_status(index, FAILED if topic_event.data["no"] == self.rejected_no else RECEIVED)
+                for index, topic_event in topic_events]
+
+
+def build_consumer(broker: FakeBroker, ingest: FakeIngest, max_records: int = 2) -> KafkaBatchConsumer:
+    return KafkaBatchConsumer(broker, max_records=max_records, timeout_ms=0, max_in_flight=2, retry_backoff=0,
+                              load_user=lambda: None, ingest=ingest)
+
+
+def poll(consumer: KafkaBatchConsumer, times: int):
+    async def run():
+        for _ in range(times):
+            await consumer.poll()
+
+    asyncio.run(run())
+
+
+def test_records_of_partition_are_ingested_in_order():
+    broker = FakeBroker({ORDERS_0: [{"no": 1}, {"no": 2}, {"no": 3}], ORDERS_1: [{"no": 11}, {"no": 12}]})
+    ingest = FakeIngest()
+    consumer = build_consumer(broker, ingest)
+    poll(consumer, 3)
+
+    in_partition_0 = [no for numbers in ingest.calls for no in numbers if no < 10]
+    in_partition_1 = [no for numbers in ingest.calls for no in numbers if no > 10]
+    assert in_partition_0 == [1, 2, 3]
+    assert in_partition_1 == [11, 12]
+    assert broker.committed == {ORDERS_0: 3, ORDERS_1: 2}
+
+
+def test_offset_is_committed_after_batch_succeeds_and_failed_batch_is_fetched_again():
+    broker = FakeBroker({ORDERS_0: [{"no": 1}, {"no": 2}, {"no": 3}, {"no": 4}], ORDERS_1: [{"no": 11}]})
+    ingest = FakeIngest(failing_no=3, fail_times=1)
+    consumer = build_consumer(broker, ingest)
+
+    poll(consumer, 1)
+    assert broker.committed == {ORDERS_0: 2, ORDERS_1: 1}
+    # the batch of 3 and 4 fails, nothing is committed for it and the partition is sought back
+    poll(consumer, 1)
+    assert broker.committed == {ORDERS_0: 2, ORDERS_1: 1}
+    assert broker.positions[ORDERS_0] == 2
+    poll(consumer, 1)
+    assert broker.committed == {ORDERS_0: 4, ORDERS_1: 1}
+    assert ingest.calls == [[1, 2], [11], [3, 4], [3, 4]]
+    assert consumer.partitions[ORDERS_0]["retried"] == 1
+
+
+def test_failed_records_are_skipped_and_lag_is_reported():
+    broker = FakeBroker({ORDERS_0: [{"no": 1}, None, {"no": 3}, {"no": 4}, {"no": 5}]})
+    ingest = FakeIngest(rejected_no=3)
+    consumer = build_consumer(broker, ingest, max_records=3)
+
+    poll(consumer, 1)
+    stats = consumer.stats()["orders-0"]
+    # the record which is not json and the record rejected by ingestion are skipped, the offset moves on
+    assert stats == {"position": 3, "processed": 1, "failed": 2, "retried": 0, "highwater": 5, "lag": 2}
+    assert broker.committed == {ORDERS_0: 3}
+
+    poll(consumer, 1)
+    assert consumer.stats()["orders-0"]["lag"] == 0
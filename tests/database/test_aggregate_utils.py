@@ -0,0 +1,35 @@
+from watchmen.database.storage.utils.aggregate_utils import apply_aggregate, merge_avg, merge_delta, revert_aggregate
+
+
+def test_apply_aggregate_increases_sum_and_count():
+    old = {"id_": "1", "total": 10, "orders": 2, "status": "open"}
+    one = {"total": {"_sum": 5}, "orders": {"_count": 1}, "status": "paid"}
+    new = apply_aggregate(old, one)
+
+    assert new == {"id_": "1", "total": 15, "orders": 3, "status": "paid"}
+    # reverted by the same values
+    assert revert_aggregate(new, one) == {**old, "status": "paid"}
+
+
+def test_apply_aggregate_to_inserted_row():
+    assert apply_aggregate({}, {"total": {"_sum": 5}, "orders": {"_count": 1}}) == {"total": 5, "orders": 1}
+
+
+def test_merge_avg_weights_by_count_of_averaged_values():
+    first = merge_avg({}, {"price": {"_avg": 10}})
+    assert first["price"] == 10
+    assert first["aggregate_assist_"] == {"avg_count": {"price": 1}}
+
+    second = merge_avg(first, {"price": {"_avg": 20}})
+    assert second["price"] == 15
+    # the average merged from two values weighs two
+    third = merge_avg(second, {"price": {"_avg": 30, "_avg_count": 2}})
+    assert third["price"] == 22.5
+    assert third["aggregate_assist_"] == {"avg_count": {"price": 4}}
+
+
+def test_merge_delta_of_same_row():
+    merged = merge_delta({"total": {"_sum": 5}, "price": {"_avg": 10}, "status": "open"},
+                         {"total": {"_sum": 3}, "price": {"_avg": 40}, "status": "paid"})
+
+    assert merged == {"total": {"_sum": 8}, "price": {"_avg": 25, "_avg_count": 2}, "status": "paid"}
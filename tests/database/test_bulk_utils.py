@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+
+from sqlalchemy.exc import DBAPIError
+
+from watchmen.database.storage.utils.bulk_utils import chunk_rows, insert_in_chunks
+
+
+class FakeEngine:
+    """
+    the rows with "bad" are rejected by database, a rejected chunk is rolled back as a whole
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.executions = 0
+
+    @contextmanager
+    def begin(self):
+        pending = []
+        yield FakeConnection(self, pending)
+        self.rows.extend(pending)
+
+    def execute(self, pending: list, values):
+        self.executions = self.executions + 1
+        rows = values if isinstance(values, list) else [values]
+        for row in rows:
+            if row.get("bad"):
+                raise DBAPIError("insert", row, ValueError("row {0} is rejected".format(row["no"])))
+        pending.extend(rows)
+
+
+class FakeConnection:
+    def __init__(self, engine: FakeEngine, pending: list):
+        self.engine = engine
+        self.pending = pending
+
+    def execute(self, stmt, values):
+        self.engine.execute(self.pending, values)
+
+
+def test_rows_are_chunked_by_size_and_bytes():
+    rows = [{"no": index, "text": "x" * 10} for index in range(5)]
+    assert [(offset, len(chunk)) for offset, chunk in chunk_rows(rows, 2, None)] == [(0, 2), (2, 2), (4, 1)]
+    # each row is about 18 bytes, two rows exceed 30 bytes
+    assert [(offset, len(chunk)) for offset, chunk in chunk_rows(rows, 10, 30)] == [(index, 1) for index in range(5)]
+    # a row larger than chunk bytes is sent in its own chunk
+    assert [len(chunk) for _, chunk in chunk_rows([{"text": "x" * 100}, {"no": 1}], 10, 30)] == [1, 1]
+
+
+def test_failed_rows_are_reported_by_index_and_others_are_kept():
+    engine = FakeEngine()
+    rows = [{"no": index, "bad": index in (3, 6)} for index in range(8)]
+    result = insert_in_chunks(engine, "insert", rows, 3, None)
+
+    assert result["inserted"] == 6
+    assert result["failed"] == [{"index": 3, "error": "row 3 is rejected"}, {"index": 6, "error": "row 6 is rejected"}]
+    assert sorted(row["no"] for row in engine.rows) == [0, 1, 2, 4, 5, 7]
+    # the first chunk is inserted at once, the failed chunks are retried row by row
+    assert engine.executions == 1 + (1 + 3) + (1 + 2)
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from bson import ObjectId
+
+from watchmen.common.pagination import Pagination
+from watchmen.database.storage.utils.keyset_utils import build_keyset, build_next_page_token, decode_page_token, \
+    encode_page_token, is_approximate_count, is_keyset_page
+
+
+def test_keyset_ends_with_primary_key():
+    assert build_keyset([("name", "desc")], "id_") == [("name", "desc"), ("id_", "asc")]
+    assert build_keyset([("id_", "desc")], "id_") == [("id_", "desc")]
+    assert build_keyset(None, "_id") == [("_id", "asc")]
+
+
+def test_page_token_keeps_types_of_values():
+    values = [datetime(2021, 3, 15, 10, 20, 30), date(2021, 3, 15), Decimal("12.50"), ObjectId(), "name", 3]
+    assert decode_page_token(encode_page_token(values, 4)) == (values, 4)
+
+
+def test_invalid_page_token_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_page_token("not a token")
+
+
+def test_next_page_token_of_full_page_only():
+    keyset = [("name", "asc"), ("id_", "asc")]
+    last_row = {"name": "b", "id_": "2"}
+    token = build_next_page_token(last_row, 10, keyset, 10, 1)
+    assert decode_page_token(token) == (["b", "2"], 1)
+    # the last page, or the keyset value which cannot be compared
+    assert build_next_page_token(last_row, 9, keyset, 10, 1) is None
+    assert build_next_page_token({"name": None, "id_": "2"}, 10, keyset, 10, 1) is None
+
+
+def test_pages_by_token_are_counted_approximately():
+    first_page = Pagination(pageSize=10, pageNumber=1)
+    next_page = Pagination(pageSize=10, pageToken=encode_page_token(["b", "2"], 1))
+    assert not is_keyset_page(first_page) and not is_approximate_count(first_page)
+    assert is_keyset_page(next_page) and is_approximate_count(next_page)
+    assert is_approximate_count(Pagination(pageSize=10, pageNumber=1, approximateCount=True))
@@ -0,0 +1,97 @@
+import pytest
+
+import watchmen.pipeline.index as pipeline_index_module
+import watchmen.pipeline.storage.aggregate_buffer as aggregate_buffer_module
+from watchmen.pipeline.model.trigger_data import TriggerData
+from watchmen.pipeline.model.trigger_type import TriggerType
+from watchmen.pipeline.storage.aggregate_buffer import AggregateBuffer
+
+
+def fake_storage(monkeypatch, failures: int = 0) -> dict:
+    """
+    the first failures writes raise error, the written mapping results and triggered rows are recorded
+    """
+    calls = {"written": [], "failed": 0, "triggered": []}
+
+    def merge_aggregate_topic_data(topic_name, where_, mapping_result, pipeline_uid):
+        if calls["failed"] < failures:
+            calls["failed"] = calls["failed"] + 1
+            raise ValueError("write failed")
+        calls["written"].append((topic_name, where_, mapping_result))
+        return TriggerData(topicName=topic_name, triggerType=TriggerType.update,
+                           data={"old": None, "new": mapping_result})
+
+    def trigger_pipeline(topic_name, instance, trigger_type, current_user=None):
+        calls["triggered"].append((topic_name, instance["new"]))
+
+    monkeypatch.setattr(aggregate_buffer_module, "merge_aggregate_topic_data", merge_aggregate_topic_data)
+    monkeypatch.setattr(pipeline_index_module, "trigger_pipeline", trigger_pipeline)
+    return calls
+
+
+def test_writes_to_same_row_are_coalesced(monkeypatch):
+    calls = fake_storage(monkeypatch)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=3, max_rows=10)
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 1}}, "p1")
+    buffer.add("sales", {"region": "west"}, {"total": {"_sum": 5}}, "p1")
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 2}}, "p1")
+    assert calls["written"] == []
+
+    # the third merge of east reaches max merges, it is written by the caller
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 3}}, "p1")
+    assert calls["written"] == [("sales", {"region": "east"}, {"total": {"_sum": 6}})]
+    assert calls["triggered"] == [("sales", {"total": {"_sum": 6}})]
+
+    buffer.flush()
+    assert calls["written"][1:] == [("sales", {"region": "west"}, {"total": {"_sum": 5}})]
+    assert not buffer.pending
+
+
+def test_oldest_row_is_written_when_buffer_is_full(monkeypatch):
+    calls = fake_storage(monkeypatch)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=10, max_rows=2)
+    for region in ["east", "west", "north"]:
+        buffer.add("sales", {"region": region}, {"total": {"_sum": 1}}, "p1")
+    assert [where_ for _, where_, _ in calls["written"]] == [{"region": "east"}]
+    assert len(buffer.pending) == 2
+
+
+def test_failed_write_is_requeued_and_merged(monkeypatch):
+    calls = fake_storage(monkeypatch, failures=1)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=10, max_rows=10)
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 1}}, "p1")
+    buffer.flush()
+    assert calls["written"] == []
+    assert len(buffer.pending) == 1
+
+    # the delta added after the failure is merged on the failed one, nothing is lost
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 2}}, "p1")
+    buffer.flush()
+    assert calls["written"] == [("sales", {"region": "east"}, {"total": {"_sum": 3}})]
+    assert not buffer.pending
+
+
+def test_error_is_raised_when_attempts_are_exhausted(monkeypatch):
+    calls = fake_storage(monkeypatch, failures=10)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=10, max_rows=10, max_attempts=2)
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 1}}, "p1")
+    buffer.flush()
+    with pytest.raises(RuntimeError, match="after 2 attempts"):
+        buffer.flush()
+    assert calls["failed"] == 2
+    assert not buffer.pending
+
+
+def test_shutdown_flushes_until_written_or_exhausted(monkeypatch):
+    calls = fake_storage(monkeypatch, failures=1)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=10, max_rows=10)
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 1}}, "p1")
+    buffer.shutdown()
+    assert calls["written"] == [("sales", {"region": "east"}, {"total": {"_sum": 1}})]
+
+    calls = fake_storage(monkeypatch, failures=10)
+    buffer = AggregateBuffer(flush_interval=60, max_merges=10, max_rows=10, max_attempts=3)
+    buffer.add("sales", {"region": "east"}, {"total": {"_sum": 1}}, "p1")
+    with pytest.raises(RuntimeError):
+        buffer.shutdown()
+    assert calls["failed"] == 3
@@ -0,0 +1,106 @@
+import pytest
+
+from watchmen.pipeline.core.case.model.parameter import Parameter, ParameterJoint
+from watchmen.pipeline.core.compiler.compile_parameter import compile_parameter, compile_parameter_joint
+from watchmen.pipeline.core.compiler.compile_pipeline import clear_pipeline_plans, compile_action, compile_stage, \
+    get_pipeline_plan
+from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter, parse_parameter_joint
+from watchmen.pipeline.model.pipeline import Pipeline, Stage, UnitAction
+
+'''
+the plan compiled once for a pipeline should evaluate the parameters and conditions as the interpreter does
+'''
+
+ORDER_TOPIC = {"topicId": "order", "name": "order", "type": "distinct", "factors": [
+    {"factorId": "amount", "name": "amount", "type": "number"},
+    {"factorId": "status", "name": "status", "type": "text"},
+    {"factorId": "created", "name": "created", "type": "datetime"}]}
+
+INSTANCES = [
+    {"amount": 10, "status": "paid", "created": "2021-03-15 10:20:30"},
+    {"amount": "25", "status": "", "created": "2020-12-31"},
+    {"amount": None, "status": None, "created": "2019-07-04"},
+    {"amount": 0, "status": "open", "created": "2022-01-01"}]
+
+VARIABLES = {"limit": 20, "statuses": "paid,open", "customer": {"name": "tom"}}
+
+
+def topic(factor_id: str) -> dict:
+    return {"kind": "topic", "topicId": "order", "factorId": factor_id}
+
+
+def constant(value: str) -> dict:
+    return {"kind": "constant", "value": value}
+
+
+def expression(left: dict, operator: str, right: dict = None) -> dict:
+    return {"left": left, "operator": operator, "right": right or constant("")}
+
+
+def evaluate(func):
+    try:
+        return repr(func())
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("parameter", [
+    topic("amount"), topic("created"), constant("{limit}"), constant("{customer.name}"), constant("abc"),
+    {"kind": "computed", "type": "add", "parameters": [topic("amount"), constant("{limit}")]},
+    {"kind": "computed", "type": "year-of", "parameters": [topic("created")]},
+    {"kind": "computed", "type": "month-of", "parameters": [topic("created")]}])
+def test_compiled_parameter_equals_interpreted(parameter, topics):
+    topics(ORDER_TOPIC)
+    parameter_ = Parameter.parse_obj(parameter)
+    compiled = compile_parameter(parameter_)
+    for instance in INSTANCES:
+        assert evaluate(lambda: compiled(instance, VARIABLES)) == \
+               evaluate(lambda: parse_parameter(parameter_, instance, VARIABLES))
+
+
+@pytest.mark.parametrize("joint", [
+    {"jointType": "and", "filters": [expression(topic("amount"), "more", constant("{limit}")),
+                                     expression(topic("status"), "not-empty")]},
+    {"jointType": "or", "filters": [expression(topic("status"), "empty"),
+                                    expression(topic("status"), "in", constant("{statuses}"))]},
+    {"jointType": "and", "filters": [
+        expression(topic("amount"), "less-equals", constant("10")),
+        {"jointType": "or", "filters": [expression(topic("status"), "equals", constant("paid")),
+                                        expression(topic("status"), "not-equals", constant("open"))]}]}])
+def test_compiled_joint_equals_interpreted(joint, topics):
+    topics(ORDER_TOPIC)
+    joint_ = ParameterJoint.parse_obj(joint)
+    compiled = compile_parameter_joint(joint_)
+    for instance in INSTANCES:
+        assert evaluate(lambda: compiled(instance, VARIABLES)) == \
+               evaluate(lambda: parse_parameter_joint(joint_, instance, VARIABLES))
+
+
+def test_mappings_not_compiled_are_left_to_interpreter(topics):
+    topics(ORDER_TOPIC)
+    action = UnitAction.parse_obj({"actionId": "a1", "type": "insert-row", "topicId": "order", "mapping": [
+        {"factorId": "unknown", "arithmetic": "none", "source": topic("amount")}]})
+    action_plan = compile_action(action)
+    assert action_plan.module is not None
+    assert action_plan.mapping is None and action_plan.mapping_batch is None
+
+
+def copy_unit(name: str, variable_name: str, value: str) -> dict:
+    return {"unitId": name, "name": name, "do": [{"actionId": name, "type": "copy-to-memory",
+                                                  "variableName": variable_name, "source": constant(value)}]}
+
+
+def test_units_are_grouped_into_waves_by_variables():
+    stage = Stage.parse_obj({"stageId": "s1", "name": "s1", "units": [
+        copy_unit("a", "a", "1"), copy_unit("b", "b", "{a}"), copy_unit("c", "c", "3")]})
+    # "b" reads the variable written by "a"
+    assert compile_stage(stage).unit_waves == [[0, 2], [1]]
+
+
+def test_plan_is_cached_by_pipeline_id_until_cleared(topics):
+    pipeline = Pipeline.parse_obj({"pipelineId": "p1", "name": "p1", "topicId": "order", "stages": []})
+    plan = get_pipeline_plan(pipeline)
+    # another instance of the same pipeline, e.g. from the cache of pipelines by topic
+    assert get_pipeline_plan(Pipeline.parse_obj(pipeline.dict())) is plan
+    clear_pipeline_plans()
+    assert get_pipeline_plan(pipeline) is not plan
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import watchmen.pipeline.core.dispatch.dispatch_queue as dispatch_queue_module
+from watchmen.auth.user import User
+from watchmen.pipeline.core.dispatch.dispatch_queue import DispatchQueueFullError, PipelineDispatchQueue, SpillFile
+from watchmen.pipeline.model.trigger_type import TriggerType
+
+USER = User.parse_obj({"userId": "u1", "name": "tom", "tenantId": "t1"})
+
+
+def record_runs(monkeypatch) -> list:
+    runs = []
+
+    def trigger_pipeline_2(topic_name, instance, trigger_type, current_user=None):
+        runs.append((topic_name, [instance], trigger_type, current_user, False))
+
+    def trigger_pipeline_batch_2(topic_name, instances, trigger_type, current_user=None):
+        runs.append((topic_name, instances, trigger_type, current_user, True))
+
+    monkeypatch.setattr(dispatch_queue_module, "trigger_pipeline_2", trigger_pipeline_2)
+    monkeypatch.setattr(dispatch_queue_module, "trigger_pipeline_batch_2", trigger_pipeline_batch_2)
+    return runs
+
+
+def test_triggers_not_done_are_replayed_after_restart(monkeypatch, tmp_path):
+    spill_path = str(tmp_path / "dispatch.journal")
+    runs = record_runs(monkeypatch)
+    # no worker, the triggers are left in queue when process stops
+    stopped = PipelineDispatchQueue(0, 10, 0.1, spill_path)
+    stopped.start()
+    stopped.submit("order", [{"new": {"no": 1}, "old": None}], TriggerType.insert, USER)
+    stopped.submit("order", [{"new": {"no": 2}, "old": None}, {"new": {"no": 3}, "old": None}], TriggerType.insert,
+                   None, True)
+    stopped.shutdown(0.1)
+    assert runs == []
+
+    restarted = PipelineDispatchQueue(1, 10, 0.1, spill_path)
+    restarted.start()
+    restarted.shutdown(5)
+
+    assert runs == [("order", [{"new": {"no": 1}, "old": None}], TriggerType.insert, USER, False),
+                    ("order", [{"new": {"no": 2}, "old": None}, {"new": {"no": 3}, "old": None}],
+                     TriggerType.insert, None, True)]
+    assert restarted.stats()["processed"] == 2
+    # the seq goes on after the recovered ones, and the journal is truncated when the queue is drained
+    assert next(restarted.seq) == 3
+    assert SpillFile(spill_path).recover() == []
+
+
+def test_done_triggers_are_not_replayed(monkeypatch, tmp_path):
+    spill_path = str(tmp_path / "dispatch.journal")
+    runs = record_runs(monkeypatch)
+    dispatch = PipelineDispatchQueue(1, 10, 0.1, spill_path)
+    dispatch.start()
+    dispatch.submit("order", [{"new": {"no": 1}, "old": None}], TriggerType.insert)
+    dispatch.shutdown(5)
+    assert len(runs) == 1
+
+    assert SpillFile(spill_path).recover() == []
+
+
+def test_partial_line_of_journal_is_skipped(tmp_path):
+    spill_path = tmp_path / "dispatch.journal"
+    records = [{"seq": 1, "topic": "order", "instances": [], "type": "insert", "batch": False, "user": None},
+               {"seq": 2, "topic": "order", "instances": [], "type": "insert", "batch": False, "user": None}]
+    spill_path.write_text("\n".join([json.dumps(records[0]), json.dumps(records[1]), json.dumps({"ack": 1}),
+                                     '{"seq": 3, "topic": "ord']), encoding="utf-8")
+    spill_file = SpillFile(str(spill_path))
+    assert spill_file.recover() == [records[1]]
+    spill_file.close()
+
+
+def test_submit_is_rejected_when_queue_is_full(monkeypatch):
+    record_runs(monkeypatch)
+    dispatch = PipelineDispatchQueue(0, 1, 0.01)
+    dispatch.start()
+    dispatch.submit("order", [{"new": {"no": 1}, "old": None}], TriggerType.insert)
+    with pytest.raises(DispatchQueueFullError):
+        dispatch.submit("order", [{"new": {"no": 2}, "old": None}], TriggerType.insert)
+    with pytest.raises(DispatchQueueFullError):
+        dispatch.check_capacity()
+
+    stats = dispatch.stats()
+    assert stats["depth"] == 1 and stats["rejected"] == 2
+    # the rejected trigger is not pending
+    assert stats["topics"]["order"]["pending"] == 1
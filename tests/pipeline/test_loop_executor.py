@@ -0,0 +1,81 @@
+import watchmen.pipeline.storage.read_topic_data as read_topic_data_module
+import watchmen.pipeline.storage.write_topic_data as write_topic_data_module
+from watchmen.config.config import settings
+from watchmen.monitor.model.pipeline_monitor import StageRunStatus, UnitRunStatus
+from watchmen.pipeline.core.compiler.compile_pipeline import compile_unit
+from watchmen.pipeline.core.context.pipeline_context import PipelineContext
+from watchmen.pipeline.core.context.stage_context import StageContext
+from watchmen.pipeline.core.context.unit_context import UnitContext
+from watchmen.pipeline.core.worker.loop_executor import is_parallel_loop
+from watchmen.pipeline.core.worker.unit_worker import run_loop_in_chunks
+from watchmen.pipeline.model.pipeline import Pipeline, ProcessUnit
+
+SOURCE_TOPIC = {"topicId": "order", "name": "order", "type": "raw", "factors": [
+    {"factorId": "items", "name": "items", "type": "array"}]}
+PRODUCT_TOPIC = {"topicId": "product", "name": "product", "type": "distinct", "factors": [
+    {"factorId": "product-id", "name": "productId", "type": "text"},
+    {"factorId": "product-name", "name": "productName", "type": "text"}]}
+ITEM_TOPIC = {"topicId": "item", "name": "item", "type": "distinct", "factors": [
+    {"factorId": "item-product-id", "name": "productId", "type": "text"},
+    {"factorId": "item-product-name", "name": "productName", "type": "text"}]}
+
+
+def build_unit() -> ProcessUnit:
+    """
+    read the product of each item into variable "product", then insert the item with the name of product
+    """
+    return ProcessUnit.parse_obj({"unitId": "loop", "name": "loop", "loopVariableName": "items", "do": [
+        {"actionId": "read", "type": "read-row", "topicId": "product", "variableName": "product",
+         "by": {"jointType": "and", "filters": [
+             {"left": {"kind": "topic", "topicId": "product", "factorId": "product-id"}, "operator": "equals",
+              "right": {"kind": "constant", "value": "{items.productId}"}}]}},
+        {"actionId": "insert", "type": "insert-row", "topicId": "item", "mapping": [
+            {"factorId": "item-product-id", "arithmetic": "none",
+             "source": {"kind": "constant", "value": "{items.productId}"}},
+            {"factorId": "item-product-name", "arithmetic": "none",
+             "source": {"kind": "constant", "value": "{product.productName}"}}]}]})
+
+
+def find_product_id(where_) -> str:
+    if isinstance(where_, dict):
+        for key, value in where_.items():
+            if key == "productId":
+                return value["="] if isinstance(value, dict) else value
+            found = find_product_id(value)
+            if found is not None:
+                return found
+    elif isinstance(where_, list):
+        for item in where_:
+            found = find_product_id(item)
+            if found is not None:
+                return found
+    return None
+
+
+def test_loop_of_read_row_then_insert_row_reads_own_variable(monkeypatch, topics):
+    topics(SOURCE_TOPIC, PRODUCT_TOPIC, ITEM_TOPIC)
+    monkeypatch.setattr(settings, "PIPELINE_LOOP_PARALLEL_ON", True)
+    monkeypatch.setattr(settings, "PIPELINE_LOOP_MIN_CHUNK_SIZE", 2)
+    monkeypatch.setattr(read_topic_data_module, "topic_data_find_one",
+                        lambda where_, topic_name: {"productId": find_product_id(where_),
+                                                    "productName": "name of " + find_product_id(where_)})
+    inserted = []
+    monkeypatch.setattr(write_topic_data_module, "topic_data_insert_one",
+                        lambda one, topic_name: inserted.append(one))
+
+    unit_plan = compile_unit(build_unit())
+    values = [{"productId": "p{0}".format(index)} for index in range(40)]
+    # read-row writes variable "product", which is read by insert-row of the same element
+    assert not is_parallel_loop(unit_plan, values)
+
+    pipeline = Pipeline.parse_obj({"pipelineId": "loop", "name": "loop", "topicId": "order"})
+    pipeline_context = PipelineContext(pipeline, {"old": None, "new": {"items": values}})
+    pipeline_context.variables["items"] = values
+    pipeline_context.pipelineTopic = topics(SOURCE_TOPIC)[0]
+    unit_context = UnitContext(StageContext(pipeline_context, None, StageRunStatus()), unit_plan.unit,
+                               UnitRunStatus())
+    run_loop_in_chunks("items", unit_context, unit_plan)
+
+    assert [(row["productId"], row["productName"]) for row in inserted] == \
+           [(value["productId"], "name of " + value["productId"]) for value in values]
+    assert len(pipeline_context.triggerBuffer) == len(values)
@@ -0,0 +1,44 @@
+# the pipeline modules are loaded from the entry of pipeline, as the app does, to resolve their circular imports
+import watchmen.pipeline.index  # noqa: F401
+from watchmen.config.config import settings
+from watchmen.monitor.model.pipeline_monitor import PipelineRunStatus
+from watchmen.pipeline.core.compiler.compile_pipeline import compile_pipeline
+from watchmen.pipeline.core.context.pipeline_context import PipelineContext
+from watchmen.pipeline.core.worker.parallel_executor import is_parallel_run
+from watchmen.pipeline.core.worker.pipeline_worker import run_stages_parallel
+from watchmen.pipeline.model.pipeline import Pipeline
+
+
+def build_copy_stage(name: str, variable_name: str, value: str) -> dict:
+    return {"stageId": name, "name": name, "units": [{"unitId": name, "name": name, "do": [
+        {"actionId": name, "type": "copy-to-memory", "variableName": variable_name,
+         "source": {"kind": "constant", "value": value}}]}]}
+
+
+def build_pipeline() -> Pipeline:
+    """
+    "copy-a" and "copy-c" are independent, "copy-b" reads the variable written by "copy-a"
+    """
+    return Pipeline.parse_obj({"pipelineId": "parallel-stages", "name": "parallel-stages", "enabled": True,
+                               "stages": [build_copy_stage("copy-a", "a", "100"),
+                                          build_copy_stage("copy-c", "c", "300"),
+                                          build_copy_stage("copy-b", "b", "{a}")]})
+
+
+def test_dependent_stages_see_variables_of_earlier_wave(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_PARALLEL_ON", True)
+    pipeline = build_pipeline()
+    plan = compile_pipeline(pipeline)
+    assert plan.stage_waves == [[0, 1], [2]]
+    assert is_parallel_run(plan.stage_waves)
+
+    pipeline_context = PipelineContext(pipeline, {"old": None, "new": {}})
+    pipeline_context.pipelineTopic = None
+    pipeline_context.pipelineStatus = PipelineRunStatus(pipelineId=pipeline.pipelineId)
+    run_stages_parallel(pipeline_context, plan)
+
+    variables = pipeline_context.variables
+    assert variables["a"] is not None
+    assert variables["c"] is not None
+    assert variables["b"] == variables["a"]
+    assert [stage.name for stage in pipeline_context.pipelineStatus.stages] == ["copy-a", "copy-c", "copy-b"]
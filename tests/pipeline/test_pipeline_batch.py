@@ -0,0 +1,106 @@
+import watchmen.pipeline.core.worker.pipeline_worker as pipeline_worker_module
+import watchmen.pipeline.storage.read_topic_data as read_topic_data_module
+import watchmen.pipeline.storage.topic_data_batch as topic_data_batch_module
+import watchmen.pipeline.storage.write_topic_data as write_topic_data_module
+from watchmen.pipeline.core.context.pipeline_context import PipelineContext
+from watchmen.pipeline.core.worker.pipeline_worker import run_pipeline, run_pipeline_batch
+from watchmen.pipeline.model.pipeline import Pipeline
+from watchmen.pipeline.utils.constants import FINISHED
+
+ORDER_TOPIC = {"topicId": "order", "name": "order", "type": "distinct", "factors": [
+    {"factorId": "order-no", "name": "orderNo", "type": "text"},
+    {"factorId": "order-product-id", "name": "productId", "type": "text"}]}
+PRODUCT_TOPIC = {"topicId": "product", "name": "product", "type": "distinct", "factors": [
+    {"factorId": "product-id", "name": "productId", "type": "text"},
+    {"factorId": "product-name", "name": "productName", "type": "text"}]}
+ITEM_TOPIC = {"topicId": "item", "name": "item", "type": "distinct", "factors": [
+    {"factorId": "item-order-no", "name": "orderNo", "type": "text"},
+    {"factorId": "item-product-name", "name": "productName", "type": "text"}]}
+
+PRODUCTS = {"p1": {"productId": "p1", "productName": "apple"}, "p2": {"productId": "p2", "productName": "pear"}}
+
+
+def build_pipeline() -> Pipeline:
+    """
+    read the product of order into variable "product", then insert the item of order with the name of product
+    """
+    return Pipeline.parse_obj({"pipelineId": "batch", "name": "batch", "topicId": "order", "type": "insert",
+                               "enabled": True, "stages": [{"stageId": "s1", "name": "s1", "units": [
+            {"unitId": "u1", "name": "u1", "do": [
+                {"actionId": "read", "type": "read-row", "topicId": "product", "variableName": "product",
+                 "by": {"jointType": "and", "filters": [
+                     {"left": {"kind": "topic", "topicId": "product", "factorId": "product-id"},
+                      "operator": "equals",
+                      "right": {"kind": "topic", "topicId": "order", "factorId": "order-product-id"}}]}},
+                {"actionId": "insert", "type": "insert-row", "topicId": "item", "mapping": [
+                    {"factorId": "item-order-no", "arithmetic": "none",
+                     "source": {"kind": "topic", "topicId": "order", "factorId": "order-no"}},
+                    {"factorId": "item-product-name", "arithmetic": "none",
+                     "source": {"kind": "constant", "value": "{product.productName}"}}]}]}]}]})
+
+
+def product_of(where_) -> dict:
+    condition = topic_data_batch_module.parse_equals_condition(where_)
+    return PRODUCTS.get(condition[1][0])
+
+
+def fake_storage(monkeypatch) -> dict:
+    calls = {"find_one": 0, "find": [], "inserted": [], "bulk_inserted": [], "triggers": [], "statuses": []}
+
+    def topic_data_find_one(where_, topic_name):
+        calls["find_one"] = calls["find_one"] + 1
+        return product_of(where_)
+
+    def topic_data_find_(where_, topic_name):
+        calls["find"].append(where_)
+        return [PRODUCTS[product_id] for product_id in where_["productId"]["in"] if product_id in PRODUCTS]
+
+    monkeypatch.setattr(read_topic_data_module, "topic_data_find_one", topic_data_find_one)
+    monkeypatch.setattr(topic_data_batch_module, "topic_data_find_", topic_data_find_)
+    monkeypatch.setattr(write_topic_data_module, "topic_data_insert_one",
+                        lambda one, topic_name: calls["inserted"].append(one))
+    monkeypatch.setattr(topic_data_batch_module, "topic_data_insert_",
+                        lambda data_list, topic_name: calls["bulk_inserted"].append(list(data_list)))
+    monkeypatch.setattr(pipeline_worker_module, "schedule_triggers", calls["triggers"].extend)
+    monkeypatch.setattr(pipeline_worker_module, "sync_pipeline_monitor_log", calls["statuses"].append)
+    monkeypatch.setattr(pipeline_worker_module, "sync_pipeline_monitor_log_batch", calls["statuses"].extend)
+    return calls
+
+
+def items_of(rows: list) -> list:
+    return [(row["orderNo"], row["productName"]) for row in rows]
+
+
+DATA_LIST = [{"old": None, "new": {"orderNo": "o1", "productId": "p1"}},
+             {"old": None, "new": {"orderNo": "o2", "productId": "p2"}},
+             {"old": None, "new": {"orderNo": "o3", "productId": "p1"}}]
+
+
+def test_batch_gives_same_rows_as_row_by_row(monkeypatch, topics):
+    topics(ORDER_TOPIC, PRODUCT_TOPIC, ITEM_TOPIC)
+    pipeline = build_pipeline()
+
+    row_by_row = fake_storage(monkeypatch)
+    for data in DATA_LIST:
+        run_pipeline(PipelineContext(pipeline, data))
+
+    batch = fake_storage(monkeypatch)
+    run_pipeline_batch(pipeline, DATA_LIST)
+
+    expected = [("o1", "apple"), ("o2", "pear"), ("o3", "apple")]
+    assert items_of(row_by_row["inserted"]) == expected
+    assert items_of(batch["bulk_inserted"][0]) == expected
+    assert [items_of([trigger.data["new"]]) for trigger in batch["triggers"]] == \
+           [items_of([trigger.data["new"]]) for trigger in row_by_row["triggers"]]
+    assert [status.status for status in batch["statuses"]] == [FINISHED] * 3
+
+
+def test_batch_reads_and_inserts_by_one_round_trip(monkeypatch, topics):
+    topics(ORDER_TOPIC, PRODUCT_TOPIC, ITEM_TOPIC)
+    calls = fake_storage(monkeypatch)
+    run_pipeline_batch(build_pipeline(), DATA_LIST)
+
+    # the lookups of distinct product ids are prefetched by one query, nothing is read row by row
+    assert calls["find"] == [{"productId": {"in": ["p1", "p2"]}}]
+    assert calls["find_one"] == 0
+    assert len(calls["bulk_inserted"]) == 1 and calls["inserted"] == []
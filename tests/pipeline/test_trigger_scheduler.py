@@ -0,0 +1,75 @@
+import watchmen.pipeline.index as pipeline_index_module
+from watchmen.config.config import settings
+from watchmen.pipeline.core.worker.trigger_scheduler import get_unique_key_name, schedule_triggers
+from watchmen.pipeline.model.trigger_data import TriggerData
+from watchmen.pipeline.model.trigger_type import TriggerType
+
+
+def update(topic_name: str, pk: str, old: dict, new: dict) -> TriggerData:
+    key = get_unique_key_name()
+    return TriggerData(topicName=topic_name, triggerType=TriggerType.update,
+                       data={"old": {key: pk, **old}, "new": {key: pk, **new}})
+
+
+def insert(topic_name: str, new: dict) -> TriggerData:
+    return TriggerData(topicName=topic_name, triggerType=TriggerType.insert, data={"old": None, "new": new})
+
+
+def record_triggers(monkeypatch, downstream: dict = None) -> list:
+    """
+    record the rows triggered, the rows of downstream are written when a row of topic is triggered
+    """
+    triggered = []
+
+    def trigger_pipeline(topic_name, instance, trigger_type, current_user=None):
+        triggered.append((topic_name, trigger_type, instance))
+        if downstream and topic_name in downstream:
+            schedule_triggers([downstream[topic_name](instance)])
+
+    def trigger_pipeline_batch(topic_name, instances, trigger_type, current_user=None):
+        triggered.append((topic_name, trigger_type, list(instances)))
+
+    monkeypatch.setattr(pipeline_index_module, "trigger_pipeline", trigger_pipeline)
+    monkeypatch.setattr(pipeline_index_module, "trigger_pipeline_batch", trigger_pipeline_batch)
+    return triggered
+
+
+def test_updates_of_same_row_are_merged(monkeypatch):
+    triggered = record_triggers(monkeypatch)
+    schedule_triggers([update("order", "1", {"amount": 1}, {"amount": 2}),
+                       update("order", "2", {"amount": 5}, {"amount": 6}),
+                       update("order", "1", {"amount": 2}, {"amount": 3, "status": "paid"})])
+
+    key = get_unique_key_name()
+    assert triggered == [
+        ("order", TriggerType.update, {"old": {key: "1", "amount": 1},
+                                       "new": {key: "1", "amount": 3, "status": "paid"}}),
+        ("order", TriggerType.update, {"old": {key: "2", "amount": 5}, "new": {key: "2", "amount": 6}})]
+
+
+def test_rows_are_triggered_one_by_one_wave_by_wave(monkeypatch):
+    triggered = record_triggers(monkeypatch, {"order": lambda instance: insert("summary", instance["new"])})
+    schedule_triggers([insert("order", {"no": 1}), insert("order", {"no": 2}), insert("customer", {"no": 3})])
+
+    # the second wave is run after all rows of first wave
+    assert [(topic_name, instance["new"]) for topic_name, _, instance in triggered] == [
+        ("order", {"no": 1}), ("order", {"no": 2}), ("customer", {"no": 3}),
+        ("summary", {"no": 1}), ("summary", {"no": 2})]
+
+
+def test_rows_are_triggered_as_micro_batch_when_turned_on(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_MICRO_BATCH_ON", True)
+    triggered = record_triggers(monkeypatch)
+    schedule_triggers([insert("order", {"no": 1}), update("order", "1", {"no": 1}, {"no": 2}),
+                       insert("order", {"no": 3})])
+
+    assert [(topic_name, trigger_type, len(instances)) for topic_name, trigger_type, instances in triggered] == [
+        ("order", TriggerType.update, 1), ("order", TriggerType.insert, 2)]
+
+
+def test_cascade_stops_at_max_depth(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_TRIGGER_MAX_DEPTH", 3)
+    triggered = record_triggers(monkeypatch, {"loop": lambda instance: insert("loop", instance["new"])})
+    schedule_triggers([insert("loop", {"no": 1})])
+
+    assert len(triggered) == 3
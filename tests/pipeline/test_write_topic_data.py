@@ -0,0 +1,118 @@
+import pytest
+
+import watchmen.pipeline.storage.write_topic_data as write_topic_data_module
+from watchmen.database.storage.exception.exception import InsertConflictError
+from watchmen.pipeline.model.trigger_type import TriggerType
+from watchmen.pipeline.storage.write_topic_data import merge_aggregate_topic_data, upsert_topic_data
+
+WHERE = {"customerId": "c1"}
+
+
+def fake_upsert(monkeypatch, results: list) -> list:
+    """
+    the upsert returns or raises the results in order, the calls are recorded
+    """
+    calls = []
+
+    def topic_data_upsert_one(where, insert_one, update_one, topic_name):
+        calls.append((where, insert_one, update_one, topic_name))
+        result = results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    monkeypatch.setattr(write_topic_data_module, "topic_data_upsert_one", topic_data_upsert_one)
+    return calls
+
+
+def test_upsert_inserts_when_row_not_found(monkeypatch):
+    new = {"customerId": "c1", "amount": 10, "id_": "1"}
+    calls = fake_upsert(monkeypatch, [(None, new)])
+    trigger_data = upsert_topic_data("customer", WHERE, {"customerId": "c1", "amount": 10}, "p1")
+
+    assert trigger_data.triggerType == TriggerType.insert
+    assert trigger_data.data == {"new": new, "old": None}
+    _, insert_one, update_one, topic_name = calls[0]
+    assert topic_name == "customer"
+    assert insert_one["insert_time_"] is not None and "insert_time_" not in update_one
+
+
+def test_upsert_updates_when_row_found(monkeypatch):
+    old = {"customerId": "c1", "amount": 5, "id_": "1"}
+    new = {"customerId": "c1", "amount": 10, "id_": "1"}
+    fake_upsert(monkeypatch, [(old, new)])
+    trigger_data = upsert_topic_data("customer", WHERE, {"customerId": "c1", "amount": 10}, "p1")
+
+    assert trigger_data.triggerType == TriggerType.update
+    assert trigger_data.data == {"new": new, "old": old}
+
+
+def test_upsert_updates_row_inserted_by_another_writer(monkeypatch):
+    old = {"customerId": "c1", "amount": 5, "id_": "2"}
+    new = {"customerId": "c1", "amount": 10, "id_": "2"}
+    calls = fake_upsert(monkeypatch, [InsertConflictError("InsertConflict"), (old, new)])
+    trigger_data = upsert_topic_data("customer", WHERE, {"customerId": "c1", "amount": 10}, "p1")
+
+    assert len(calls) == 2
+    assert trigger_data.triggerType == TriggerType.update
+    assert trigger_data.data == {"new": new, "old": old}
+
+
+def test_upsert_conflicted_twice_raises(monkeypatch):
+    fake_upsert(monkeypatch, [InsertConflictError("InsertConflict"), InsertConflictError("InsertConflict")])
+    with pytest.raises(InsertConflictError):
+        upsert_topic_data("customer", WHERE, {"customerId": "c1", "amount": 10}, "p1")
+
+
+def fake_aggregate(monkeypatch, results: list, insert_error: BaseException = None) -> dict:
+    """
+    the aggregate update returns the results in order, none when the row is not found
+    """
+    calls = {"aggregated": [], "inserted": []}
+
+    def topic_data_aggregate_one(where, one, topic_name):
+        calls["aggregated"].append(one)
+        return results.pop(0)
+
+    def topic_data_insert_one(one, topic_name):
+        calls["inserted"].append(one)
+        if insert_error is not None:
+            raise insert_error
+
+    monkeypatch.setattr(write_topic_data_module, "topic_data_aggregate_one", topic_data_aggregate_one)
+    monkeypatch.setattr(write_topic_data_module, "topic_data_insert_one", topic_data_insert_one)
+    return calls
+
+
+def test_aggregate_increases_existing_row(monkeypatch):
+    old = {"region": "east", "total": 5, "id_": "1"}
+    new = {"region": "east", "total": 8, "id_": "1"}
+    calls = fake_aggregate(monkeypatch, [(old, new)])
+    trigger_data = merge_aggregate_topic_data("sales", {"region": "east"}, {"total": {"_sum": 3}}, "p1")
+
+    assert trigger_data.triggerType == TriggerType.update
+    assert trigger_data.data == {"new": new, "old": old}
+    assert calls["inserted"] == []
+
+
+def test_aggregate_inserts_row_not_found(monkeypatch):
+    calls = fake_aggregate(monkeypatch, [None])
+    trigger_data = merge_aggregate_topic_data("sales", {"region": "east"},
+                                              {"region": "east", "price": {"_avg": 10}}, "p1")
+
+    assert trigger_data.triggerType == TriggerType.insert
+    # the count of averaged values starts from the inserted row
+    inserted = calls["inserted"][0]
+    assert inserted["price"] == 10
+    assert inserted["aggregate_assist_"] == {"avg_count": {"price": 1}}
+
+
+def test_aggregate_updates_row_inserted_by_another_writer(monkeypatch):
+    old = {"region": "east", "total": 5, "id_": "2"}
+    new = {"region": "east", "total": 8, "id_": "2"}
+    calls = fake_aggregate(monkeypatch, [None, (old, new)], InsertConflictError("InsertConflict"))
+    trigger_data = merge_aggregate_topic_data("sales", {"region": "east"}, {"total": {"_sum": 3}}, "p1")
+
+    assert len(calls["inserted"]) == 1 and len(calls["aggregated"]) == 2
+    assert trigger_data.triggerType == TriggerType.update
+    assert trigger_data.data == {"new": new, "old": old}
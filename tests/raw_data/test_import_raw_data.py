@@ -0,0 +1,89 @@
+import asyncio
+
+import watchmen.raw_data.service.import_raw_data as import_raw_data_module
+from watchmen.collection.model.topic_event import TopicEvent
+from watchmen.config.config import settings
+from watchmen.database.storage.utils.bulk_utils import add_bulk_failure, build_bulk_result
+from watchmen.raw_data.service.import_raw_data import import_raw_topic_data_batch, import_raw_topic_data_bulk
+from watchmen.topic.topic import Topic
+
+ORDER_TOPIC = Topic.parse_obj({"topicId": "order", "name": "order", "type": "raw", "factors": [
+    {"factorId": "no", "name": "no", "type": "number"}]})
+
+
+def fake_storage(monkeypatch, rejected_no=None, failed_no=None) -> dict:
+    """
+    the row of rejected no is failed by bulk insert, pipeline of the row of failed no raises error
+    """
+    calls = {"saved": [], "triggered": [], "batches": []}
+
+    def save_topic_instances_bulk(topic_name, instances, chunk_size=None):
+        result = build_bulk_result()
+        for index, instance in enumerate(instances):
+            if instance["data_"]["no"] == rejected_no:
+                add_bulk_failure(result, index, "duplicated")
+            else:
+                calls["saved"].append(instance["data_"])
+                result["inserted"] = result["inserted"] + 1
+        return result
+
+    async def trigger_pipeline_async(topic_name, instance, trigger_type, current_user=None):
+        if instance["new"]["no"] == failed_no:
+            raise ValueError("pipeline failed")
+        calls["triggered"].append(instance["new"])
+
+    async def trigger_pipeline_batch_async(topic_name, instances, trigger_type, current_user=None):
+        calls["batches"].append([instance["new"] for instance in instances])
+
+    monkeypatch.setattr(import_raw_data_module, "get_topic",
+                        lambda topic_name, current_user=None: ORDER_TOPIC if topic_name == "order" else None)
+    monkeypatch.setattr(import_raw_data_module, "save_topic_instances_bulk", save_topic_instances_bulk)
+    monkeypatch.setattr(import_raw_data_module, "trigger_pipeline_async", trigger_pipeline_async)
+    monkeypatch.setattr(import_raw_data_module, "trigger_pipeline_batch_async", trigger_pipeline_batch_async)
+    return calls
+
+
+def events(*items) -> list:
+    return [(index, TopicEvent(code=code, data=data)) for index, (code, data) in enumerate(items)]
+
+
+def test_status_of_each_event_by_index(monkeypatch):
+    calls = fake_storage(monkeypatch, rejected_no=2, failed_no=3)
+    statuses = asyncio.run(import_raw_topic_data_batch(events(
+        ("order", {"no": 1}), ("unknown", {"no": 9}), ("order", {"no": 2}), ("order", "not a dict"),
+        ("order", {"no": 3}), ("order", {"no": 4})), None))
+
+    assert [status["status"] for status in statuses] == ["received", "failed", "failed", "failed", "received",
+                                                         "received"]
+    assert "unknown" in statuses[1]["error"]
+    assert statuses[2]["error"] == "duplicated"
+    assert statuses[3]["error"] == "data should be dict"
+    # the row is saved, only the event of which pipeline fails has the error of pipeline
+    assert statuses[4]["error"] == "pipeline failed"
+    assert "error" not in statuses[0] and "error" not in statuses[5]
+    assert calls["saved"] == [{"no": 1}, {"no": 3}, {"no": 4}]
+    # the saved events are triggered one by one
+    assert calls["triggered"] == [{"no": 1}, {"no": 4}]
+    assert calls["batches"] == []
+
+
+def test_saved_events_are_triggered_as_micro_batch_when_turned_on(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_MICRO_BATCH_ON", True)
+    calls = fake_storage(monkeypatch, rejected_no=2)
+    statuses = asyncio.run(import_raw_topic_data_batch(events(
+        ("order", {"no": 1}), ("order", {"no": 2}), ("order", {"no": 3})), None))
+
+    assert [status["status"] for status in statuses] == ["received", "failed", "received"]
+    assert calls["triggered"] == []
+    assert calls["batches"] == [[{"no": 1}, {"no": 3}]]
+
+
+def test_failures_of_bulk_import_are_reported_by_index_of_data(monkeypatch):
+    calls = fake_storage(monkeypatch, rejected_no=4)
+    result = import_raw_topic_data_bulk("order", [{"no": 1}, "not a dict", {"no": 3}, {"no": 4}, {"no": 5}], None)
+
+    assert result["inserted"] == 3
+    # the failure of the third saved row is reported by its index in data
+    assert result["failed"] == [{"index": 1, "error": "data should be dict"}, {"index": 3, "error": "duplicated"}]
+    assert calls["saved"] == [{"no": 1}, {"no": 3}, {"no": 5}]
+    assert calls["triggered"] == [] and calls["batches"] == []
@@ -0,0 +1,36 @@
+import watchmen.topic.service.topic_index_service as topic_index_service_module
+from watchmen.pipeline.model.pipeline import Pipeline
+from watchmen.topic.service.topic_index_service import build_index_name, build_topic_index_report
+from watchmen.topic.topic import Topic
+
+CUSTOMER_TOPIC = Topic.parse_obj({"topicId": "customer", "name": "customer", "type": "distinct", "factors": [
+    {"factorId": "customer-id", "name": "customerId", "type": "text"},
+    {"factorId": "region", "name": "region", "type": "text"}]})
+
+PIPELINE = Pipeline.parse_obj({"pipelineId": "p1", "name": "p1", "topicId": "order", "enabled": True, "stages": [
+    {"stageId": "s1", "name": "s1", "units": [{"unitId": "u1", "name": "u1", "do": [
+        {"actionId": "a1", "type": "read-row", "topicId": "customer", "variableName": "customer",
+         "by": {"jointType": "and", "filters": [
+             {"left": {"kind": "topic", "topicId": "customer", "factorId": "customer-id"}, "operator": "equals",
+              "right": {"kind": "constant", "value": "c1"}}]}}]}]}]})
+
+
+def test_serving_index_without_access_is_not_unused(monkeypatch):
+    serving = build_index_name("customer", ["customerId"])
+    stale = build_index_name("customer", ["region"])
+    indexes = [{"name": serving, "columns": ["customerid"], "accesses": 0},
+               {"name": stale, "columns": ["region"], "accesses": 8},
+               {"name": "pk_customer", "columns": ["id_"], "accesses": 0}]
+    monkeypatch.setattr(topic_index_service_module, "load_pipeline_list", lambda current_user: [PIPELINE])
+    monkeypatch.setattr(topic_index_service_module, "get_topic_by_id",
+                        lambda topic_id, current_user=None: CUSTOMER_TOPIC)
+    monkeypatch.setattr(topic_index_service_module, "topic_data_list_indexes", lambda topic_name: indexes)
+
+    report = build_topic_index_report(None)
+
+    assert len(report) == 1
+    assert report[0]["required"] == [["customerId"]]
+    assert report[0]["missing"] == []
+    # the access counter starts from zero after restart, the index still required is reported as idle only
+    assert report[0]["unused"] == [stale]
+    assert report[0]["idle"] == [serving, "pk_customer"]
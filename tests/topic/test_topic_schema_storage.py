@@ -0,0 +1,27 @@
+import watchmen.topic.storage.topic_schema_storage as topic_schema_storage_module
+from watchmen.common.cache.cache_manage import cacheman, COLUMNS_BY_TABLE_NAME, TOPIC_BY_ID, TOPIC_BY_NAME, \
+    TOPIC_DICT_BY_NAME
+from watchmen.common.utils.data_utils import build_collection_name
+from watchmen.topic.storage.topic_schema_storage import update_topic
+from watchmen.topic.topic import Topic
+
+
+def test_rename_clears_caches_of_old_and_new_names(monkeypatch, topics):
+    old_topic, = topics({"topicId": "t1", "name": "order", "type": "distinct", "factors": []})
+    new_topic = Topic.parse_obj({"topicId": "t1", "name": "sales_order", "type": "distinct", "factors": []})
+    for name in ["order", "sales_order"]:
+        cacheman[TOPIC_DICT_BY_NAME].set(name, {})
+        cacheman[COLUMNS_BY_TABLE_NAME].set(build_collection_name(name), [])
+    cleared_tables = []
+    monkeypatch.setattr(topic_schema_storage_module, "find_one", lambda where, model, name: old_topic)
+    monkeypatch.setattr(topic_schema_storage_module, "update_one", lambda one, model, name: one)
+    monkeypatch.setattr(topic_schema_storage_module, "clear_topic_table", cleared_tables.append)
+
+    update_topic("t1", new_topic)
+
+    assert sorted(cleared_tables) == ["order", "sales_order"]
+    assert cacheman[TOPIC_BY_ID].get("t1") is None
+    for name in ["order", "sales_order"]:
+        assert cacheman[TOPIC_BY_NAME].get(name) is None
+        assert cacheman[TOPIC_DICT_BY_NAME].get(name) is None
+        assert cacheman[COLUMNS_BY_TABLE_NAME].get(build_collection_name(name)) is None
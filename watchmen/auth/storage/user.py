@@ -1,6 +1,7 @@
 from watchmen.auth.service.security import get_password_hash
 
 from watchmen.auth.user import User
+from watchmen.common.cache.cache_manage import cacheman, USER_BY_NAME
 from watchmen.common.pagination import Pagination
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 # db = get_client()
@@ -40,6 +41,18 @@ def load_user_by_name(user_name) -> User:
     return find_one({"name": user_name}, User, USERS)
 
 
+def get_user_by_name_cached(user_name) -> User:
+    """
+    for the user resolved by connectors for every message, kept in cache for 5 minutes
+    """
+    cached_user = cacheman[USER_BY_NAME].get(user_name)
+    if cached_user is not None:
+        return cached_user
+    result = load_user_by_name(user_name)
+    cacheman[USER_BY_NAME].set(user_name, result)
+    return result
+
+
 def create_user_storage(user: User):
     user.userId = get_surrogate_key()
     user.password = get_password_hash(user.password)
@@ -47,6 +60,7 @@ def create_user_storage(user: User):
 
 
 def update_user_storage(user: User):
+    cacheman[USER_BY_NAME].delete(user.name)
     return update_one(user, User, USERS)
 
 
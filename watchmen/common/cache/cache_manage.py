@@ -6,6 +6,9 @@ TOPIC_BY_ID = "topic_by_id"
 PIPELINE_BY_ID = "pipeline_by_id"
 PIPELINES_BY_TOPIC_ID = "pipelines_by_topic_id"
 COLUMNS_BY_TABLE_NAME = "columns_by_table_name"
+PIPELINE_PLAN_BY_ID = "pipeline_plan_by_id"
+TOPIC_TABLE_BY_NAME = "topic_table_by_name"
+USER_BY_NAME = "user_by_name"
 
 class WatchmenCache(Cache):
     pass
@@ -17,6 +20,9 @@ cacheman = CacheManager({
     TOPIC_BY_ID: {"maxsize": 300, "ttl": 0, "default": None},
     PIPELINE_BY_ID: {"maxsize": 200, "ttl": 0, "default": None},
     PIPELINES_BY_TOPIC_ID: {"maxsize": 200, "ttl": 0, "default": None},
-    COLUMNS_BY_TABLE_NAME: {"maxsize": 200, "ttl": 0, "default": None}
+    COLUMNS_BY_TABLE_NAME: {"maxsize": 200, "ttl": 0, "default": None},
+    PIPELINE_PLAN_BY_ID: {"maxsize": 200, "ttl": 0, "default": None},
+    TOPIC_TABLE_BY_NAME: {"maxsize": 500, "ttl": 0, "default": None},
+    USER_BY_NAME: {"maxsize": 100, "ttl": 300, "default": None}
 },
     WatchmenCache)
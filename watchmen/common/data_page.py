@@ -8,3 +8,4 @@ class DataPage(BaseModel):
     pageNumber: int = None
     pageSize: int = None
     pageCount: int = None
+    nextPageToken: str = None
@@ -4,3 +4,7 @@ from pydantic import BaseModel
 class Pagination(BaseModel):
     pageSize: int = None
     pageNumber: int = None
+    # continue from the last row of previous page by keyset, instead of page number
+    pageToken: str = None
+    # count by table statistics instead of count(*), always for the pages by token
+    approximateCount: bool = False
@@ -62,13 +62,14 @@ class RelationshipType(Enum):
     ManyToMany = "ManyToMany"
 
 
-def build_data_pages(pagination, result, item_count):
+def build_data_pages(pagination, result, item_count, next_page_token=None, page_number=None):
     data_page = DataPage()
     data_page.data = result
     data_page.itemCount = item_count
     data_page.pageSize = pagination.pageSize
-    data_page.pageNumber = pagination.pageNumber
+    data_page.pageNumber = pagination.pageNumber if page_number is None else page_number
     data_page.pageCount = math.ceil(item_count / pagination.pageSize)
+    data_page.nextPageToken = next_page_token
     return data_page
 
 
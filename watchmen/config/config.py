@@ -15,6 +15,15 @@ class Settings(BaseSettings):
 
     DASK_ON: bool = False
     DASK_PROCESSES: bool = False
+    PIPELINE_LOOP_PARALLEL_ON: bool = False  # DASK_ON turns it on too
+    PIPELINE_LOOP_WORKERS: int = 8
+    PIPELINE_LOOP_MIN_CHUNK_SIZE: int = 16  # loops shorter than two chunks are run in caller thread
+    PIPELINE_PARALLEL_ON: bool = False  # run the stages and units which are independent of each other concurrently
+    PIPELINE_PARALLEL_WORKERS: int = 8
+    PIPELINE_TRIGGER_MAX_DEPTH: int = 32  # waves of downstream pipelines run for one trigger
+    PIPELINE_MICRO_BATCH_ON: bool = False  # run triggered rows stage by stage together, only for independent rows
+    PIPELINE_VECTORIZE_ON: bool = False  # evaluate the mappings of micro-batch by column
+    PIPELINE_VECTORIZE_MIN_ROWS: int = 32  # smaller micro-batches are evaluated row by row
 
     ENVIRONMENT: str = DEV
 
@@ -49,6 +58,9 @@ class Settings(BaseSettings):
     MYSQL_POOL_MINCACHED = 2
     MYSQL_POOL_MAXCACHED = 5
     MYSQL_ECHO=False
+    MYSQL_POOL_TIMEOUT: int = 30  # seconds to wait for a connection
+    MYSQL_POOL_RECYCLE: int = 3600  # seconds
+    MYSQL_POOL_PRE_PING: bool = True
 
     ORACLE_LIB_DIR: str = ""
     ORACLE_HOST: str = ""
@@ -57,6 +69,11 @@ class Settings(BaseSettings):
     ORACLE_PASSWORD: str = ""
     ORACLE_SERVICE: str = ""
     ORACLE_SID: str = ""
+    ORACLE_POOL_MIN: int = 10
+    ORACLE_POOL_MAX: int = 10
+    ORACLE_POOL_INCREMENT: int = 0
+    ORACLE_POOL_TIMEOUT: int = 0  # seconds of idle session kept in pool, 0 keeps forever
+    ORACLE_POOL_WAIT_TIMEOUT: int = 0  # milliseconds to wait for a session, 0 waits forever
 
     CONNECTOR_KAFKA = False
     CONNECTOR_RABBITMQ = False
@@ -69,9 +86,19 @@ class Settings(BaseSettings):
     RABBITMQ_QUEUE: str = ""
     RABBITMQ_DURABLE: bool = True
     RABBITMQ_AUTO_DELETE: bool = False
+    RABBITMQ_PREFETCH_COUNT: int = 1000  # unacknowledged messages delivered to consumer
+    RABBITMQ_BATCH_SIZE: int = 200
+    RABBITMQ_BATCH_TIMEOUT: float = 0.2  # seconds to wait for a full batch
+    RABBITMQ_CONCURRENCY: int = 4  # batches processed concurrently
+    RABBITMQ_RETRY_BACKOFF: float = 1.0  # seconds
 
     KAFKA_BOOTSTRAP_SERVER = "localhost:9092"
     KAFKA_TOPICS = ""
+    KAFKA_GROUP_ID: str = "watchmen"
+    KAFKA_MAX_RECORDS: int = 1000  # records fetched by one getmany
+    KAFKA_FETCH_TIMEOUT_MS: int = 1000
+    KAFKA_MAX_IN_FLIGHT: int = 8  # partitions processed concurrently
+    KAFKA_RETRY_BACKOFF: float = 1.0  # seconds
 
     NOTIFIER_PROVIDER = "email"
     EMAILS_ENABLED: bool = False
@@ -84,6 +111,33 @@ class Settings(BaseSettings):
     EMAILS_FROM_NAME: Optional[str] = None
     EMAILS_TO: Optional[str] = None
     TOPIC_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+    PIPELINE_RETRY_MAX_ATTEMPTS: int = 3
+    PIPELINE_RETRY_BACKOFF_INITIAL: float = 0.05  # seconds
+    PIPELINE_RETRY_BACKOFF_MAX: float = 2.0  # seconds
+    PIPELINE_RETRY_BACKOFF_MULTIPLIER: float = 2.0
+
+    ASYNC_STORAGE_THREAD_POOL_SIZE: int = 16
+    PIPELINE_ASYNC_WORKERS: int = 8
+
+    PIPELINE_DISPATCH_QUEUE_ON: bool = False  # acknowledge ingestion after raw data is saved, run pipelines by queue
+    PIPELINE_DISPATCH_WORKERS: int = 8
+    PIPELINE_DISPATCH_QUEUE_SIZE: int = 10000
+    PIPELINE_DISPATCH_PUT_TIMEOUT: float = 5.0  # seconds
+    PIPELINE_DISPATCH_SPILL_FILE: str = None  # journal of queued triggers, replayed after restart
+    PIPELINE_DISPATCH_SHUTDOWN_TIMEOUT: float = 30.0  # seconds
+
+    AGGREGATE_BUFFER_ON: bool = False
+    AGGREGATE_BUFFER_FLUSH_INTERVAL: float = 1.0  # seconds
+    AGGREGATE_BUFFER_MAX_MERGES: int = 1000
+    AGGREGATE_BUFFER_MAX_ROWS: int = 10000
+    AGGREGATE_BUFFER_MAX_ATTEMPTS: int = 3  # failed writes are merged back and retried, then raised
+
+    TOPIC_DATA_STREAM_BATCH_SIZE: int = 1000
+    TOPIC_DATA_BULK_CHUNK_SIZE: int = 1000
+    TOPIC_DATA_BULK_CHUNK_BYTES: int = 4 * 1024 * 1024
+    STATEMENT_CACHE_SIZE: int = 1000  # statements of topic data cached by table, where shape and update shape
+    TOPIC_INDEX_AUTO_CREATE: bool = False  # create the indexes required by pipeline when it is saved
     DECIMAL = "decimal(32,2)"
 
     MOCK_USER = "demo_user"
@@ -3,32 +3,127 @@ import json
 import logging
 import traceback
 
+from watchmen.auth.storage.user import get_user_by_name_cached
 from watchmen.collection.model.topic_event import TopicEvent
 from watchmen.config.config import settings
-from watchmen.raw_data.service.import_raw_data import import_raw_topic_data
+from watchmen.raw_data.service.import_raw_data import import_raw_topic_data_batch, FAILED
 
 log = logging.getLogger("app." + __name__)
-loop = asyncio.get_event_loop()
 
 kafka_topics = settings.KAFKA_TOPICS
 kafka_topics_list = kafka_topics.split(",")
 
 
+class KafkaBatchConsumer:
+    """
+    records are fetched by getmany, the records of each partition are handed to bulk ingestion as one batch,
+    partitions are processed concurrently and at most max in flight at once, so the order in partition is kept.
+    offsets are committed manually after the batch of partition succeeds, a failed partition is sought back and
+    fetched again. the failed records reported by ingestion are logged and skipped.
+    consumer is any object with getmany, commit, seek and highwater of aiokafka consumer, e.g. a fake broker.
+    """
+
+    def __init__(self, consumer, max_records: int, timeout_ms: int, max_in_flight: int, retry_backoff: float,
+                 load_user=None, ingest=None):
+        self.consumer = consumer
+        self.max_records = max_records
+        self.timeout_ms = timeout_ms
+        self.max_in_flight = max_in_flight
+        self.retry_backoff = retry_backoff
+        self.load_user = load_user or (lambda: get_user_by_name_cached(settings.MOCK_USER))
+        self.ingest = ingest or import_raw_topic_data_batch
+        self.partitions = {}
+        self.stopped = False
+
+    async def run(self):
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        while not self.stopped:
+            await self.poll(semaphore)
+
+    async def poll(self, semaphore: asyncio.Semaphore = None):
+        semaphore = semaphore or asyncio.Semaphore(self.max_in_flight)
+        batches = await self.consumer.getmany(timeout_ms=self.timeout_ms, max_records=self.max_records)
+        if not batches:
+            return
+        current_user = self.load_user()
+        results = await asyncio.gather(*[self.__process_partition(semaphore, tp, records, current_user)
+                                         for tp, records in batches.items() if records])
+        offsets = {tp: offset for tp, offset in results if offset is not None}
+        if offsets:
+            await self.consumer.commit(offsets)
+        if len(offsets) < len(results):
+            await asyncio.sleep(self.retry_backoff)
+
+    async def __process_partition(self, semaphore: asyncio.Semaphore, tp, records: list, current_user) -> tuple:
+        """
+        return the partition and the offset to commit, the offset is none when the batch failed
+        """
+        async with semaphore:
+            stats = self.partitions.setdefault(tp, {"position": None, "processed": 0, "failed": 0, "retried": 0})
+            topic_events = []
+            for index, record in enumerate(records):
+                try:
+                    topic_events.append((index, TopicEvent.parse_obj(json.loads(record.value))))
+                except Exception as e:
+                    log.error("kafka record {0}-{1}@{2} is skipped, {3}".format(
+                        tp.topic, tp.partition, record.offset, e))
+                    stats["failed"] = stats["failed"] + 1
+            try:
+                statuses = await self.ingest(topic_events, current_user)
+            except Exception:
+                log.error(traceback.format_exc())
+                stats["retried"] = stats["retried"] + 1
+                self.consumer.seek(tp, records[0].offset)
+                return tp, None
+            for status in statuses:
+                if status["status"] == FAILED:
+                    log.error("kafka record {0}-{1}@{2} is skipped, {3}".format(
+                        tp.topic, tp.partition, records[status["index"]].offset, status.get("error")))
+                    stats["failed"] = stats["failed"] + 1
+                else:
+                    stats["processed"] = stats["processed"] + 1
+            offset = records[-1].offset + 1
+            stats["position"] = offset
+            return tp, offset
+
+    def stats(self) -> dict:
+        result = {}
+        for tp, stats in self.partitions.items():
+            highwater = self.consumer.highwater(tp)
+            lag = None if highwater is None or stats["position"] is None else highwater - stats["position"]
+            result["{0}-{1}".format(tp.topic, tp.partition)] = {**stats, "highwater": highwater, "lag": lag}
+        return result
+
+
+kafka_batch_consumer: KafkaBatchConsumer = None
+
+
 async def consume():
     from aiokafka import AIOKafkaConsumer
-    consumer = AIOKafkaConsumer(
-        kafka_topics_list,
-        loop=loop, bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVER,
-        value_deserializer=lambda m: json.loads(m.decode('utf-8')))
-
-    await consumer.start()
-    try:
-        async for msg in consumer:
-            topic_event = TopicEvent.parse_obj(msg.value)
-            await import_raw_topic_data(topic_event)
-    except:
-        log.error(traceback.format_exc())
-        await consume()
-    finally:
-        # Will leave consumer group; perform autocommit if enabled.
-        await consumer.stop()
+    global kafka_batch_consumer
+    while True:
+        consumer = AIOKafkaConsumer(
+            *kafka_topics_list,
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVER,
+            group_id=settings.KAFKA_GROUP_ID,
+            enable_auto_commit=False)
+        try:
+            await consumer.start()
+            kafka_batch_consumer = KafkaBatchConsumer(consumer, settings.KAFKA_MAX_RECORDS,
+                                                      settings.KAFKA_FETCH_TIMEOUT_MS, settings.KAFKA_MAX_IN_FLIGHT,
+                                                      settings.KAFKA_RETRY_BACKOFF)
+            await kafka_batch_consumer.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.error(traceback.format_exc())
+        finally:
+            # leave consumer group, the uncommitted records are fetched again by next consumer
+            await consumer.stop()
+        await asyncio.sleep(settings.KAFKA_RETRY_BACKOFF)
+
+
+def get_kafka_consumer_stats() -> dict:
+    if kafka_batch_consumer is None:
+        return {}
+    return kafka_batch_consumer.stats()
@@ -1,50 +1,122 @@
+import asyncio
 import json
 import logging
+import time
 import traceback
 
 from aio_pika import ExchangeType
 
-from watchmen.auth.storage.user import load_user_by_name
+from watchmen.auth.storage.user import get_user_by_name_cached
 from watchmen.collection.model.topic_event import TopicEvent
 from watchmen.config.config import settings
-from watchmen.raw_data.service.import_raw_data import import_raw_topic_data
+from watchmen.raw_data.service.import_raw_data import import_raw_topic_data_batch, FAILED
 
 log = logging.getLogger("app." + __name__)
 
 
-async def consume(loop):
-    import aio_pika
-    connection = await aio_pika.connect(
-        host=settings.RABBITMQ_HOST, port=settings.RABBITMQ_PORT, loop=loop, virtualhost=settings.RABBITMQ_VIRTUALHOST,
-        login=settings.RABBITMQ_USERNAME
-        , password=settings.RABBITMQ_PASSWORD
-    )
+async def __collect_batch(messages: asyncio.Queue) -> list:
+    """
+    wait for the first message, then collect until batch is full or batch timeout is reached.
+    empty when no message in retry backoff, so the connection is checked while idle.
+    """
+    try:
+        batch = [await asyncio.wait_for(messages.get(), settings.RABBITMQ_RETRY_BACKOFF)]
+    except asyncio.TimeoutError:
+        return []
+    deadline = time.monotonic() + settings.RABBITMQ_BATCH_TIMEOUT
+    while len(batch) < settings.RABBITMQ_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(messages.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
 
-    async with connection:
-        queue_name = settings.RABBITMQ_QUEUE
 
-        channel = await connection.channel()
+async def __process_batch(batch: list, semaphore: asyncio.Semaphore):
+    """
+    messages are acknowledged after the batch is saved, the whole batch is requeued when ingestion fails,
+    and the messages rejected by ingestion are not requeued.
+    """
+    try:
+        topic_events = []
+        rejected = set()
+        for index, message in enumerate(batch):
+            try:
+                topic_events.append((index, TopicEvent.parse_obj(json.loads(message.body))))
+            except Exception as e:
+                log.error("rabbitmq message {0} is rejected, {1}".format(message.delivery_tag, e))
+                rejected.add(index)
+        try:
+            user = get_user_by_name_cached(settings.MOCK_USER)
+            statuses = await import_raw_topic_data_batch(topic_events, user)
+        except Exception:
+            log.error(traceback.format_exc())
+            for message in batch:
+                await message.nack(requeue=True)
+            return
+        for status in statuses:
+            if status["status"] == FAILED:
+                log.error("rabbitmq message {0} is rejected, {1}".format(
+                    batch[status["index"]].delivery_tag, status.get("error")))
+                rejected.add(status["index"])
+        for index, message in enumerate(batch):
+            if index in rejected:
+                await message.reject(requeue=False)
+            else:
+                await message.ack()
+    finally:
+        semaphore.release()
 
-        queue = await channel.declare_queue(
-            queue_name,
-            durable=settings.RABBITMQ_DURABLE,
-            auto_delete=settings.RABBITMQ_AUTO_DELETE
 
-        )
-        exchange = await channel.declare_exchange(name=queue_name, type=ExchangeType.DIRECT, auto_delete=True)
+async def __consume_batches(connection, messages: asyncio.Queue):
+    semaphore = asyncio.Semaphore(settings.RABBITMQ_CONCURRENCY)
+    tasks = set()
+    while not connection.is_closed:
+        # wait for a free handler before collecting, the batches are not piled up in memory
+        await semaphore.acquire()
+        batch = await __collect_batch(messages)
+        if not batch:
+            semaphore.release()
+            continue
+        task = asyncio.ensure_future(__process_batch(batch, semaphore))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
 
-        await queue.bind(exchange, queue_name)
-        # Creating channel
 
-        async with queue.iterator() as queue_iter:
-            # Cancel consuming after __aexit__
-            try:
-                async for message in queue_iter:
-                    async with message.process():
-                        payload = json.loads(message.body)
-                        topic_event = TopicEvent.parse_obj(payload)
-                        user = load_user_by_name(settings.MOCK_USER)
-                        await import_raw_topic_data(topic_event, user)
-            except:
-                log.error(traceback.format_exc())
-                consume(loop)
+async def consume(loop):
+    import aio_pika
+    while True:
+        try:
+            connection = await aio_pika.connect(
+                host=settings.RABBITMQ_HOST, port=settings.RABBITMQ_PORT, loop=loop,
+                virtualhost=settings.RABBITMQ_VIRTUALHOST,
+                login=settings.RABBITMQ_USERNAME,
+                password=settings.RABBITMQ_PASSWORD
+            )
+            async with connection:
+                queue_name = settings.RABBITMQ_QUEUE
+
+                channel = await connection.channel()
+                await channel.set_qos(prefetch_count=settings.RABBITMQ_PREFETCH_COUNT)
+
+                queue = await channel.declare_queue(
+                    queue_name,
+                    durable=settings.RABBITMQ_DURABLE,
+                    auto_delete=settings.RABBITMQ_AUTO_DELETE
+                )
+                exchange = await channel.declare_exchange(name=queue_name, type=ExchangeType.DIRECT, auto_delete=True)
+
+                await queue.bind(exchange, queue_name)
+
+                messages = asyncio.Queue()
+                await queue.consume(messages.put)
+                await __consume_batches(connection, messages)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.error(traceback.format_exc())
+        # the unacknowledged messages are redelivered after reconnect
+        await asyncio.sleep(settings.RABBITMQ_RETRY_BACKOFF)
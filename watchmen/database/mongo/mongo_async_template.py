@@ -0,0 +1,60 @@
+import logging
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from watchmen.common.utils.data_utils import build_collection_name
+from watchmen.config.config import settings
+from watchmen.database.mongo.index import build_code_options
+from watchmen.database.singleton import singleton
+from watchmen.database.storage.thread_pool_storage import ThreadPoolStorage
+
+async_client = AsyncIOMotorClient(settings.MONGO_HOST, settings.MONGO_PORT, username=settings.MONGO_USERNAME,
+                                  password=settings.MONGO_PASSWORD)
+
+async_db = async_client[settings.MONGO_DATABASE]
+
+log = logging.getLogger("app." + __name__)
+
+log.info("mongo async template initialized")
+
+
+@singleton
+class MongoAsyncStorage(ThreadPoolStorage):
+    """
+    topic data are inserted, updated and read by motor,
+    the others are bridged to synchronous mongo storage by thread pool.
+    """
+
+    @staticmethod
+    def get_topic_data_collection(topic_name):
+        return async_db.get_collection(build_collection_name(topic_name), codec_options=build_code_options())
+
+    async def topic_data_insert_one(self, one, topic_name):
+        self.storage.encode_dict(one)
+        await self.get_topic_data_collection(topic_name).insert_one(
+            self.storage.build_mongo_updates_expression_for_insert(one))
+        return topic_name, one
+
+    async def topic_data_insert_(self, data, topic_name):
+        documents = []
+        for d in data:
+            self.storage.encode_dict(d)
+            documents.append(self.storage.build_mongo_updates_expression_for_insert(d))
+        await self.get_topic_data_collection(topic_name).insert_many(documents)
+
+    async def topic_data_update_one(self, id_, one, topic_name):
+        self.storage.encode_dict(one)
+        await self.get_topic_data_collection(topic_name).update_one(
+            {"_id": ObjectId(id_)}, self.storage.build_mongo_updates_expression_for_update(one))
+
+    async def topic_data_find_by_id(self, id_, topic_name):
+        return await self.get_topic_data_collection(topic_name).find_one({"_id": ObjectId(id_)})
+
+    async def topic_data_find_one(self, where, topic_name):
+        return await self.get_topic_data_collection(topic_name).find_one(
+            self.storage.build_mongo_where_expression(where))
+
+    async def topic_data_find_(self, where, topic_name):
+        cursor = self.get_topic_data_collection(topic_name).find(self.storage.build_mongo_where_expression(where))
+        return await cursor.to_list(length=None)
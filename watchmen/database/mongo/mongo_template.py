@@ -3,14 +3,20 @@ from datetime import date
 
 import arrow
 import pymongo
+import pymongo.errors
 from bson import regex, ObjectId
 from pymongo import ReturnDocument
 
 from watchmen.common.data_page import DataPage
 from watchmen.common.utils.data_utils import build_data_pages, build_collection_name
+from watchmen.config.config import settings
 from watchmen.database.mongo.index import build_code_options, get_client
 from watchmen.database.singleton import singleton
 from watchmen.database.storage.storage_interface import StorageInterface
+from watchmen.database.storage.utils.aggregate_utils import revert_aggregate
+from watchmen.database.storage.utils.bulk_utils import add_bulk_failure, build_bulk_result, chunk_rows
+from watchmen.database.storage.utils.keyset_utils import build_keyset, build_next_page_token, decode_page_token, \
+    is_approximate_count, is_keyset_page
 from watchmen.database.storage.utils.table_utils import get_primary_key
 
 client = get_client()
@@ -128,6 +134,39 @@ class MongoStorage(StorageInterface):
                 new_updates["$set"][key] = value
         return new_updates
 
+    def build_mongo_updates_expression_for_upsert(self, insert_one, update_one):
+        """
+        the fields of update are set or increased when the document is matched or inserted,
+        the fields only in insert are set by "$setOnInsert".
+        """
+        new_updates = {}
+        for key, value in update_one.items():
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    if k == "_sum" or k == "_count":
+                        new_updates.setdefault("$inc", {})[key] = v
+            else:
+                new_updates.setdefault("$set", {})[key] = value
+        for key, value in self.build_mongo_updates_expression_for_insert(insert_one).items():
+            if key not in update_one:
+                new_updates.setdefault("$setOnInsert", {})[key] = value
+        return new_updates
+
+    @staticmethod
+    def build_mongo_keyset_expression(keyset: list, values: list):
+        """
+        documents after the given keyset values, e.g. {a > :a} or {a = :a and b > :b} for keyset (a, b)
+        """
+        result_filters = []
+        for index, (name, direction) in enumerate(keyset):
+            filters = {keyset[i][0]: values[i] for i in range(index)}
+            if direction == "desc":
+                filters[name] = {"$lt": values[index]}
+            else:
+                filters[name] = {"$gt": values[index]}
+            result_filters.append(filters)
+        return {"$or": result_filters}
+
     def build_mongo_order(self, order_: list):
         result = []
         for item in order_:
@@ -237,29 +276,36 @@ class MongoStorage(StorageInterface):
         return [model.parse_obj(result) for result in result_list]
 
     def page_all(self, sort, pageable, model, name) -> DataPage:
-        codec_options = build_code_options()
-        collection = client.get_collection(name, codec_options=codec_options)
-        total = collection.find().count()
-        skips = pageable.pageSize * (pageable.pageNumber - 1)
-        cursor = collection.find().skip(skips).limit(pageable.pageSize).sort(self.build_mongo_order(sort))
-        return build_data_pages(pageable, [model.parse_obj(result) for result in list(cursor)], total)
+        return self._page({}, sort, pageable, model, name, get_primary_key(name))
 
     def page_(self, where, sort, pageable, model, name) -> DataPage:
+        return self._page(self.build_mongo_where_expression(where), sort, pageable, model, name,
+                          get_primary_key(name))
+
+    def _page(self, mongo_where, sort, pageable, model, name, primary_key) -> DataPage:
+        """
+        order by sort and primary key, seek by the page token when it is given, otherwise skip by page number
+        """
         codec_options = build_code_options()
         collection = client.get_collection(name, codec_options=codec_options)
-
-        mongo_where = self.build_mongo_where_expression(where)
-        total = collection.find(mongo_where).count()
-        skips = pageable.pageSize * (pageable.pageNumber - 1)
-        if sort is not None:
-            cursor = collection.find(mongo_where).skip(skips).limit(pageable.pageSize).sort(
-                self.build_mongo_order(sort))
+        if is_approximate_count(pageable):
+            total = collection.estimated_document_count()
         else:
-            cursor = collection.find(mongo_where).skip(skips).limit(pageable.pageSize)
-        if model is not None:
-            return build_data_pages(pageable, [model.parse_obj(result) for result in list(cursor)], total)
+            total = collection.count_documents(mongo_where)
+        keyset = build_keyset(sort, primary_key)
+        if is_keyset_page(pageable):
+            values, page_number = decode_page_token(pageable.pageToken)
+            page_number = page_number + 1
+            cursor = collection.find({"$and": [mongo_where, self.build_mongo_keyset_expression(keyset, values)]})
         else:
-            return build_data_pages(pageable, list(cursor), total)
+            page_number = pageable.pageNumber
+            cursor = collection.find(mongo_where).skip(pageable.pageSize * (page_number - 1))
+        results = list(cursor.limit(pageable.pageSize).sort(self.build_mongo_order(keyset)))
+        next_page_token = build_next_page_token(results[-1] if results else None, len(results), keyset,
+                                                pageable.pageSize, page_number)
+        if model is not None:
+            results = [model.parse_obj(result) for result in results]
+        return build_data_pages(pageable, results, total, next_page_token, page_number)
 
     def __convert_list_to_dict(self, items: list):
         result = []
@@ -281,6 +327,23 @@ class MongoStorage(StorageInterface):
         topic_name = build_collection_name(name)
         client.get_collection(topic_name).drop()
 
+    def topic_data_list_indexes(self, topic_name) -> list:
+        collection = client.get_collection(build_collection_name(topic_name))
+        try:
+            accesses = {stats["name"]: stats["accesses"]["ops"] for stats in collection.aggregate([{"$indexStats": {}}])}
+        except pymongo.errors.OperationFailure:
+            log.warning("index usage of collection \"{0}\" is not available".format(build_collection_name(topic_name)))
+            accesses = {}
+        return [{"name": name, "columns": [key for key, _ in info["key"]], "accesses": accesses.get(name)}
+                for name, info in collection.index_information().items() if name != "_id_"]
+
+    def topic_data_create_index(self, topic_name, index_name, factor_names):
+        collection = client.get_collection(build_collection_name(topic_name))
+        collection.create_index([(name, pymongo.ASCENDING) for name in factor_names], name=index_name, background=True)
+
+    def topic_data_drop_index(self, topic_name, index_name):
+        client.get_collection(build_collection_name(topic_name)).drop_index(index_name)
+
     def topic_data_delete_(self, where, name):
         collection = client.get_collection(build_collection_name(name))
         if where is None:
@@ -305,9 +368,34 @@ class MongoStorage(StorageInterface):
     def topic_data_insert_(self, data, topic_name):
         codec_options = build_code_options()
         topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        documents = []
         for d in data:
             self.encode_dict(d)
-        topic_data_col.insert_many(data)
+            documents.append(self.build_mongo_updates_expression_for_insert(d))
+        topic_data_col.insert_many(documents)
+
+    def topic_data_insert_bulk(self, data, topic_name, chunk_size=None, chunk_bytes=None) -> dict:
+        """
+        the documents of chunk are inserted by unordered insert_many, the failed ones are reported by bulk write error
+        and others are kept.
+        """
+        codec_options = build_code_options()
+        topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        documents = []
+        for d in data:
+            self.encode_dict(d)
+            documents.append(self.build_mongo_updates_expression_for_insert(d))
+        result = build_bulk_result()
+        for offset, chunk in chunk_rows(documents, chunk_size or settings.TOPIC_DATA_BULK_CHUNK_SIZE,
+                                        chunk_bytes or settings.TOPIC_DATA_BULK_CHUNK_BYTES):
+            try:
+                topic_data_col.insert_many(chunk, ordered=False)
+                result["inserted"] = result["inserted"] + len(chunk)
+            except pymongo.errors.BulkWriteError as e:
+                result["inserted"] = result["inserted"] + e.details.get("nInserted", 0)
+                for error in e.details.get("writeErrors", []):
+                    add_bulk_failure(result, offset + error["index"], error.get("errmsg"))
+        return result
 
     def topic_data_update_one(self, id_, one, topic_name):
         codec_options = build_code_options()
@@ -324,6 +412,38 @@ class MongoStorage(StorageInterface):
                                                   upsert=False,
                                                   return_document=ReturnDocument.AFTER)
 
+    def topic_data_aggregate_one(self, where, one, topic_name) -> any:
+        codec_options = build_code_options()
+        topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        self.encode_dict(one)
+        updates = self.build_mongo_updates_expression_for_upsert({}, one)
+        updates.setdefault("$inc", {})["version_"] = 1
+        new = topic_data_col.find_one_and_update(filter=self.build_mongo_where_expression(where),
+                                                 update=updates,
+                                                 upsert=False,
+                                                 return_document=ReturnDocument.AFTER)
+        if new is None:
+            return None
+        else:
+            return revert_aggregate(new, one), new
+
+    def topic_data_upsert_one(self, where, insert_one, update_one, topic_name) -> tuple:
+        codec_options = build_code_options()
+        topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        self.encode_dict(insert_one)
+        self.encode_dict(update_one)
+        updates = self.build_mongo_updates_expression_for_upsert(insert_one, update_one)
+        id_ = ObjectId()
+        updates.setdefault("$setOnInsert", {})["_id"] = id_
+        old = topic_data_col.find_one_and_update(filter=self.build_mongo_where_expression(where),
+                                                 update=updates,
+                                                 upsert=True,
+                                                 return_document=ReturnDocument.BEFORE)
+        if old is None:
+            return None, {**self.build_mongo_updates_expression_for_insert(insert_one), "_id": id_}
+        else:
+            return old, {**old, **update_one}
+
     def topic_data_update_(self, where, updates, name):
         codec_options = build_code_options()
         self.encode_dict(updates)
@@ -355,8 +475,20 @@ class MongoStorage(StorageInterface):
         # print(list(result))
         return list(result)
 
+    def topic_data_iter_(self, where, topic_name, batch_size=None):
+        codec_options = build_code_options()
+        topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        cursor = topic_data_col.find(self.build_mongo_where_expression(where))
+        yield from cursor.batch_size(batch_size or settings.TOPIC_DATA_STREAM_BATCH_SIZE)
+
+    def topic_data_scan_(self, topic_name, batch_size=None):
+        codec_options = build_code_options()
+        topic_data_col = client.get_collection(build_collection_name(topic_name), codec_options=codec_options)
+        yield from topic_data_col.find().batch_size(batch_size or settings.TOPIC_DATA_STREAM_BATCH_SIZE)
+
     def topic_data_page_(self, where, sort, pageable, model, name) -> DataPage:
-        return self.page_(self.build_mongo_where_expression(where), sort, pageable, model, name)
+        return self._page(self.build_mongo_where_expression(where), sort, pageable, model, build_collection_name(name),
+                          "_id")
 
     def clear_metadata(self):
         pass
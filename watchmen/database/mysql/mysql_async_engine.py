@@ -0,0 +1,20 @@
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from watchmen.config.config import settings
+from watchmen.database.mysql.mysql_engine import dumps
+
+async_connection_url = 'mysql+aiomysql://%s:%s@%s:%s/%s?charset=utf8' % (settings.MYSQL_USER,
+                                                                        settings.MYSQL_PASSWORD,
+                                                                        settings.MYSQL_HOST,
+                                                                        settings.MYSQL_PORT,
+                                                                        settings.MYSQL_DATABASE)
+
+async_engine = create_async_engine(async_connection_url,
+                                   echo=settings.MYSQL_ECHO,
+                                   pool_size=settings.MYSQL_POOL_MAXCACHED,
+                                   max_overflow=max(settings.MYSQL_POOL_MAXCONNECTIONS - settings.MYSQL_POOL_MAXCACHED,
+                                                    0),
+                                   pool_timeout=settings.MYSQL_POOL_TIMEOUT,
+                                   pool_recycle=settings.MYSQL_POOL_RECYCLE,
+                                   pool_pre_ping=settings.MYSQL_POOL_PRE_PING,
+                                   json_serializer=dumps)
@@ -0,0 +1,102 @@
+import logging
+
+from sqlalchemy import update
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from watchmen.common.cache.cache_manage import cacheman, TOPIC_DICT_BY_NAME, TOPIC_TABLE_BY_NAME
+from watchmen.common.utils.data_utils import capital_to_lower, convert_to_dict
+from watchmen.database.mysql.mysql_async_engine import async_engine
+from watchmen.database.mysql.mysql_table_definition import get_topic_table_by_name
+from watchmen.database.singleton import singleton
+from watchmen.database.storage.exception.exception import InsertConflictError
+from watchmen.database.storage.thread_pool_storage import ThreadPoolStorage
+from watchmen.database.storage.utils.row_decoder import get_row_decoder
+
+log = logging.getLogger("app." + __name__)
+
+log.info("mysql async template initialized")
+
+
+@singleton
+class MysqlAsyncStorage(ThreadPoolStorage):
+    """
+    topic data are inserted, updated and read by the asyncio engine of SQLAlchemy (aiomysql),
+    the others are bridged to synchronous mysql storage by thread pool.
+    the expressions and cached statements are built by synchronous mysql storage, and table metadata are
+    loaded once and cached by it.
+    """
+
+    def __warm_topic(self, table_name, topic_name):
+        get_topic_table_by_name(table_name)
+        self.storage.get_topic_factor_names(topic_name)
+
+    async def __get_topic_table(self, topic_name):
+        """
+        the table is reflected and the topic is loaded by synchronous engine on first access,
+        it is run in thread pool, so the event loop is not blocked.
+        """
+        table_name = 'topic_' + topic_name
+        if cacheman[TOPIC_TABLE_BY_NAME].get(table_name) is None or cacheman[TOPIC_DICT_BY_NAME].get(
+                topic_name) is None:
+            await self.run_in_thread(self.__warm_topic, table_name, topic_name)
+        return get_topic_table_by_name(table_name)
+
+    async def topic_data_insert_one(self, one, topic_name):
+        table = await self.__get_topic_table(topic_name)
+        one_dict: dict = capital_to_lower(convert_to_dict(one))
+        value = self.storage.build_mysql_updates_expression(table, one_dict, "insert")
+        async with async_engine.begin() as conn:
+            try:
+                await conn.execute(insert(table), value)
+            except IntegrityError as e:
+                raise InsertConflictError("InsertConflict") from e
+
+    async def topic_data_insert_(self, data, topic_name):
+        table = await self.__get_topic_table(topic_name)
+        values = []
+        for instance in data:
+            one_dict: dict = capital_to_lower(convert_to_dict(instance))
+            values.append(self.storage.build_mysql_updates_expression(table, one_dict, "insert"))
+        async with async_engine.begin() as conn:
+            await conn.execute(insert(table), values)
+
+    async def topic_data_update_one(self, id_, one, topic_name):
+        table = await self.__get_topic_table(topic_name)
+        one_dict = capital_to_lower(convert_to_dict(one))
+        values = self.storage.build_mysql_updates_expression(table, one_dict, "update")
+        stmt, params = self.storage.build_mysql_statement(
+            "update", table, {"id_": id_}, values,
+            lambda where_, values_: update(table).where(
+                self.storage.build_mysql_where_expression(table, where_)).values(values_))
+        async with async_engine.begin() as conn:
+            await conn.execute(stmt, params)
+
+    async def topic_data_find_by_id(self, id_, topic_name):
+        return await self.topic_data_find_one({"id_": id_}, topic_name)
+
+    async def topic_data_find_one(self, where, topic_name):
+        rows = await self.__find(where, topic_name, 1)
+        if not rows:
+            return None
+        else:
+            return rows[0]
+
+    async def topic_data_find_(self, where, topic_name):
+        return await self.__find(where, topic_name)
+
+    async def __find(self, where, topic_name, limit: int = None) -> list:
+        """
+        the json cells are loaded by dialect, the row decoder picks and renames the columns of factors
+        """
+        table = await self.__get_topic_table(topic_name)
+        stmt, params = self.storage.build_mysql_statement(
+            "select", table, where, None,
+            lambda where_, _: select(table).where(self.storage.build_mysql_where_expression(table, where_)))
+        async with async_engine.connect() as conn:
+            result = await conn.execute(stmt, params)
+            rows = result.fetchmany(limit) if limit is not None else result.fetchall()
+            decoder = get_row_decoder(table, list(result.keys()), None,
+                                      self.storage.get_topic_factor_names(topic_name))
+        return decoder.decode_all(rows)
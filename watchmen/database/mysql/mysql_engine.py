@@ -4,6 +4,7 @@ from sqlalchemy import create_engine
 
 from watchmen.common.utils.date_utils import DateTimeEncoder
 from watchmen.config.config import settings
+from watchmen.database.storage.pool_monitor import MonitoredQueuePool, build_queue_pool_stats, register_pool
 
 
 def dumps(o):
@@ -17,8 +18,16 @@ connection_url = 'mysql://%s:%s@%s:%s/%s?charset=utf8' % (settings.MYSQL_USER,
                                                           settings.MYSQL_DATABASE)
 
 
+# the idle connections are kept up to MYSQL_POOL_MAXCACHED, and overflow up to MYSQL_POOL_MAXCONNECTIONS in total
 engine = create_engine(connection_url,
                        echo=settings.MYSQL_ECHO,
                        future=True,
-                       pool_recycle=3600,
+                       poolclass=MonitoredQueuePool,
+                       pool_size=settings.MYSQL_POOL_MAXCACHED,
+                       max_overflow=max(settings.MYSQL_POOL_MAXCONNECTIONS - settings.MYSQL_POOL_MAXCACHED, 0),
+                       pool_timeout=settings.MYSQL_POOL_TIMEOUT,
+                       pool_recycle=settings.MYSQL_POOL_RECYCLE,
+                       pool_pre_ping=settings.MYSQL_POOL_PRE_PING,
                        json_serializer=dumps, encoding='utf-8')
+
+register_pool("mysql", lambda: build_queue_pool_stats(engine.pool))
@@ -6,28 +6,44 @@ from decimal import Decimal
 from operator import eq
 
 from sqlalchemy import update, Table, and_, or_, delete, Column, DECIMAL, String, desc, asc, \
-    text, func, DateTime, BigInteger, Date, Integer, JSON, inspect
+    text, func, DateTime, BigInteger, Date, Integer, JSON, inspect, Index, Text
 from sqlalchemy.dialects.mysql import insert
-from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.exc import NoSuchTableError, IntegrityError, DBAPIError
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import BindParameter
 
 from watchmen.common.cache.cache_manage import cacheman, TOPIC_DICT_BY_NAME, COLUMNS_BY_TABLE_NAME
 from watchmen.common.data_page import DataPage
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 from watchmen.common.utils.data_utils import build_data_pages, capital_to_lower, build_collection_name
 from watchmen.common.utils.data_utils import convert_to_dict
+from watchmen.config.config import settings
 from watchmen.database.mysql.mysql_engine import engine
-from watchmen.database.mysql.mysql_table_definition import get_table_by_name, metadata, get_topic_table_by_name
-from watchmen.database.mysql.mysql_utils import parse_obj, count_table, count_topic_data_table
+from watchmen.database.mysql.mysql_table_definition import get_table_by_name, metadata, get_topic_table_by_name, \
+    remove_topic_table, clear_topic_tables
+from watchmen.database.mysql.mysql_utils import parse_obj, count_table, count_topic_data_table, \
+    count_table_approximately
 from watchmen.database.singleton import singleton
-from watchmen.database.storage.exception.exception import OptimisticLockError
+from watchmen.database.storage.exception.exception import InsertConflictError, OptimisticLockError
 from watchmen.database.storage.storage_interface import StorageInterface
+from watchmen.database.storage.utils.aggregate_utils import apply_aggregate, having_avg, merge_avg, \
+    revert_aggregate
+from watchmen.database.storage.utils.bulk_utils import insert_in_chunks
+from watchmen.database.storage.utils.keyset_utils import build_keyset, build_next_page_token, decode_page_token, \
+    is_approximate_count, is_keyset_page
+from watchmen.database.storage.utils.row_decoder import RowDecoder, get_row_decoder
+from watchmen.database.storage.utils.statement_cache import StatementCache, build_cached_statement, \
+    register_statement_cache
 from watchmen.database.storage.utils.table_utils import get_primary_key
+from watchmen.topic.factor.factor_index import FactorNameIndex, get_factor_name_index
 
 
 insp = inspect(engine)
 
+statement_cache = StatementCache(settings.STATEMENT_CACHE_SIZE)
+register_statement_cache("mysql", statement_cache)
+
 
 log = logging.getLogger("app." + __name__)
 
@@ -57,9 +73,13 @@ class MysqlStorage(StorageInterface):
                         if k == "!=":
                             return operator.ne(table.c[key.lower()], v)
                         if k == "like":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].like(v)
                             if v != "" or v != '' or v is not None:
                                 return table.c[key.lower()].like("%" + v + "%")
                         if k == "in":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].in_(v)
                             if isinstance(table.c[key.lower()].type, JSON):
                                 if isinstance(v, list):
                                     value_ = ",".join(v)
@@ -77,6 +97,8 @@ class MysqlStorage(StorageInterface):
                                     raise TypeError(
                                         "operator in, the value \"{0}\" is not list or str".format(v))
                         if k == "not-in":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].notin_(v)
                             if isinstance(table.c[key.lower()].type, JSON):
                                 if isinstance(v, list):
                                     value_ = ",".join(v)
@@ -108,6 +130,13 @@ class MysqlStorage(StorageInterface):
                 else:
                     return table.c[key.lower()] == value
 
+    def build_mysql_statement(self, kind: str, table, where, values, build) -> tuple:
+        """
+        the statement is cached by table and the shapes of where and values, only the parameters are changed.
+        return the statement and parameters.
+        """
+        return build_cached_statement(statement_cache, kind, table, where, values, JSON, build)
+
     def build_mysql_updates_expression(self, table, updates, stmt_type: str) -> dict:
         if stmt_type == "insert":
             new_updates = {}
@@ -132,7 +161,7 @@ class MysqlStorage(StorageInterface):
                                     elif k == "_count":
                                         new_updates[key.lower()] = v
                                     elif k == "_avg":
-                                        pass  # todo
+                                        new_updates[key.lower()] = v
                             else:
                                 new_updates[key] = value_
                         else:
@@ -186,6 +215,41 @@ class MysqlStorage(StorageInterface):
                         result.append(new_)
             return result
 
+    @staticmethod
+    def build_mysql_keyset_expression(table, keyset: list, values: list):
+        """
+        rows after the given keyset values, e.g. (a > :a) or (a = :a and b > :b) for keyset (a, b)
+        """
+        result_filters = []
+        for index, (name, direction) in enumerate(keyset):
+            filters = [table.c[keyset[i][0].lower()] == values[i] for i in range(index)]
+            if direction == "desc":
+                filters.append(table.c[name.lower()] < values[index])
+            else:
+                filters.append(table.c[name.lower()] > values[index])
+            result_filters.append(and_(*filters))
+        return or_(*result_filters)
+
+    def build_mysql_page(self, stmt, table, sort, pageable, primary_key) -> tuple:
+        """
+        order by sort and primary key, seek by the page token when it is given, otherwise skip by page number.
+        return the statement, keyset and page number.
+        """
+        keyset = build_keyset(sort, primary_key)
+        if is_keyset_page(pageable):
+            values, page_number = decode_page_token(pageable.pageToken)
+            page_number = page_number + 1
+            stmt = stmt.where(self.build_mysql_keyset_expression(table, keyset, values))
+        else:
+            page_number = pageable.pageNumber
+        for order in self.build_mysql_order(table, keyset):
+            stmt = stmt.order_by(order)
+        if is_keyset_page(pageable):
+            stmt = stmt.limit(pageable.pageSize)
+        else:
+            stmt = stmt.offset(pageable.pageSize * (page_number - 1)).limit(pageable.pageSize)
+        return stmt, keyset, page_number
+
     def insert_one(self, one, model, name):
         table = get_table_by_name(name)
         one_dict: dict = convert_to_dict(one)
@@ -398,50 +462,41 @@ class MysqlStorage(StorageInterface):
         return results
 
     def page_all(self, sort, pageable, model, name) -> DataPage:
-        count = count_table(name)
         table = get_table_by_name(name)
-        stmt = select(table)
-        orders = self.build_mysql_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = stmt.offset(offset).limit(pageable.pageSize)
-        results = []
-        with engine.connect() as conn:
-            cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            res = cursor.fetchall()
-        for row in res:
-            result = {}
-            for index, name in enumerate(columns):
-                result[name] = row[index]
-            results.append(parse_obj(model, result, table))
-        return build_data_pages(pageable, results, count)
+        return self._page_models(select(table), table, sort, pageable, model, name)
 
     def page_(self, where, sort, pageable, model, name) -> DataPage:
-        count = count_table(name)
         table = get_table_by_name(name)
         stmt = select(table).where(self.build_mysql_where_expression(table, where))
-        orders = self.build_mysql_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = stmt.offset(offset).limit(pageable.pageSize)
-        results = []
+        return self._page_models(stmt, table, sort, pageable, model, name)
+
+    def _page_models(self, stmt, table, sort, pageable, model, name) -> DataPage:
+        if is_approximate_count(pageable):
+            count = count_table_approximately(name)
+        else:
+            count = count_table(name)
+        stmt, keyset, page_number = self.build_mysql_page(stmt, table, sort, pageable, get_primary_key(name))
         with engine.connect() as conn:
             cursor = conn.execute(stmt).cursor
             columns = [col[0] for col in cursor.description]
-            res = cursor.fetchall()
-        for row in res:
-            result = {}
-            for index, name in enumerate(columns):
-                result[name] = row[index]
-            results.append(parse_obj(model, result, table))
-        return build_data_pages(pageable, results, count)
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        next_page_token = build_next_page_token(rows[-1] if rows else None, len(rows), keyset, pageable.pageSize,
+                                                page_number, lambda row, key: row.get(key.lower()))
+        return build_data_pages(pageable, [parse_obj(model, row, table) for row in rows], count,
+                                next_page_token, page_number)
 
     def clear_metadata(self):
+        clear_topic_tables()
+        statement_cache.clear()
         metadata.clear()
 
+    def clear_topic_table(self, topic_name=None):
+        if topic_name is None:
+            clear_topic_tables()
+        else:
+            remove_topic_table('topic_' + topic_name)
+        statement_cache.clear()
+
     '''
     topic data interface
     '''
@@ -454,19 +509,58 @@ class MysqlStorage(StorageInterface):
         try:
             table = get_topic_table_by_name(table_name)
             table.drop(engine)
+            remove_topic_table(table_name)
         except NoSuchTableError:
             log.warning("drop table \"{0}\" not existed".format(table_name))
 
+    def topic_data_list_indexes(self, topic_name) -> list:
+        table_name = 'topic_' + topic_name
+        try:
+            with engine.connect() as conn:
+                cursor = conn.execute(text(
+                    "SELECT index_name, count_star FROM performance_schema.table_io_waits_summary_by_index_usage "
+                    "WHERE object_schema = DATABASE() AND object_name = :table_name AND index_name IS NOT NULL"),
+                    {"table_name": table_name}).cursor
+                accesses = {row[0]: row[1] for row in cursor.fetchall()}
+        except DBAPIError:
+            log.warning("index usage of table \"{0}\" is not available".format(table_name))
+            accesses = {}
+        # inspector caches the reflected indexes, use a new one
+        indexes = inspect(engine).get_indexes(table_name)
+        return [{"name": index["name"], "columns": index["column_names"], "accesses": accesses.get(index["name"])}
+                for index in indexes]
+
+    def topic_data_create_index(self, topic_name, index_name, factor_names):
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        columns = [table.c[name.lower()] for name in factor_names]
+        for column in columns:
+            if isinstance(column.type, JSON):
+                raise ValueError("json column \"{0}\" of table \"{1}\" cannot be indexed".format(column.name, table_name))
+        # text column is indexed by prefix
+        lengths = {column.name: 255 for column in columns if isinstance(column.type, Text)}
+        Index(index_name, *columns, mysql_length=lengths).create(engine)
+        remove_topic_table(table_name)
+
+    def topic_data_drop_index(self, topic_name, index_name):
+        table_name = 'topic_' + topic_name
+        preparer = engine.dialect.identifier_preparer
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX {0} ON {1}".format(preparer.quote(index_name), preparer.quote(table_name))))
+        remove_topic_table(table_name)
+
     def topic_data_delete_(self, where, topic_name):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
         if where is None:
-            stmt = delete(table)
+            stmt, params = delete(table), {}
         else:
-            stmt = delete(table).where(self.build_mysql_where_expression(table, where))
+            stmt, params = self.build_mysql_statement(
+                "delete", table, where, None,
+                lambda where_, _: delete(table).where(self.build_mysql_where_expression(table, where_)))
         with engine.connect() as conn:
             with conn.begin():
-                conn.execute(stmt)
+                conn.execute(stmt, params)
 
     def topic_data_insert_one(self, one, topic_name):
         table_name = 'topic_' + topic_name
@@ -476,112 +570,224 @@ class MysqlStorage(StorageInterface):
         stmt = insert(table)
         with engine.connect() as conn:
             with conn.begin():
-                conn.execute(stmt, value)
+                try:
+                    conn.execute(stmt, value)
+                except IntegrityError as e:
+                    raise InsertConflictError("InsertConflict") from e
 
     def topic_data_insert_(self, data, topic_name):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
         values = []
         for instance in data:
-            instance_dict: dict = convert_to_dict(instance)
-            instance_dict['id_'] = get_surrogate_key()
-            value = {}
-            for key in table.c.keys():
-                value[key] = instance_dict.get(key)
+            one_dict: dict = capital_to_lower(convert_to_dict(instance))
+            value = self.build_mysql_updates_expression(table, one_dict, "insert")
             values.append(value)
         stmt = insert(table)
         with engine.connect() as conn:
             with conn.begin():
                 conn.execute(stmt, values)
 
+    def topic_data_insert_bulk(self, data, topic_name, chunk_size=None, chunk_bytes=None) -> dict:
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        values = [self.build_mysql_updates_expression(table, capital_to_lower(convert_to_dict(instance)), "insert")
+                  for instance in data]
+        return insert_in_chunks(engine, insert(table), values, chunk_size or settings.TOPIC_DATA_BULK_CHUNK_SIZE,
+                                chunk_bytes or settings.TOPIC_DATA_BULK_CHUNK_BYTES)
+
     def topic_data_update_one(self, id_: str, one: any, topic_name: str):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
-        stmt = update(table).where(eq(table.c['id_'], id_))
         one_dict = convert_to_dict(one)
         values = self.build_mysql_updates_expression(table, capital_to_lower(one_dict), "update")
-        stmt = stmt.values(values)
+        stmt, params = self.build_mysql_statement(
+            "update", table, {"id_": id_}, values,
+            lambda where_, values_: update(table).where(self.build_mysql_where_expression(table, where_)).values(
+                values_))
         with engine.begin() as conn:
-            conn.execute(stmt)
+            conn.execute(stmt, params)
 
     def topic_data_update_one_with_version(self, id_: str, version_: int, one: any, topic_name: str):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
-        stmt = update(table).where(and_(eq(table.c['id_'], id_), eq(table.c['version_'], version_)))
         one_dict = convert_to_dict(one)
         one_dict['version_'] = version_
         values = self.build_mysql_updates_expression(table, capital_to_lower(one_dict), "update")
-        stmt = stmt.values(values)
+        stmt, params = self.build_mysql_statement(
+            "update", table, {"and": [{"id_": id_}, {"version_": version_}]}, values,
+            lambda where_, values_: update(table).where(self.build_mysql_where_expression(table, where_)).values(
+                values_))
         with engine.begin() as conn:
-            result = conn.execute(stmt)
+            result = conn.execute(stmt, params)
         if result.rowcount == 0:
             raise OptimisticLockError("Optimistic lock error")
 
     def topic_data_update_(self, query_dict, instance, topic_name):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
-        stmt = (update(table).
-                where(self.build_mysql_where_expression(table, query_dict)))
         instance_dict: dict = convert_to_dict(instance)
         values = {}
         for key, value in instance_dict.items():
             if key != 'id_':
                 if key.lower() in table.c.keys():
                     values[key.lower()] = value
-        stmt = stmt.values(values)
+        stmt, params = self.build_mysql_statement(
+            "update", table, query_dict, values,
+            lambda where_, values_: update(table).where(self.build_mysql_where_expression(table, where_)).values(
+                values_))
         with engine.begin() as conn:
             with conn.begin():
-                conn.execute(stmt)
+                conn.execute(stmt, params)
 
     def topic_data_find_by_id(self, id_: str, topic_name: str) -> any:
         return self.topic_data_find_one({"id_": id_}, topic_name)
 
+    def build_mysql_aggregate_expression(self, table, updates) -> dict:
+        """
+        _sum and _count are increased by the column itself, so the update is atomic in database.
+        """
+        new_updates = {}
+        for key in table.c.keys():
+            if key == "id_":
+                continue
+            elif key == "version_":
+                new_updates[key] = table.c[key] + 1
+            elif updates.get(key) is None:
+                continue
+            elif isinstance(table.c[key].type, JSON):
+                new_updates[key] = updates.get(key)
+            elif isinstance(updates.get(key), dict):
+                for k, v in updates.get(key).items():
+                    if k == "_sum" or k == "_count":
+                        new_updates[key] = func.coalesce(table.c[key], 0) + v
+                    elif k == "_avg":
+                        new_updates[key] = v
+            else:
+                new_updates[key] = updates.get(key)
+        return new_updates
+
+    def topic_data_aggregate_one(self, where, one, topic_name) -> any:
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        with engine.connect() as conn:
+            with conn.begin():
+                if having_avg(one):
+                    return self._aggregate_topic_data_one_with_lock(conn, table, where, one, topic_name)
+                # the row is resolved and locked first, so exactly one row is increased even if more are matched
+                stmt = select(table.c['id_']).where(self.build_mysql_where_expression(table, where))
+                row = conn.execute(stmt.limit(1).with_for_update()).first()
+                if row is None:
+                    return None
+                values = self.build_mysql_aggregate_expression(table, capital_to_lower(convert_to_dict(one)))
+                conn.execute(update(table).where(eq(table.c['id_'], row[0])).values(values))
+                stmt = select(table).where(eq(table.c['id_'], row[0]))
+                new = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        return revert_aggregate(new, one), new
+
+    def _aggregate_topic_data_one_with_lock(self, conn, table, where, one, topic_name) -> any:
+        """
+        the average needs the count of averaged values, so the row is locked and read before update.
+        """
+        stmt = select(table).where(self.build_mysql_where_expression(table, where)).limit(1).with_for_update()
+        old = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        if old is None:
+            return None
+        values = self.build_mysql_aggregate_expression(table, capital_to_lower(merge_avg(old, one)))
+        conn.execute(update(table).where(eq(table.c['id_'], old['id_'])).values(values))
+        stmt = select(table).where(eq(table.c['id_'], old['id_']))
+        new = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        return old, new
+
+    def topic_data_upsert_one(self, where, insert_one, update_one, topic_name) -> tuple:
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        with engine.connect() as conn:
+            with conn.begin():
+                try:
+                    return self._upsert_topic_data_one(conn, table, where, insert_one, update_one, topic_name)
+                except IntegrityError as e:
+                    raise InsertConflictError("InsertConflict") from e
+
+    def topic_data_upsert_(self, where_list, insert_list, update_list, topic_name) -> list:
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        results = []
+        with engine.connect() as conn:
+            with conn.begin():
+                try:
+                    for where, insert_one, update_one in zip(where_list, insert_list, update_list):
+                        results.append(
+                            self._upsert_topic_data_one(conn, table, where, insert_one, update_one, topic_name))
+                except IntegrityError as e:
+                    raise InsertConflictError("InsertConflict") from e
+        return results
+
+    def _upsert_topic_data_one(self, conn, table, where, insert_one, update_one, topic_name) -> tuple:
+        """
+        the matched row is locked by "select ... for update", then written by one
+        "insert ... on duplicate key update" statement keyed on id_,
+        a new id_ is inserted and the id_ of matched row is updated.
+        the read cannot be folded into the write: topic tables have no unique key on the factors of "by",
+        so the duplicate key can only be id_ of the matched row, and the old image, which is the trigger data
+        of update and the base of _avg, is not returned by the write. the lock keeps it until commit.
+        return the old and new images of row, old image is None when the row is inserted.
+        """
+        stmt = select(table).where(self.build_mysql_where_expression(table, where)).limit(1).with_for_update()
+        old = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        if having_avg(update_one):
+            insert_one = merge_avg({}, insert_one)
+            update_one = merge_avg(old or {}, update_one)
+        insert_dict: dict = capital_to_lower(convert_to_dict(insert_one))
+        values = self.build_mysql_updates_expression(table, insert_dict, "insert")
+        update_dict: dict = capital_to_lower(convert_to_dict(update_one))
+        if old is not None:
+            values['id_'] = old['id_']
+            update_dict['version_'] = old.get('version_') or 0
+        else:
+            update_dict['version_'] = 0
+        updates = self.build_mysql_updates_expression(table, update_dict, "update")
+        updates.pop('id_', None)
+        conn.execute(insert(table).values(values).on_duplicate_key_update(updates))
+        if old is None:
+            return None, {**apply_aggregate({}, insert_one), 'id_': values['id_']}
+        else:
+            return old, apply_aggregate(old, update_one)
+
+    def _fetch_topic_data_one(self, cursor, table, topic_name):
+        decoder = self._get_topic_row_decoder(table, cursor, topic_name)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return decoder.decode(row)
+
     def topic_data_find_one(self, where, topic_name) -> any:
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
-        stmt = select(table).where(self.build_mysql_where_expression(table, where))
+        stmt, params = self.build_mysql_statement("select", table, where, None,
+                                                  lambda where_, _: select(table).where(self.build_mysql_where_expression(table, where_)))
         with engine.connect() as conn:
-            cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
+            cursor = conn.execute(stmt, params).cursor
+            decoder = self._get_topic_row_decoder(table, cursor, topic_name)
             row = cursor.fetchone()
         if row is None:
             return None
         else:
-            result = {}
-            for index, name in enumerate(columns):
-                if isinstance(table.c[name.lower()].type, JSON):
-                    if row[index] is not None:
-                        result[name] = json.loads(row[index])
-                    else:
-                        result[name] = None
-                else:
-                    result[name] = row[index]
-            return self._convert_dict_key(result, topic_name)
+            return decoder.decode(row)
 
     def topic_data_find_(self, where, topic_name):
         table_name = 'topic_' + topic_name
         table = get_topic_table_by_name(table_name)
-        stmt = select(table).where(self.build_mysql_where_expression(table, where))
+        stmt, params = self.build_mysql_statement("select", table, where, None,
+                                                  lambda where_, _: select(table).where(self.build_mysql_where_expression(table, where_)))
         with engine.connect() as conn:
-            cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
+            cursor = conn.execute(stmt, params).cursor
+            decoder = self._get_topic_row_decoder(table, cursor, topic_name)
             res = cursor.fetchall()
         if res is None:
             return None
         else:
-            results = []
-            for row in res:
-                result = {}
-                for index, name in enumerate(columns):
-                    if isinstance(table.c[name.lower()].type, JSON):
-                        if row[index] is not None:
-                            result[name] = json.loads(row[index])
-                        else:
-                            result[name] = None
-                    else:
-                        result[name] = row[index]
-                results.append(result)
-            return self._convert_list_elements_key(results, topic_name)
+            return decoder.decode_all(res)
 
     def topic_data_list_all(self, topic_name) -> list:
         table_name = 'topic_' + topic_name
@@ -589,69 +795,80 @@ class MysqlStorage(StorageInterface):
         stmt = select(table)
         with engine.connect() as conn:
             cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            res = cursor.fetchall()
-            if res is None:
-                return None
+            if self._check_topic_type(topic_name) == "raw":
+                decoder = get_row_decoder(table, [col[0] for col in cursor.description], JSON)
+                res = cursor.fetchall()
+                if res is None:
+                    return None
+                return [result['data_'] for result in decoder.decode_all(res)]
             else:
-                results = []
-                for row in res:
-                    result = {}
-                    for index, name in enumerate(columns):
-                        if isinstance(table.c[name.lower()].type, JSON):
-                            if row[index] is not None:
-                                result[name] = json.loads(row[index])
-                            else:
-                                result[name] = None
-                        else:
-                            result[name] = row[index]
-                    if self._check_topic_type(topic_name) == "raw":
-                        results.append(result['data_'])
-                    else:
-                        results.append(result)
-                if self._check_topic_type(topic_name) == "raw":
-                    return results
-                else:
-                    return self._convert_list_elements_key(results, topic_name)
+                decoder = self._get_topic_row_decoder(table, cursor, topic_name)
+                res = cursor.fetchall()
+                if res is None:
+                    return None
+                return decoder.decode_all(res)
+
+    def topic_data_iter_(self, where, topic_name, batch_size=None):
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        stmt, params = self.build_mysql_statement("select", table, where, None,
+                                                  lambda where_, _: select(table).where(self.build_mysql_where_expression(table, where_)))
+        yield from self._stream_topic_data(stmt, table, topic_name, batch_size, params)
+
+    def topic_data_scan_(self, topic_name, batch_size=None):
+        table_name = 'topic_' + topic_name
+        table = get_topic_table_by_name(table_name)
+        if self._check_topic_type(topic_name) == "raw":
+            for result in self._stream_topic_data(select(table), table, None, batch_size):
+                yield result['data_']
+        else:
+            yield from self._stream_topic_data(select(table), table, topic_name, batch_size)
+
+    def _stream_topic_data(self, stmt, table, topic_name, batch_size, params=None):
+        """
+        rows are fetched by server side cursor (SSCursor), json cells are loaded by dialect
+        """
+        batch_size = batch_size or settings.TOPIC_DATA_STREAM_BATCH_SIZE
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(stmt,
+                                                                                                    params or {})
+            if topic_name is None:
+                decoder = get_row_decoder(table, list(result.keys()), None)
+            else:
+                factor_names = self._get_topic_factor_index(topic_name).names
+                decoder = get_row_decoder(table, list(result.keys()), None, factor_names)
+            for rows in result.partitions(batch_size):
+                for row in rows:
+                    yield decoder.decode(row)
 
     def topic_data_page_(self, where, sort, pageable, model, name) -> DataPage:
         table_name = build_collection_name(name)
-        count = count_topic_data_table(table_name)
+        if is_approximate_count(pageable):
+            count = count_table_approximately(table_name)
+        else:
+            count = count_topic_data_table(table_name)
         table = get_topic_table_by_name(table_name)
         stmt = select(table).where(self.build_mysql_where_expression(table, where))
-        orders = self.build_mysql_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = stmt.offset(offset).limit(pageable.pageSize)
-        results = []
+        stmt, keyset, page_number = self.build_mysql_page(stmt, table, sort, pageable, "id_")
         with engine.connect() as conn:
             cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            res = cursor.fetchall()
+            decoder = get_row_decoder(table, [col[0] for col in cursor.description], JSON)
+            rows = decoder.decode_all(cursor.fetchall())
         if self._check_topic_type(name) == "raw":
-            for row in res:
-                result = {}
-                for index, name in enumerate(columns):
-                    if name == "data_":
-                        result.update(json.loads(row[index]))
-                    results.append(result)
+            results = [row['data_'] for row in rows]
+        elif model is not None:
+            results = [parse_obj(model, row, table) for row in rows]
         else:
-            for row in res:
-                result = {}
-                for index, name in enumerate(columns):
-                    if isinstance(table.c[name.lower()].type, JSON):
-                        if row[index] is not None:
-                            result[name] = json.loads(row[index])
-                        else:
-                            result[name] = None
-                    else:
-                        result[name] = row[index]
-                if model is not None:
-                    results.append(parse_obj(model, result, table))
-                else:
-                    results.append(result)
-        return build_data_pages(pageable, results, count)
+            results = rows
+        next_page_token = build_next_page_token(rows[-1] if rows else None, len(rows), keyset, pageable.pageSize,
+                                                page_number, lambda row, key: row.get(key.lower()))
+        return build_data_pages(pageable, results, count, next_page_token, page_number)
+
+    def get_topic_factor_names(self, topic_name) -> tuple:
+        """
+        names of the factors of topic, the topic is loaded once and cached
+        """
+        return self._get_topic_factor_index(topic_name).names
 
     '''
         internal method
@@ -672,6 +889,11 @@ class MysqlStorage(StorageInterface):
             cacheman[COLUMNS_BY_TABLE_NAME].set(table_name, columns)
             return columns
 
+    def _get_topic_row_decoder(self, table, cursor, topic_name) -> RowDecoder:
+        columns = [col[0] for col in cursor.description]
+        factor_names = self._get_topic_factor_index(topic_name).names
+        return get_row_decoder(table, columns, JSON, factor_names)
+
     def _check_topic_type(self, topic_name):
         topic = self._get_topic(topic_name)
         return topic['type']
@@ -681,6 +903,9 @@ class MysqlStorage(StorageInterface):
         factors = topic['factors']
         return factors
 
+    def _get_topic_factor_index(self, topic_name) -> FactorNameIndex:
+        return get_factor_name_index(self._get_topic(topic_name), lambda topic: topic['factors'])
+
     def _get_topic(self, topic_name) -> any:
         if cacheman[TOPIC_DICT_BY_NAME].get(topic_name) is not None:
             return cacheman[TOPIC_DICT_BY_NAME].get(topic_name)
@@ -709,12 +934,12 @@ class MysqlStorage(StorageInterface):
     def _convert_list_elements_key(self, list_info, topic_name):
         if list_info is None:
             return None
-        new_dict = {}
         new_list = []
-        factors = self._get_topic_factors(topic_name)
+        factor_columns = self._get_topic_factor_index(topic_name).columns
         for item in list_info:
-            for factor in factors:
-                new_dict[factor['name']] = item[factor['name'].lower()]
+            new_dict = {}
+            for name, column in factor_columns:
+                new_dict[name] = item[column]
                 new_dict['id_'] = item['id_']
                 if 'tenant_id_' in item:
                     new_dict['tenant_id_'] = item.get("tenant_id_", 1)
@@ -733,9 +958,8 @@ class MysqlStorage(StorageInterface):
         if dict_info is None:
             return None
         new_dict = {}
-        factors = self._get_topic_factors(topic_name)
-        for factor in factors:
-            new_dict[factor['name']] = dict_info[factor['name'].lower()]
+        for name, column in self._get_topic_factor_index(topic_name).columns:
+            new_dict[name] = dict_info[column]
         new_dict['id_'] = dict_info['id_']
         if 'tenant_id_' in dict_info:
             new_dict['tenant_id_'] = dict_info.get("tenant_id_", 1)
@@ -37,6 +37,17 @@ def count_table(table_name):
     return result[0]
 
 
+def count_table_approximately(table_name):
+    """
+    the row count of table statistics, it is estimated for innodb
+    """
+    stmt = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = :table_name'
+    with engine.connect() as conn:
+        cursor = conn.execute(text(stmt), {"table_name": table_name}).cursor
+        result = cursor.fetchone()
+    return 0 if result is None or result[0] is None else result[0]
+
+
 def count_topic_data_table(table_name):
     stmt = 'SELECT count(%s) AS count FROM %s' % ('id_', table_name)
     with engine.connect() as conn:
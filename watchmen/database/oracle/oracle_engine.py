@@ -1,4 +1,5 @@
 import json
+import time
 
 import cx_Oracle
 from sqlalchemy import create_engine
@@ -6,6 +7,7 @@ from sqlalchemy.pool import NullPool
 
 from watchmen.common.utils.date_utils import DateTimeEncoder
 from watchmen.config.config import settings
+from watchmen.database.storage.pool_monitor import PoolMetrics, register_pool
 
 
 def dumps(o):
@@ -31,9 +33,26 @@ if settings.ORACLE_SID == "" and settings.ORACLE_SERVICE != "":
 
 pool = cx_Oracle.SessionPool(
     settings.ORACLE_USER, settings.ORACLE_PASSWORD, dsn=dsn,
-    min=10, max=10, increment=0, threaded=True, getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT
+    min=settings.ORACLE_POOL_MIN, max=settings.ORACLE_POOL_MAX, increment=settings.ORACLE_POOL_INCREMENT,
+    threaded=True, timeout=settings.ORACLE_POOL_TIMEOUT,
+    getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT if settings.ORACLE_POOL_WAIT_TIMEOUT > 0 else cx_Oracle.SPOOL_ATTRVAL_WAIT,
+    wait_timeout=settings.ORACLE_POOL_WAIT_TIMEOUT
 )
 
+pool_metrics = PoolMetrics()
+
+
+def acquire():
+    waited = pool.busy >= pool.opened >= pool.max
+    start = time.perf_counter()
+    connection = pool.acquire()
+    pool_metrics.record_checkout(time.perf_counter() - start, waited, pool.busy)
+    return connection
+
+
+register_pool("oracle", lambda: {"size": pool.max, "opened": pool.opened, "inUse": pool.busy,
+                                 **pool_metrics.snapshot()})
+
 # engine = create_engine(connection_url, future=True)
-engine = create_engine("oracle+cx_oracle://", creator=pool.acquire,
+engine = create_engine("oracle+cx_oracle://", creator=acquire,
                        poolclass=NullPool, coerce_to_decimal=False, echo=False, optimize_limits=True)
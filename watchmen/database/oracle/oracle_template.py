@@ -7,28 +7,44 @@ from operator import eq
 
 
 from sqlalchemy import update, and_, or_, delete, CLOB, desc, asc, \
-    text, func, inspect
+    text, func, inspect, Index
 from sqlalchemy.dialects.mysql import insert
-from sqlalchemy.exc import NoSuchTableError, IntegrityError
+from sqlalchemy.exc import NoSuchTableError, IntegrityError, DBAPIError
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import BindParameter
 
 from watchmen.common.cache.cache_manage import cacheman, COLUMNS_BY_TABLE_NAME, TOPIC_DICT_BY_NAME
 from watchmen.common.data_page import DataPage
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 from watchmen.common.utils.data_utils import build_data_pages, build_collection_name, convert_to_dict, capital_to_lower
 
+from watchmen.config.config import settings
 from watchmen.database.oracle.oracle_engine import engine, dumps
-from watchmen.database.oracle.oracle_utils import parse_obj, count_table, count_topic_data_table
-from watchmen.database.oracle.table_definition import get_table_by_name, metadata, get_topic_table_by_name
+from watchmen.database.oracle.oracle_utils import parse_obj, count_table, count_topic_data_table, \
+    count_table_approximately
+from watchmen.database.oracle.table_definition import get_table_by_name, metadata, get_topic_table_by_name, \
+    remove_topic_table, clear_topic_tables
 from watchmen.database.singleton import singleton
 from watchmen.database.storage.exception.exception import InsertConflictError, OptimisticLockError
 from watchmen.database.storage.storage_interface import StorageInterface
+from watchmen.database.storage.utils.aggregate_utils import apply_aggregate, having_avg, merge_avg, \
+    revert_aggregate
+from watchmen.database.storage.utils.bulk_utils import insert_in_chunks
+from watchmen.database.storage.utils.keyset_utils import build_keyset, build_next_page_token, decode_page_token, \
+    is_approximate_count, is_keyset_page
+from watchmen.database.storage.utils.row_decoder import RowDecoder, get_row_decoder
+from watchmen.database.storage.utils.statement_cache import StatementCache, build_cached_statement, \
+    register_statement_cache
 from watchmen.database.storage.utils.table_utils import get_primary_key
+from watchmen.topic.factor.factor_index import FactorNameIndex, get_factor_name_index
 
 
 insp = inspect(engine)
 
+statement_cache = StatementCache(settings.STATEMENT_CACHE_SIZE)
+register_statement_cache("oracle", statement_cache)
+
 
 log = logging.getLogger("app." + __name__)
 
@@ -58,9 +74,13 @@ class OracleStorage(StorageInterface):
                         if k == "!=":
                             return operator.ne(table.c[key.lower()], v)
                         if k == "like":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].like(v)
                             if v != "" or v != '' or v is not None:
                                 return table.c[key.lower()].like("%" + v + "%")
                         if k == "in":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].in_(v)
                             if isinstance(table.c[key.lower()].type, CLOB):
                                 if isinstance(v, list):
                                     value_ = ",".join(v)
@@ -78,6 +98,8 @@ class OracleStorage(StorageInterface):
                                     raise TypeError(
                                         "operator in, the value \"{0}\" is not list or str".format(v))
                         if k == "not-in":
+                            if isinstance(v, BindParameter):
+                                return table.c[key.lower()].notin_(v)
                             if isinstance(table.c[key.lower()].type, CLOB):
                                 if isinstance(v, list):
                                     value_ = ",".join(v)
@@ -109,6 +131,13 @@ class OracleStorage(StorageInterface):
                 else:
                     return table.c[key.lower()] == value
 
+    def build_oracle_statement(self, kind: str, table, where, values, build) -> tuple:
+        """
+        the statement is cached by table and the shapes of where and values, only the parameters are changed.
+        return the statement and parameters.
+        """
+        return build_cached_statement(statement_cache, kind, table, where, values, CLOB, build)
+
     def build_oracle_updates_expression(self, table, updates, stmt_type: str) -> dict:
         if stmt_type == "insert":
             new_updates = {}
@@ -171,6 +200,43 @@ class OracleStorage(StorageInterface):
                                 new_updates[key] = value_
             return new_updates
 
+    @staticmethod
+    def build_oracle_keyset_expression(table, keyset: list, values: list):
+        """
+        rows after the given keyset values, e.g. (a > :a) or (a = :a and b > :b) for keyset (a, b)
+        """
+        result_filters = []
+        for index, (name, direction) in enumerate(keyset):
+            filters = [table.c[keyset[i][0].lower()] == values[i] for i in range(index)]
+            if direction == "desc":
+                filters.append(table.c[name.lower()] < values[index])
+            else:
+                filters.append(table.c[name.lower()] > values[index])
+            result_filters.append(and_(*filters))
+        return or_(*result_filters)
+
+    def build_oracle_page(self, stmt, table, sort, pageable, primary_key) -> tuple:
+        """
+        order by sort and primary key, seek by the page token when it is given, otherwise skip by page number.
+        the keyset values are bound, not rendered as literal, since datetime literal is not supported.
+        return the statement, parameters, keyset and page number.
+        """
+        keyset = build_keyset(sort, primary_key)
+        if is_keyset_page(pageable):
+            values, page_number = decode_page_token(pageable.pageToken)
+            stmt = stmt.where(self.build_oracle_keyset_expression(table, keyset, values))
+            for order in self.build_oracle_order(table, keyset):
+                stmt = stmt.order_by(order)
+            return stmt.limit(pageable.pageSize), {}, keyset, page_number + 1
+        else:
+            for order in self.build_oracle_order(table, keyset):
+                stmt = stmt.order_by(order)
+            offset = pageable.pageSize * (pageable.pageNumber - 1)
+            stmt = text(str(
+                stmt.compile(
+                    compile_kwargs={"literal_binds": True})) + " OFFSET :offset ROWS FETCH NEXT :maxnumrows ROWS ONLY")
+            return stmt, {"offset": offset, "maxnumrows": pageable.pageSize}, keyset, pageable.pageNumber
+
     def build_oracle_order(self, table, order_: list):
         result = []
         if order_ is None:
@@ -384,46 +450,29 @@ class OracleStorage(StorageInterface):
         return result
 
     def page_all(self, sort, pageable, model, name) -> DataPage:
-        count = count_table(name)
         table = get_table_by_name(name)
-        stmt = select(table)
-        orders = self.build_oracle_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = text(str(
-            stmt.compile(
-                compile_kwargs={"literal_binds": True})) + " OFFSET :offset ROWS FETCH NEXT :maxnumrows ROWS ONLY")
-        result = []
-        with engine.connect() as conn:
-            cursor = conn.execute(stmt, {"offset": offset, "maxnumrows": pageable.pageSize}).cursor
-            columns = [col[0] for col in cursor.description]
-            cursor.rowfactory = lambda *args: dict(zip(columns, args))
-            res = cursor.fetchall()
-        for row in res:
-            result.append(parse_obj(model, row, table))
-        return build_data_pages(pageable, result, count)
+        return self._page_models(select(table), table, sort, pageable, model, name)
 
     def page_(self, where, sort, pageable, model, name) -> DataPage:
-        count = count_table(name)
         table = get_table_by_name(name)
         stmt = select(table).where(self.build_oracle_where_expression(table, where))
-        orders = self.build_oracle_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = text(str(
-            stmt.compile(
-                compile_kwargs={"literal_binds": True})) + " OFFSET :offset ROWS FETCH NEXT :maxnumrows ROWS ONLY")
-        result = []
+        return self._page_models(stmt, table, sort, pageable, model, name)
+
+    def _page_models(self, stmt, table, sort, pageable, model, name) -> DataPage:
+        if is_approximate_count(pageable):
+            count = count_table_approximately(name)
+        else:
+            count = count_table(name)
+        stmt, params, keyset, page_number = self.build_oracle_page(stmt, table, sort, pageable, get_primary_key(name))
         with engine.connect() as conn:
-            cursor = conn.execute(stmt, {"offset": offset, "maxnumrows": pageable.pageSize}).cursor
+            cursor = conn.execute(stmt, params).cursor
             columns = [col[0] for col in cursor.description]
             cursor.rowfactory = lambda *args: dict(zip(columns, args))
             res = cursor.fetchall()
-        for row in res:
-            result.append(parse_obj(model, row, table))
-        return build_data_pages(pageable, result, count)
+        next_page_token = build_next_page_token(res[-1] if res else None, len(res), keyset, pageable.pageSize,
+                                                page_number, lambda row, key: row.get(key.upper()))
+        return build_data_pages(pageable, [parse_obj(model, row, table) for row in res], count,
+                                next_page_token, page_number)
 
     '''
     topic data interface
@@ -441,15 +490,50 @@ class OracleStorage(StorageInterface):
         except NoSuchTableError as err:
             log.info("NoSuchTableError: {0}".format(table_name))
 
+    def topic_data_list_indexes(self, topic_name) -> list:
+        table_name = build_collection_name(topic_name)
+        try:
+            # index usage is tracked since 12.2, and needs the privilege to read dba views
+            with engine.connect() as conn:
+                cursor = conn.execute(text(
+                    "SELECT name, total_access_count FROM dba_index_usage WHERE owner = USER")).cursor
+                accesses = {row[0].lower(): row[1] for row in cursor.fetchall()}
+        except DBAPIError:
+            log.warning("index usage of table \"{0}\" is not available".format(table_name))
+            accesses = {}
+        # inspector caches the reflected indexes, use a new one
+        indexes = inspect(engine).get_indexes(table_name)
+        return [{"name": index["name"], "columns": index["column_names"],
+                 "accesses": accesses.get(index["name"].lower(), 0 if accesses else None)}
+                for index in indexes]
+
+    def topic_data_create_index(self, topic_name, index_name, factor_names):
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        columns = [table.c[name.lower()] for name in factor_names]
+        for column in columns:
+            if isinstance(column.type, CLOB):
+                raise ValueError("clob column \"{0}\" of table \"{1}\" cannot be indexed".format(column.name, table_name))
+        Index(index_name, *columns).create(engine)
+        remove_topic_table(table_name)
+
+    def topic_data_drop_index(self, topic_name, index_name):
+        table_name = build_collection_name(topic_name)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX {0}".format(engine.dialect.identifier_preparer.quote(index_name))))
+        remove_topic_table(table_name)
+
     def topic_data_delete_(self, where, topic_name):
         table_name = build_collection_name(topic_name)
         table = get_topic_table_by_name(table_name)
         if where is None:
-            stmt = delete(table)
+            stmt, params = delete(table), {}
         else:
-            stmt = delete(table).where(self.build_oracle_where_expression(table, where))
+            stmt, params = self.build_oracle_statement(
+                "delete", table, where, None,
+                lambda where_, _: delete(table).where(self.build_oracle_where_expression(table, where_)))
         with engine.connect() as conn:
-            conn.execute(stmt)
+            conn.execute(stmt, params)
 
     def topic_data_insert_one(self, one, topic_name):
         table_name = build_collection_name(topic_name)
@@ -462,7 +546,7 @@ class OracleStorage(StorageInterface):
                 try:
                     result = conn.execute(stmt, value)
                 except IntegrityError as e:
-                    raise InsertConflictError("InsertConflict")
+                    raise InsertConflictError("InsertConflict") from e
         return result.rowcount
 
     def topic_data_insert_(self, data, topic_name):
@@ -477,26 +561,38 @@ class OracleStorage(StorageInterface):
         with engine.connect() as conn:
             result = conn.execute(stmt, values)
 
+    def topic_data_insert_bulk(self, data, topic_name, chunk_size=None, chunk_bytes=None) -> dict:
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        values = [self.build_oracle_updates_expression(table, capital_to_lower(convert_to_dict(instance)), "insert")
+                  for instance in data]
+        return insert_in_chunks(engine, table.insert(), values, chunk_size or settings.TOPIC_DATA_BULK_CHUNK_SIZE,
+                                chunk_bytes or settings.TOPIC_DATA_BULK_CHUNK_BYTES)
+
     def topic_data_update_one(self, id_: str, one: any, topic_name: str):
         table_name = build_collection_name(topic_name)
         table = get_topic_table_by_name(table_name)
-        stmt = update(table).where(eq(table.c['id_'], id_))
         one_dict = capital_to_lower(convert_to_dict(one))
         value = self.build_oracle_updates_expression(table, one_dict, "update")
-        stmt = stmt.values(value)
+        stmt, params = self.build_oracle_statement(
+            "update", table, {"id_": id_}, value,
+            lambda where_, values_: update(table).where(self.build_oracle_where_expression(table, where_)).values(
+                values_))
         with engine.begin() as conn:
-            result = conn.execute(stmt)
+            result = conn.execute(stmt, params)
         return result.rowcount
 
     def topic_data_update_one_with_version(self, id_: str, version_: int, one: any, topic_name: str):
         table_name = build_collection_name(topic_name)
         table = get_topic_table_by_name(table_name)
-        stmt = update(table).where(and_(eq(table.c['id_'], id_), eq(table.c['version_'], version_)))
         one_dict = capital_to_lower(convert_to_dict(one))
         value = self.build_oracle_updates_expression(table, one_dict, "update")
-        stmt = stmt.values(value)
+        stmt, params = self.build_oracle_statement(
+            "update", table, {"and": [{"id_": id_}, {"version_": version_}]}, value,
+            lambda where_, values_: update(table).where(self.build_oracle_where_expression(table, where_)).values(
+                values_))
         with engine.begin() as conn:
-            result = conn.execute(stmt)
+            result = conn.execute(stmt, params)
         if result.rowcount == 0:
             raise OptimisticLockError("Optimistic lock error")
 
@@ -517,63 +613,185 @@ class OracleStorage(StorageInterface):
     def topic_data_find_by_id(self, id_: str, topic_name: str) -> any:
         return self.topic_data_find_one({"id_": id_}, topic_name)
 
+    def build_oracle_aggregate_expression(self, table, updates) -> dict:
+        """
+        _sum and _count are increased by the column itself, so the update is atomic in database.
+        """
+        new_updates = {}
+        for key in table.c.keys():
+            if key == "id_":
+                continue
+            elif key == "version_":
+                new_updates[key] = table.c[key] + 1
+            elif updates.get(key) is None:
+                continue
+            elif isinstance(table.c[key].type, CLOB):
+                new_updates[key] = dumps(updates.get(key))
+            elif isinstance(updates.get(key), dict):
+                for k, v in updates.get(key).items():
+                    if k == "_sum" or k == "_count":
+                        new_updates[key] = func.coalesce(table.c[key], 0) + v
+                    elif k == "_avg":
+                        new_updates[key] = v
+            else:
+                new_updates[key] = updates.get(key)
+        return new_updates
+
+    def topic_data_aggregate_one(self, where, one, topic_name) -> any:
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        with engine.connect() as conn:
+            with conn.begin():
+                if having_avg(one):
+                    return self._aggregate_topic_data_one_with_lock(conn, table, where, one, topic_name)
+                # the row is resolved and locked first, so exactly one row is increased even if more are matched
+                stmt = select(table.c['id_']).where(self.build_oracle_where_expression(table, where))
+                row = conn.execute(stmt.with_for_update()).first()
+                if row is None:
+                    return None
+                values = self.build_oracle_aggregate_expression(table, capital_to_lower(convert_to_dict(one)))
+                conn.execute(update(table).where(eq(table.c['id_'], row[0])).values(values))
+                stmt = select(table).where(eq(table.c['id_'], row[0]))
+                new = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        return revert_aggregate(new, one), new
+
+    def _aggregate_topic_data_one_with_lock(self, conn, table, where, one, topic_name) -> any:
+        """
+        the average needs the count of averaged values, so the row is locked and read before update.
+        """
+        stmt = select(table).where(self.build_oracle_where_expression(table, where)).with_for_update()
+        old = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        if old is None:
+            return None
+        values = self.build_oracle_aggregate_expression(table, capital_to_lower(merge_avg(old, one)))
+        conn.execute(update(table).where(eq(table.c['id_'], old['id_'])).values(values))
+        stmt = select(table).where(eq(table.c['id_'], old['id_']))
+        new = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        return old, new
+
+    def topic_data_upsert_one(self, where, insert_one, update_one, topic_name) -> tuple:
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        with engine.connect() as conn:
+            with conn.begin():
+                try:
+                    return self._upsert_topic_data_one(conn, table, where, insert_one, update_one, topic_name)
+                except IntegrityError as e:
+                    raise InsertConflictError("InsertConflict") from e
+
+    def topic_data_upsert_(self, where_list, insert_list, update_list, topic_name) -> list:
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        results = []
+        with engine.connect() as conn:
+            with conn.begin():
+                try:
+                    for where, insert_one, update_one in zip(where_list, insert_list, update_list):
+                        results.append(
+                            self._upsert_topic_data_one(conn, table, where, insert_one, update_one, topic_name))
+                except IntegrityError as e:
+                    raise InsertConflictError("InsertConflict") from e
+        return results
+
+    def _upsert_topic_data_one(self, conn, table, where, insert_one, update_one, topic_name) -> tuple:
+        """
+        the matched row is locked by "select ... for update", then written by one "merge" statement keyed on id_.
+        the read cannot be folded into the merge: "on" of merge matching the factors of "by" is not atomic without
+        a unique key on them, and the old image, which is the trigger data of update and the base of _avg,
+        is not returned by merge. the lock keeps it until commit.
+        return the old and new images of row, old image is None when the row is inserted.
+        """
+        stmt = select(table).where(self.build_oracle_where_expression(table, where)).with_for_update()
+        old = self._fetch_topic_data_one(conn.execute(stmt).cursor, table, topic_name)
+        if having_avg(update_one):
+            insert_one = merge_avg({}, insert_one)
+            update_one = merge_avg(old or {}, update_one)
+        insert_dict = capital_to_lower(convert_to_dict(insert_one))
+        values = self.build_oracle_updates_expression(table, insert_dict, "insert")
+        if old is not None:
+            values['id_'] = old['id_']
+        update_dict = capital_to_lower(convert_to_dict(update_one))
+        merge_stmt, params = self._build_oracle_merge_statement(table, values, update_dict)
+        conn.execute(merge_stmt, params)
+        if old is None:
+            return None, {**apply_aggregate({}, insert_one), 'id_': values['id_']}
+        else:
+            return old, apply_aggregate(old, update_one)
+
+    @staticmethod
+    def _build_oracle_merge_statement(table, values: dict, updates: dict):
+        preparer = engine.dialect.identifier_preparer
+        params = {"id_": values['id_']}
+        insert_columns = []
+        insert_binds = []
+        for index, (key, value) in enumerate(values.items()):
+            params[f"i{index}"] = value
+            insert_columns.append(preparer.quote(key))
+            insert_binds.append(f":i{index}")
+        set_clauses = []
+        for index, key in enumerate(table.c.keys()):
+            column = f"t.{preparer.quote(key)}"
+            if key == "id_":
+                continue
+            elif key == "version_":
+                set_clauses.append(f"{column} = {column} + 1")
+            elif updates.get(key) is None:
+                continue
+            elif isinstance(table.c[key].type, CLOB):
+                params[f"u{index}"] = dumps(updates.get(key))
+                set_clauses.append(f"{column} = :u{index}")
+            elif isinstance(updates.get(key), dict):
+                for k, v in updates.get(key).items():
+                    if k == "_sum" or k == "_count":
+                        params[f"u{index}"] = v
+                    elif k == "_avg":
+                        # the average needs the count of averaged values, it is merged with the locked row first
+                        raise ValueError("_avg of {0} should be merged with the row before merge".format(key))
+                if f"u{index}" in params:
+                    set_clauses.append(f"{column} = {column} + :u{index}")
+            else:
+                params[f"u{index}"] = updates.get(key)
+                set_clauses.append(f"{column} = :u{index}")
+        sql = f"MERGE INTO {preparer.format_table(table)} t USING dual ON (t.{preparer.quote('id_')} = :id_)"
+        if set_clauses:
+            sql += f" WHEN MATCHED THEN UPDATE SET {', '.join(set_clauses)}"
+        sql += f" WHEN NOT MATCHED THEN INSERT ({', '.join(insert_columns)}) VALUES ({', '.join(insert_binds)})"
+        return text(sql), params
+
+    def _fetch_topic_data_one(self, cursor, table, topic_name):
+        decoder = self._get_topic_row_decoder(table, cursor, topic_name)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return decoder.decode(row)
+
     def topic_data_find_one(self, where, topic_name) -> any:
         table_name = build_collection_name(topic_name)
         table = get_topic_table_by_name(table_name)
-        stmt = select(table).where(self.build_oracle_where_expression(table, where))
+        stmt, params = self.build_oracle_statement("select", table, where, None,
+                                                   lambda where_, _: select(table).where(self.build_oracle_where_expression(table, where_)))
         with engine.connect() as conn:
-            cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            cursor.rowfactory = lambda *args: dict(zip(columns, args))
+            cursor = conn.execute(stmt, params).cursor
+            decoder = self._get_topic_row_decoder(table, cursor, topic_name)
             row = cursor.fetchone()
         if row is None:
             return None
         else:
-            result = {}
-            for index, name in enumerate(columns):
-                if isinstance(table.c[name.lower()].type, CLOB):
-                    if row[name] is not None:
-                        result[name] = json.loads(row[name])
-                    else:
-                        result[name] = None
-                else:
-                    result[name] = row[name]
-            return self._convert_dict_key(result, topic_name)
+            return decoder.decode(row)
 
     def topic_data_find_(self, where, topic_name):
         table_name = build_collection_name(topic_name)
         table = get_topic_table_by_name(table_name)
-        stmt = select(table).where(self.build_oracle_where_expression(table, where))
+        stmt, params = self.build_oracle_statement("select", table, where, None,
+                                                   lambda where_, _: select(table).where(self.build_oracle_where_expression(table, where_)))
         with engine.connect() as conn:
-            cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            cursor.rowfactory = lambda *args: dict(zip(columns, args))
+            cursor = conn.execute(stmt, params).cursor
+            decoder = self._get_topic_row_decoder(table, cursor, topic_name)
             rows = cursor.fetchall()
         if rows is None:
             return None
         else:
-            if isinstance(rows, list):
-                results = []
-                for row in rows:
-                    result = {}
-                    for index, name in enumerate(columns):
-                        if isinstance(table.c[name.lower()].type, CLOB):
-                            if row[name] is not None:
-                                result[name] = json.loads(row[name])
-                            else:
-                                result[name] = None
-                        else:
-                            result[name] = row[name]
-                    results.append(self._convert_dict_key(result, topic_name))
-                return results
-            else:
-                result = {}
-                for index, name in enumerate(columns):
-                    if isinstance(table.c[name.lower()].type, CLOB):
-                        result[name] = dumps(rows[index])
-                    else:
-                        result[name] = rows[index]
-                return result
+            return decoder.decode_all(rows)
 
     def topic_data_list_all(self, topic_name) -> list:
         table_name = build_collection_name(topic_name)
@@ -581,50 +799,67 @@ class OracleStorage(StorageInterface):
         stmt = select(table)
         with engine.connect() as conn:
             cursor = conn.execute(stmt).cursor
-            columns = [col[0] for col in cursor.description]
-            cursor.rowfactory = lambda *args: dict(zip(columns, args))
-            rows = cursor.fetchall()
+            if self._check_topic_type(topic_name) == "raw":
+                decoder = get_row_decoder(table, [col[0] for col in cursor.description], CLOB)
+                rows = cursor.fetchall()
+                if rows is None:
+                    return None
+                return [result['DATA_'] for result in decoder.decode_all(rows)]
+            else:
+                decoder = self._get_topic_row_decoder(table, cursor, topic_name)
+                rows = cursor.fetchall()
+                if rows is None:
+                    return None
+                return decoder.decode_all(rows)
+
+    def topic_data_iter_(self, where, topic_name, batch_size=None):
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        stmt, params = self.build_oracle_statement("select", table, where, None,
+                                                   lambda where_, _: select(table).where(self.build_oracle_where_expression(table, where_)))
+        yield from self._stream_topic_data(stmt, table, topic_name, batch_size, params)
+
+    def topic_data_scan_(self, topic_name, batch_size=None):
+        table_name = build_collection_name(topic_name)
+        table = get_topic_table_by_name(table_name)
+        if self._check_topic_type(topic_name) == "raw":
+            for result in self._stream_topic_data(select(table), table, None, batch_size):
+                yield result['DATA_']
+        else:
+            yield from self._stream_topic_data(select(table), table, topic_name, batch_size)
 
-            if rows is None:
-                return None
+    def _stream_topic_data(self, stmt, table, topic_name, batch_size, params=None):
+        """
+        rows are fetched batch by batch, the arraysize of cursor is tuned to batch size to save round trips
+        """
+        batch_size = batch_size or settings.TOPIC_DATA_STREAM_BATCH_SIZE
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(stmt,
+                                                                                                    params or {})
+            result.cursor.arraysize = batch_size
+            # the keys of result are lower case, the column names of cursor are upper case as other readers
+            columns = [col[0] for col in result.cursor.description]
+            if topic_name is None:
+                decoder = get_row_decoder(table, columns, CLOB)
             else:
-                results = []
+                factor_names = self._get_topic_factor_index(topic_name).names
+                decoder = get_row_decoder(table, columns, CLOB, factor_names, str.upper)
+            for rows in result.partitions(batch_size):
                 for row in rows:
-                    result = {}
-                    for index, name in enumerate(columns):
-                        if isinstance(table.c[name.lower()].type, CLOB):
-                            if row[name] is not None:
-                                result[name] = json.loads(row[name])
-                            else:
-                                result[name] = None
-                        else:
-                            print(name)
-                            print(row)
-                            result[name] = row[name]
-                    if self._check_topic_type(topic_name) == "raw":
-                        results.append(result['DATA_'])
-                    else:
-                        results.append(result)
-                if self._check_topic_type(topic_name) == "raw":
-                    return results
-                else:
-                    return self._convert_list_elements_key(results, topic_name)
+                    yield decoder.decode(row)
 
     def topic_data_page_(self, where, sort, pageable, model, name) -> DataPage:
         table_name = build_collection_name(name)
-        count = count_topic_data_table(table_name)
+        if is_approximate_count(pageable):
+            count = count_table_approximately(table_name)
+        else:
+            count = count_topic_data_table(table_name)
         table = get_topic_table_by_name(table_name)
         stmt = select(table).where(self.build_oracle_where_expression(table, where))
-        orders = self.build_oracle_order(table, sort)
-        for order in orders:
-            stmt = stmt.order_by(order)
-        offset = pageable.pageSize * (pageable.pageNumber - 1)
-        stmt = text(str(
-            stmt.compile(
-                compile_kwargs={"literal_binds": True})) + " OFFSET :offset ROWS FETCH NEXT :maxnumrows ROWS ONLY")
+        stmt, params, keyset, page_number = self.build_oracle_page(stmt, table, sort, pageable, "id_")
         result = []
         with engine.connect() as conn:
-            cursor = conn.execute(stmt, {"offset": offset, "maxnumrows": pageable.pageSize}).cursor
+            cursor = conn.execute(stmt, params).cursor
             columns = [col[0] for col in cursor.description]
             cursor.rowfactory = lambda *args: dict(zip(columns, args))
             res = cursor.fetchall()
@@ -637,12 +872,23 @@ class OracleStorage(StorageInterface):
                     result.append(parse_obj(model, row, table))
                 else:
                     result.append(row)
-        return build_data_pages(pageable, result, count)
+        next_page_token = build_next_page_token(res[-1] if res else None, len(res), keyset, pageable.pageSize,
+                                                page_number, lambda row, key: row.get(key.upper()))
+        return build_data_pages(pageable, result, count, next_page_token, page_number)
 
     @staticmethod
     def clear_metadata():
+        clear_topic_tables()
+        statement_cache.clear()
         metadata.clear()
 
+    def clear_topic_table(self, topic_name=None):
+        if topic_name is None:
+            clear_topic_tables()
+        else:
+            remove_topic_table(build_collection_name(topic_name))
+        statement_cache.clear()
+
     '''
     protected method, used by class own method
     '''
@@ -658,49 +904,6 @@ class OracleStorage(StorageInterface):
             if column["name"] == column_name:
                 return column["default"]
 
-    def _convert_dict_key(self, dict_info, topic_name):
-        if dict_info is None:
-            return None
-        new_dict = {}
-        factors = self._get_topic_factors(topic_name)
-        for factor in factors:
-            new_dict[factor['name']] = dict_info[factor['name'].upper()]
-        new_dict['id_'] = dict_info['ID_']
-        if 'TENANT_ID_' in dict_info:
-            new_dict['tenant_id_'] = dict_info.get("TENANT_ID_", 1)
-        if "INSERT_TIME_" in dict_info:
-            new_dict['insert_time_'] = dict_info.get("INSERT_TIME_", datetime.now().replace(tzinfo=None))
-        if "UPDATE_TIME_" in dict_info:
-            new_dict['update_time_'] = dict_info.get("UPDATE_TIME_", datetime.now().replace(tzinfo=None))
-        if "VERSION_" in dict_info:
-            new_dict['version_'] = dict_info.get("VERSION_", 0)
-        if "AGGREGATE_ASSIST_" in dict_info:
-            new_dict['aggregate_assist_'] = dict_info.get("AGGREGATE_ASSIST_")
-        return new_dict
-
-    def _convert_list_elements_key(self, list_info, topic_name):
-        if list_info is None:
-            return None
-        new_dict = {}
-        new_list = []
-        factors = self._get_topic_factors(topic_name)
-        for item in list_info:
-            for factor in factors:
-                new_dict[factor['name']] = item[factor['name'].upper()]
-                new_dict['id_'] = item['ID_']
-                if 'TENANT_ID_' in item:
-                    new_dict['tenant_id_'] = item.get("TENANT_ID_", 1)
-                if "INSERT_TIME_":
-                    new_dict['insert_time_'] = item.get("INSERT_TIME_", datetime.now().replace(tzinfo=None))
-                if "UPDATE_TIME_":
-                    new_dict['update_time_'] = item.get("UPDATE_TIME_", datetime.now().replace(tzinfo=None))
-                if "VERSION_" in item:
-                    new_dict['version_'] = item.get("VERSION_", 0)
-                if "AGGREGATE_ASSIST_" in item:
-                    new_dict['aggregate_assist_'] = item.get("AGGREGATE_ASSIST_")
-                new_list.append(new_dict)
-        return new_list
-
     @staticmethod
     def _check_value_type(value):
         if isinstance(value, datetime.datetime):
@@ -710,6 +913,11 @@ class OracleStorage(StorageInterface):
         else:
             return value
 
+    def _get_topic_row_decoder(self, table, cursor, topic_name) -> RowDecoder:
+        columns = [col[0] for col in cursor.description]
+        factor_names = self._get_topic_factor_index(topic_name).names
+        return get_row_decoder(table, columns, CLOB, factor_names, str.upper)
+
     def _check_topic_type(self, topic_name):
         topic = self._get_topic(topic_name)
         return topic['TYPE']
@@ -719,6 +927,10 @@ class OracleStorage(StorageInterface):
         factors = json.loads(topic['FACTORS'])
         return factors
 
+    def _get_topic_factor_index(self, topic_name) -> FactorNameIndex:
+        return get_factor_name_index(self._get_topic(topic_name), lambda topic: json.loads(topic['FACTORS']),
+                                     str.upper)
+
     def _get_topic(self, topic_name) -> any:
         if cacheman[TOPIC_DICT_BY_NAME].get(topic_name) is not None:
             return cacheman[TOPIC_DICT_BY_NAME].get(topic_name)
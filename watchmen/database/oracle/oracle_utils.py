@@ -37,6 +37,17 @@ def count_table(table_name):
     return result['COUNT']
 
 
+def count_table_approximately(table_name):
+    """
+    the row count of optimizer statistics, which is refreshed when the table is analyzed
+    """
+    stmt = 'SELECT num_rows AS count FROM user_tables WHERE table_name = :table_name'
+    with engine.connect() as conn:
+        cursor = conn.execute(text(stmt), {"table_name": table_name.upper()}).cursor
+        result = cursor.fetchone()
+    return 0 if result is None or result[0] is None else result[0]
+
+
 def count_topic_data_table(table_name):
     stmt = 'SELECT count(%s) AS count FROM %s' % ('id_', table_name)
     with engine.connect() as conn:
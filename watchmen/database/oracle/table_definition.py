@@ -1,8 +1,13 @@
+import threading
+
 from sqlalchemy import MetaData, Table, Column, String, CLOB, Date, DateTime, Integer
+from watchmen.common.cache.cache_manage import cacheman, TOPIC_TABLE_BY_NAME
 from watchmen.database.oracle.oracle_engine import engine
 
 metadata = MetaData()
 
+topic_table_lock = threading.RLock()
+
 users_table = Table("users", metadata,
                     Column('userid', String(60), primary_key=True),
                     Column('name', String(45), nullable=False),
@@ -239,5 +244,28 @@ def get_table_by_name(table_name):
 
 
 def get_topic_table_by_name(table_name):
-    table = Table(table_name, metadata, extend_existing=False, autoload=True, autoload_with=engine)
+    """
+    the topic tables are reflected once and kept in registry,
+    remove it by remove_topic_table when the topic schema is changed.
+    """
+    table = cacheman[TOPIC_TABLE_BY_NAME].get(table_name)
+    if table is None:
+        with topic_table_lock:
+            table = cacheman[TOPIC_TABLE_BY_NAME].get(table_name)
+            if table is None:
+                table = Table(table_name, metadata, extend_existing=True, autoload=True, autoload_with=engine)
+                cacheman[TOPIC_TABLE_BY_NAME].set(table_name, table)
     return table
+
+
+def remove_topic_table(table_name):
+    with topic_table_lock:
+        cacheman[TOPIC_TABLE_BY_NAME].delete(table_name)
+        table = metadata.tables.get(table_name)
+        if table is not None:
+            metadata.remove(table)
+
+
+def clear_topic_tables():
+    for table_name in list(cacheman[TOPIC_TABLE_BY_NAME].keys()):
+        remove_topic_table(table_name)
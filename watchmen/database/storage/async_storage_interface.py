@@ -0,0 +1,39 @@
+import abc
+
+
+class AsyncStorageInterface(abc.ABC):
+    '''
+    for topic data async storage interface, the methods are same as StorageInterface but awaitable
+    '''
+
+    @abc.abstractmethod
+    async def topic_data_insert_one(self, one: any, topic_name: str) -> tuple:
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_insert_(self, data: list, topic_name: str):
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_update_one(self, id_: str, one: any, topic_name: str):
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_aggregate_one(self, where: dict, one: any, topic_name: str) -> any:
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_upsert_one(self, where: dict, insert_one: any, update_one: any, topic_name: str) -> tuple:
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_find_by_id(self, id_: str, topic_name: str) -> any:
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_find_one(self, where: dict, topic_name: str) -> any:
+        pass
+
+    @abc.abstractmethod
+    async def topic_data_find_(self, where, topic_name):
+        pass
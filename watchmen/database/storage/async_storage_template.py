@@ -0,0 +1,36 @@
+from watchmen.database.storage.engine_adaptor import find_async_template
+from watchmen.database.storage.storage_template import template
+
+async_template = find_async_template(template)
+
+
+async def topic_data_insert_one(one: any, topic_name: str) -> tuple:
+    return await async_template.topic_data_insert_one(one, topic_name)
+
+
+async def topic_data_insert_(data: list, topic_name: str):
+    await async_template.topic_data_insert_(data, topic_name)
+
+
+async def topic_data_update_one(id_: str, one: any, topic_name: str):
+    await async_template.topic_data_update_one(id_, one, topic_name)
+
+
+async def topic_data_aggregate_one(where: dict, one: any, topic_name: str) -> any:
+    return await async_template.topic_data_aggregate_one(where, one, topic_name)
+
+
+async def topic_data_upsert_one(where: dict, insert_one: any, update_one: any, topic_name: str) -> tuple:
+    return await async_template.topic_data_upsert_one(where, insert_one, update_one, topic_name)
+
+
+async def topic_data_find_by_id(id_: str, topic_name: str) -> any:
+    return await async_template.topic_data_find_by_id(id_, topic_name)
+
+
+async def topic_data_find_one(where: dict, topic_name: str) -> any:
+    return await async_template.topic_data_find_one(where, topic_name)
+
+
+async def topic_data_find_(where, topic_name):
+    return await async_template.topic_data_find_(where, topic_name)
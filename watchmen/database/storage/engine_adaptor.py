@@ -1,5 +1,9 @@
+import logging
+
 from watchmen.config.config import settings
 
+log = logging.getLogger("app." + __name__)
+
 MYSQL = "mysql"
 MONGO = "mongo"
 ORACLE = "oracle"
@@ -18,3 +22,21 @@ def find_template():
     elif settings.STORAGE_ENGINE == ORACLE:
         from watchmen.database.oracle.oracle_template import OracleStorage
         return OracleStorage()
+
+
+def find_async_template(template):
+    """
+    mysql and mongo use their asyncio drivers when installed, oracle and the others are bridged by thread pool
+    """
+    from watchmen.database.storage.thread_pool_storage import ThreadPoolStorage
+    try:
+        if settings.STORAGE_ENGINE == MONGO:
+            from watchmen.database.mongo.mongo_async_template import MongoAsyncStorage
+            return MongoAsyncStorage(template)
+        elif settings.STORAGE_ENGINE == MYSQL:
+            from watchmen.database.mysql.mysql_async_template import MysqlAsyncStorage
+            return MysqlAsyncStorage(template)
+    except ImportError as e:
+        log.warning("asyncio driver of {0} is not installed, use thread pool instead, {1}".format(
+            settings.STORAGE_ENGINE, e))
+    return ThreadPoolStorage(template)
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool
+
+pool_stats_providers = {}
+
+
+class PoolMetrics:
+    """
+    checkout latency, wait count and peak in use of connection pool
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.checkout_time_total = 0.0
+        self.checkout_time_max = 0.0
+        self.in_use_max = 0
+
+    def record_checkout(self, elapsed: float, waited: bool, in_use: int):
+        with self.lock:
+            self.checkouts = self.checkouts + 1
+            if waited:
+                self.waits = self.waits + 1
+            self.checkout_time_total = self.checkout_time_total + elapsed
+            self.checkout_time_max = max(self.checkout_time_max, elapsed)
+            self.in_use_max = max(self.in_use_max, in_use)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "checkoutTimeAvgMs": self.checkout_time_total / self.checkouts * 1000 if self.checkouts else 0,
+                "checkoutTimeMaxMs": self.checkout_time_max * 1000,
+                "inUseMax": self.in_use_max
+            }
+
+
+class MonitoredQueuePool(QueuePool):
+    """
+    queue pool which records the metrics of checkout,
+    the checkout is counted as wait when there is no idle connection and no overflow left.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        waited = self._pool.qsize() == 0 and -1 < self._max_overflow <= self._overflow
+        start = time.perf_counter()
+        conn = super()._do_get()
+        self.metrics.record_checkout(time.perf_counter() - start, waited, self.checkedout())
+        return conn
+
+
+def build_queue_pool_stats(pool: MonitoredQueuePool) -> dict:
+    return {
+        "size": pool.size(),
+        "checkedIn": pool.checkedin(),
+        "inUse": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool.metrics.snapshot()
+    }
+
+
+def register_pool(name: str, stats_provider):
+    pool_stats_providers[name] = stats_provider
+
+
+def get_pool_stats() -> dict:
+    return {name: stats_provider() for name, stats_provider in pool_stats_providers.items()}
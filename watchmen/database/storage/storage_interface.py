@@ -1,6 +1,6 @@
 import abc
 from enum import Enum
-from typing import List
+from typing import List, Iterator
 
 from pydantic.main import BaseModel
 
@@ -15,6 +15,8 @@ class OrderType(Enum):
 class Pageable(BaseModel):
     pageSize: int = None
     pageNumber: int = None
+    pageToken: str = None
+    approximateCount: bool = False
 
 
 class DataPage(BaseModel):
@@ -23,6 +25,7 @@ class DataPage(BaseModel):
     pageNumber: int = None
     pageSize: int = None
     pageCount: int = None
+    nextPageToken: str = None
 
 
 class StorageInterface(abc.ABC):
@@ -128,6 +131,15 @@ class StorageInterface(abc.ABC):
     def topic_data_insert_(self, data: list, topic_name: str):
         pass
 
+    @abc.abstractmethod
+    def topic_data_insert_bulk(self, data: list, topic_name: str, chunk_size: int = None,
+                               chunk_bytes: int = None) -> dict:
+        """
+        insert chunk by chunk, the failed rows are reported by their index in data and do not abort others.
+        return {"inserted": count, "failed": [{"index": index, "error": message}]}
+        """
+        pass
+
     @abc.abstractmethod
     def topic_data_delete_(self, where, name):
         pass
@@ -147,6 +159,27 @@ class StorageInterface(abc.ABC):
     def topic_data_update_(self, where: dict, updates: dict, name: str):
         pass
 
+    @abc.abstractmethod
+    def topic_data_aggregate_one(self, where: dict, one: any, topic_name: str) -> any:
+        """
+        update the row matched by where in one atomic statement, _sum and _count are increased in database.
+        return (old, new) images of row, or None when nothing matched.
+        """
+        pass
+
+    @abc.abstractmethod
+    def topic_data_upsert_one(self, where: dict, insert_one: any, update_one: any, topic_name: str) -> tuple:
+        """
+        update the row matched by where with update_one, or insert insert_one when nothing matched.
+        return (old, new) images of row, old is None when the row is inserted.
+        raise InsertConflictError when the insert is conflicted with a row inserted by another writer.
+        """
+        pass
+
+    def topic_data_upsert_(self, where_list: list, insert_list: list, update_list: list, topic_name: str) -> list:
+        return [self.topic_data_upsert_one(where, insert_one, update_one, topic_name)
+                for where, insert_one, update_one in zip(where_list, insert_list, update_list)]
+
     @abc.abstractmethod
     def topic_data_find_by_id(self, id_: str, topic_name: str) -> any:
         pass
@@ -163,6 +196,36 @@ class StorageInterface(abc.ABC):
     def topic_data_list_all(self, topic_name) -> list:
         pass
 
+    @abc.abstractmethod
+    def topic_data_list_indexes(self, topic_name: str) -> list:
+        """
+        the secondary indexes of topic, primary key is not included.
+        each one is {"name", "columns", "accesses"}, accesses is none when the usage statistics is not available.
+        """
+        pass
+
+    @abc.abstractmethod
+    def topic_data_create_index(self, topic_name: str, index_name: str, factor_names: list):
+        pass
+
+    @abc.abstractmethod
+    def topic_data_drop_index(self, topic_name: str, index_name: str):
+        pass
+
+    @abc.abstractmethod
+    def topic_data_iter_(self, where: dict, topic_name: str, batch_size: int = None) -> Iterator:
+        """
+        yield the rows matched by where, rows are fetched from server side cursor batch by batch
+        """
+        pass
+
+    @abc.abstractmethod
+    def topic_data_scan_(self, topic_name: str, batch_size: int = None) -> Iterator:
+        """
+        yield all rows of topic, same as topic_data_list_all but not loaded in memory at once
+        """
+        pass
+
     @abc.abstractmethod
     def topic_data_page_(self, where: dict, sort: list, pageable: Pageable, model: BaseModel, name: str) -> DataPage:
         pass
@@ -170,3 +233,10 @@ class StorageInterface(abc.ABC):
     @abc.abstractmethod
     def clear_metadata(self):
         pass
+
+    def clear_topic_table(self, topic_name: str = None):
+        """
+        forget the reflected table of topic, or of all topics when topic name is not given,
+        the table is reflected again on next access
+        """
+        pass
@@ -1,3 +1,5 @@
+from typing import Iterator
+
 from pydantic.main import BaseModel
 
 from watchmen.database.storage.engine_adaptor import find_template
@@ -130,6 +132,10 @@ def topic_data_insert_(data: list, topic_name: str):
     template.topic_data_insert_(data, topic_name)
 
 
+def topic_data_insert_bulk(data: list, topic_name: str, chunk_size: int = None, chunk_bytes: int = None) -> dict:
+    return template.topic_data_insert_bulk(data, topic_name, chunk_size, chunk_bytes)
+
+
 def topic_data_delete_(where, name):
     template.topic_data_delete_(where, name)
 
@@ -150,6 +156,18 @@ def topic_data_update_(where: dict, updates: dict, name: str):
     template.topic_data_update_(where, updates, name)
 
 
+def topic_data_aggregate_one(where: dict, one: any, topic_name: str) -> any:
+    return template.topic_data_aggregate_one(where, one, topic_name)
+
+
+def topic_data_upsert_one(where: dict, insert_one: any, update_one: any, topic_name: str) -> tuple:
+    return template.topic_data_upsert_one(where, insert_one, update_one, topic_name)
+
+
+def topic_data_upsert_(where_list: list, insert_list: list, update_list: list, topic_name: str) -> list:
+    return template.topic_data_upsert_(where_list, insert_list, update_list, topic_name)
+
+
 def topic_data_find_by_id(id_: str, topic_name: str) -> any:
     return template.topic_data_find_by_id(id_, topic_name)
 
@@ -166,9 +184,33 @@ def topic_data_list_all(topic_name) -> list:
     return template.topic_data_list_all(topic_name)
 
 
+def topic_data_list_indexes(topic_name: str) -> list:
+    return template.topic_data_list_indexes(topic_name)
+
+
+def topic_data_create_index(topic_name: str, index_name: str, factor_names: list):
+    return template.topic_data_create_index(topic_name, index_name, factor_names)
+
+
+def topic_data_drop_index(topic_name: str, index_name: str):
+    return template.topic_data_drop_index(topic_name, index_name)
+
+
+def topic_data_iter_(where: dict, topic_name: str, batch_size: int = None) -> Iterator:
+    return template.topic_data_iter_(where, topic_name, batch_size)
+
+
+def topic_data_scan_(topic_name: str, batch_size: int = None) -> Iterator:
+    return template.topic_data_scan_(topic_name, batch_size)
+
+
 def topic_data_page_(where: dict, sort: list, pageable: Pageable, model: BaseModel, name: str) -> DataPage:
     return template.topic_data_page_(where, sort, pageable, model, name)
 
 
 def clear_metadata():
     template.clear_metadata()
+
+
+def clear_topic_table(topic_name: str = None):
+    template.clear_topic_table(topic_name)
@@ -0,0 +1,50 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from watchmen.config.config import settings
+from watchmen.database.storage.async_storage_interface import AsyncStorageInterface
+from watchmen.database.storage.storage_interface import StorageInterface
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_STORAGE_THREAD_POOL_SIZE,
+                              thread_name_prefix="async-storage")
+
+
+class ThreadPoolStorage(AsyncStorageInterface):
+    """
+    bridge the synchronous storage to async, the calls are run in a thread pool,
+    so the event loop is not blocked by the database driver which has no asyncio support.
+    """
+
+    def __init__(self, storage: StorageInterface):
+        self.storage = storage
+
+    @staticmethod
+    async def run_in_thread(func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+    async def topic_data_insert_one(self, one, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_insert_one, one, topic_name)
+
+    async def topic_data_insert_(self, data, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_insert_, data, topic_name)
+
+    async def topic_data_update_one(self, id_, one, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_update_one, id_, one, topic_name)
+
+    async def topic_data_aggregate_one(self, where, one, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_aggregate_one, where, one, topic_name)
+
+    async def topic_data_upsert_one(self, where, insert_one, update_one, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_upsert_one, where, insert_one, update_one,
+                                        topic_name)
+
+    async def topic_data_find_by_id(self, id_, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_find_by_id, id_, topic_name)
+
+    async def topic_data_find_one(self, where, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_find_one, where, topic_name)
+
+    async def topic_data_find_(self, where, topic_name):
+        return await self.run_in_thread(self.storage.topic_data_find_, where, topic_name)
@@ -0,0 +1,105 @@
+AGGREGATE_ASSIST = "aggregate_assist_"
+AVG_COUNT = "avg_count"
+
+SUM = "_sum"
+COUNT = "_count"
+AVG = "_avg"
+AVG_COUNT_OF_DELTA = "_avg_count"
+
+
+def having_avg(one: dict) -> bool:
+    for value in one.values():
+        if isinstance(value, dict) and AVG in value:
+            return True
+    return False
+
+
+def revert_aggregate(new: dict, one: dict) -> dict:
+    """
+    build the old image from the new image of an atomic aggregate update,
+    the increased value of _sum and _count are taken back, others are the same as new image.
+    """
+    old = {**new}
+    for name, value in one.items():
+        if isinstance(value, dict) and old.get(name) is not None:
+            for k, v in value.items():
+                if (k == SUM or k == COUNT) and v is not None:
+                    old[name] = old[name] - v
+    return old
+
+
+def apply_aggregate(old: dict, one: dict) -> dict:
+    """
+    build the new image from the old image of row and the written values, the reverse of revert_aggregate.
+    _sum and _count are increased, others are overwritten.
+    """
+    new = {**old}
+    for name, value in one.items():
+        if isinstance(value, dict):
+            for k, v in value.items():
+                if (k == SUM or k == COUNT) and v is not None:
+                    new[name] = (new.get(name) or 0) + v
+                elif k == AVG and v is not None:
+                    new[name] = v
+        else:
+            new[name] = value
+    return new
+
+
+def merge_avg(old: dict, one: dict) -> dict:
+    """
+    replace the _avg of one by the new average value of row,
+    the count of averaged values is kept in the aggregate_assist_ of row.
+    the _avg which is merged from several values carries the count of them in _avg_count.
+    """
+    assist = dict(old.get(AGGREGATE_ASSIST) or {})
+    avg_count = dict(assist.get(AVG_COUNT) or {})
+    result = {}
+    for name, value in one.items():
+        if isinstance(value, dict) and AVG in value:
+            current = value[AVG]
+            weight = value.get(AVG_COUNT_OF_DELTA, 1)
+            previous = old.get(name)
+            if current is None:
+                continue
+            count = avg_count.get(name, 0 if previous is None else 1)
+            if previous is None or count == 0:
+                result[name] = current
+            else:
+                result[name] = (previous * count + current * weight) / (count + weight)
+            avg_count[name] = count + weight
+        else:
+            result[name] = value
+    assist[AVG_COUNT] = avg_count
+    result[AGGREGATE_ASSIST] = assist
+    return result
+
+
+def merge_delta(merged: dict, one: dict) -> dict:
+    """
+    merge the mapping results of two writes to the same aggregate row,
+    _sum and _count are added up, _avg is weighted by its count, others are overwritten by the later one.
+    """
+    result = {**merged}
+    for name, value in one.items():
+        previous = result.get(name)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            delta = {**previous}
+            for k, v in value.items():
+                if (k == SUM or k == COUNT) and delta.get(k) is not None and v is not None:
+                    delta[k] = delta[k] + v
+                elif k == AVG and delta.get(AVG) is not None and v is not None:
+                    weight = value.get(AVG_COUNT_OF_DELTA, 1)
+                    count = delta.get(AVG_COUNT_OF_DELTA, 1)
+                    delta[AVG] = (delta[AVG] * count + v * weight) / (count + weight)
+                    delta[AVG_COUNT_OF_DELTA] = count + weight
+                elif k == AVG:
+                    if v is not None:
+                        delta[AVG] = v
+                        delta[AVG_COUNT_OF_DELTA] = value.get(AVG_COUNT_OF_DELTA, 1)
+                elif k != AVG_COUNT_OF_DELTA:
+                    delta[k] = v
+            result[name] = delta
+        else:
+            result[name] = value
+    return result
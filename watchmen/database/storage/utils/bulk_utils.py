@@ -0,0 +1,76 @@
+import logging
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy.exc import DBAPIError
+
+log = logging.getLogger("app." + __name__)
+
+
+def estimate_row_size(row: dict) -> int:
+    """
+    the estimated bytes of row on wire, strings are counted by length, nested values by their text
+    """
+    size = 0
+    for value in row.values():
+        if value is None:
+            size = size + 1
+        elif isinstance(value, (str, bytes)):
+            size = size + len(value)
+        elif isinstance(value, (bool, int, float, Decimal, date)):
+            size = size + 8
+        else:
+            size = size + len(str(value))
+    return size
+
+
+def chunk_rows(rows: list, chunk_size: int, chunk_bytes: int):
+    """
+    yield (offset, chunk), a chunk is closed when it has chunk size rows or its estimated bytes reach chunk bytes.
+    a row larger than chunk bytes is sent in its own chunk.
+    """
+    chunk = []
+    offset = 0
+    size = 0
+    for index, row in enumerate(rows):
+        row_size = estimate_row_size(row) if chunk_bytes else 0
+        if chunk and ((chunk_size and len(chunk) >= chunk_size) or (chunk_bytes and size + row_size > chunk_bytes)):
+            yield offset, chunk
+            chunk = []
+            offset = index
+            size = 0
+        chunk.append(row)
+        size = size + row_size
+    if chunk:
+        yield offset, chunk
+
+
+def build_bulk_result() -> dict:
+    return {"inserted": 0, "failed": []}
+
+
+def add_bulk_failure(result: dict, index: int, error):
+    result["failed"].append({"index": index, "error": str(error)})
+
+
+def insert_in_chunks(engine, stmt, values: list, chunk_size: int, chunk_bytes: int) -> dict:
+    """
+    each chunk is inserted by executemany in one transaction, the driver sends it by batch or array binding.
+    when a chunk fails, its rows are inserted one by one, so the failed rows are reported and others are kept.
+    """
+    result = build_bulk_result()
+    for offset, chunk in chunk_rows(values, chunk_size, chunk_bytes):
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt, chunk)
+            result["inserted"] = result["inserted"] + len(chunk)
+        except DBAPIError as e:
+            log.warning("bulk insert of {0} rows failed, insert them one by one, {1}".format(len(chunk), e.orig))
+            for index, value in enumerate(chunk):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(stmt, value)
+                    result["inserted"] = result["inserted"] + 1
+                except DBAPIError as row_error:
+                    add_bulk_failure(result, offset + index, row_error.orig)
+    return result
@@ -0,0 +1,89 @@
+import base64
+import json
+from datetime import datetime, date
+from decimal import Decimal
+
+from bson import ObjectId
+
+ASC = "asc"
+DESC = "desc"
+
+
+def build_keyset(sort: list, primary_key: str) -> list:
+    """
+    the sort items (name, "asc"/"desc") followed by primary key, which breaks the ties of sort values.
+    the columns of keyset should be indexed, otherwise the seek is not faster than offset.
+    """
+    keyset = [item for item in (sort or []) if isinstance(item, tuple) and item[1] in (ASC, DESC)]
+    if all(name != primary_key for name, _ in keyset):
+        keyset.append((primary_key, ASC))
+    return keyset
+
+
+def is_keyset_page(pageable) -> bool:
+    return getattr(pageable, "pageToken", None) is not None
+
+
+def is_approximate_count(pageable) -> bool:
+    """
+    the pages by token are counted approximately too, the exact count is taken once by the first page
+    """
+    return getattr(pageable, "approximateCount", False) is True or is_keyset_page(pageable)
+
+
+def __encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    elif isinstance(value, date):
+        return {"$d": value.isoformat()}
+    elif isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    elif isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    else:
+        return value
+
+
+def __decode_value(value):
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        elif "$d" in value:
+            return date.fromisoformat(value["$d"])
+        elif "$dec" in value:
+            return Decimal(value["$dec"])
+        elif "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def encode_page_token(values: list, page_number: int) -> str:
+    token = json.dumps({"v": [__encode_value(value) for value in values], "p": page_number}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(page_token: str) -> tuple:
+    """
+    return the keyset values of last row and the page number of previous page
+    """
+    try:
+        token = json.loads(base64.urlsafe_b64decode(page_token.encode("ascii")).decode("utf-8"))
+        return [__decode_value(value) for value in token["v"]], token["p"]
+    except Exception:
+        raise ValueError("page token \"{0}\" is invalid".format(page_token))
+
+
+def build_next_page_token(last_row, row_count: int, keyset: list, page_size: int, page_number: int,
+                          value_of=None) -> str:
+    """
+    no token when the page is not full, or the keyset value of last row is none, which cannot be compared
+    """
+    if last_row is None or row_count < page_size:
+        return None
+    if value_of is None:
+        values = [last_row.get(name) for name, _ in keyset]
+    else:
+        values = [value_of(last_row, name) for name, _ in keyset]
+    if any(value is None for value in values):
+        return None
+    return encode_page_token(values, page_number)
@@ -0,0 +1,97 @@
+import json
+from operator import itemgetter
+
+try:
+    import orjson
+
+
+    def loads(value):
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            # NaN and Infinity written by json.dumps are not accepted by orjson
+            return json.loads(value)
+except ImportError:
+    loads = json.loads
+
+AUDIT_COLUMNS = ["id_", "tenant_id_", "insert_time_", "update_time_", "version_", "aggregate_assist_"]
+
+ROW_DECODERS = "row_decoders"
+
+
+class RowDecoder:
+    """
+    decode the rows of topic table in one pass,
+    the picked cells, json cells and result keys are computed once from the cursor columns.
+    """
+
+    def __init__(self, columns: list, json_columns: set, key_by_column: dict = None):
+        self.columns = tuple(columns)
+        if key_by_column is None:
+            picked = list(enumerate(columns))
+            self.keys = tuple(columns)
+            self.missing = {}
+        else:
+            picked = [(index, column) for index, column in enumerate(columns) if column in key_by_column]
+            self.keys = tuple(key_by_column[column] for _, column in picked)
+            self.missing = {key: None for column, key in key_by_column.items()
+                            if column not in self.columns and key not in AUDIT_COLUMNS}
+        indexes = [index for index, _ in picked]
+        if len(indexes) == 1:
+            index = indexes[0]
+            self.pick = lambda row: (row[index],)
+        else:
+            self.pick = itemgetter(*indexes)
+        self.json_positions = tuple(position for position, (_, column) in enumerate(picked)
+                                    if column in json_columns)
+
+    def decode_tuple(self, row) -> tuple:
+        values = self.pick(row)
+        if self.json_positions:
+            values = list(values)
+            for position in self.json_positions:
+                if values[position] is not None:
+                    values[position] = loads(values[position])
+            values = tuple(values)
+        return values
+
+    def decode(self, row) -> dict:
+        result = dict(zip(self.keys, self.decode_tuple(row)))
+        if self.missing:
+            result.update(self.missing)
+        return result
+
+    def decode_all(self, rows) -> list:
+        return [self.decode(row) for row in rows]
+
+    def decode_all_tuples(self, rows) -> list:
+        """
+        values of each row are in the order of keys
+        """
+        return [self.decode_tuple(row) for row in rows]
+
+
+def get_row_decoder(table, columns: list, json_type, factor_names: list = None, to_column_name=str.lower) -> RowDecoder:
+    """
+    the decoders are kept in table info, so they are dropped with the table when topic schema is changed.
+    when factor names are given, the columns of factors and audit columns are picked and renamed,
+    others are dropped.
+    json type is None when the json cells are loaded by dialect already.
+    """
+    key = (tuple(columns), None if factor_names is None else tuple(factor_names), json_type is None)
+    decoders = table.info.setdefault(ROW_DECODERS, {})
+    decoder = decoders.get(key)
+    if decoder is None:
+        if json_type is None:
+            json_columns = set()
+        else:
+            json_columns = {column for column in columns if isinstance(table.c[column.lower()].type, json_type)}
+        if factor_names is None:
+            key_by_column = None
+        else:
+            key_by_column = {to_column_name(name): name for name in AUDIT_COLUMNS}
+            for name in factor_names:
+                key_by_column[to_column_name(name)] = name
+        decoder = RowDecoder(columns, json_columns, key_by_column)
+        decoders[key] = decoder
+    return decoder
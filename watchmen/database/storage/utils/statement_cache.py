@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import bindparam
+from sqlalchemy.sql import ClauseElement
+
+COMPARISON_OPERATORS = ["=", "!=", ">", ">=", "<", "<="]
+
+statement_caches = {}
+
+
+class StatementCache:
+    """
+    lru cache of statements with bound parameters, keyed by (kind, table, where shape, values shape).
+    the compiled form of statement is kept by sqlalchemy compiled cache, so the expression tree is built
+    and compiled once for each shape, only the parameters are changed.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.statements = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def get(self, key, build):
+        with self.lock:
+            statement = self.statements.get(key)
+            if statement is not None:
+                self.statements.move_to_end(key)
+                self.hits = self.hits + 1
+                return statement
+            self.misses = self.misses + 1
+        statement = build()
+        with self.lock:
+            self.statements[key] = statement
+            if len(self.statements) > self.maxsize:
+                self.statements.popitem(last=False)
+        return statement
+
+    def skip(self):
+        with self.lock:
+            self.uncached = self.uncached + 1
+
+    def clear(self):
+        with self.lock:
+            self.statements.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"size": len(self.statements), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "uncached": self.uncached}
+
+
+def __bind(table, key, value, params: dict, expanding: bool = False):
+    name = "w{0}".format(len(params))
+    params[name] = value
+    return bindparam(name, type_=table.c[key.lower()].type, expanding=expanding)
+
+
+def parameterize_where(table, where: dict, params: dict, json_type) -> tuple:
+    """
+    replace the values of where by bind parameters, in the same way as where expression is built.
+    return the shape of where and the where with bind parameters,
+    the shape is none when where cannot be bound, e.g. the json filter which embeds value in sql text.
+    none value is kept in where since it is built as "is null".
+    """
+    for key, value in where.items():
+        if key == "and" or key == "or":
+            if not isinstance(value, list):
+                return None, None
+            shapes = []
+            bound = []
+            for express in value:
+                shape, bound_express = parameterize_where(table, express, params, json_type)
+                if shape is None:
+                    return None, None
+                shapes.append(shape)
+                bound.append(bound_express)
+            return (key, tuple(shapes)), {key: bound}
+        elif isinstance(value, dict):
+            for k, v in value.items():
+                if v is None:
+                    return (key, k, None), {key: {k: None}}
+                elif k in COMPARISON_OPERATORS:
+                    return (key, k), {key: {k: __bind(table, key, v, params)}}
+                elif k == "like":
+                    return (key, k), {key: {k: __bind(table, key, "%" + v + "%", params)}}
+                elif k == "in" or k == "not-in":
+                    if isinstance(table.c[key.lower()].type, json_type):
+                        return None, None
+                    if isinstance(v, str):
+                        v = v.split(",")
+                    if not isinstance(v, list) or len(v) == 0:
+                        return None, None
+                    return (key, k), {key: {k: __bind(table, key, v, params, True)}}
+                elif k == "between" and isinstance(v, tuple) and len(v) == 2:
+                    return (key, k), {key: {k: (__bind(table, key, v[0], params), __bind(table, key, v[1], params))}}
+                else:
+                    return None, None
+        elif value is None:
+            return (key, None), {key: None}
+        else:
+            return (key,), {key: __bind(table, key, value, params)}
+    return None, None
+
+
+def parameterize_values(table, values: dict, params: dict) -> tuple:
+    """
+    replace the values of update by bind parameters, the shape is none when any value is an expression
+    """
+    bound = {}
+    for key, value in values.items():
+        if isinstance(value, ClauseElement):
+            return None, None
+        name = "u{0}".format(len(params))
+        params[name] = value
+        bound[key] = bindparam(name, type_=table.c[key].type)
+    return tuple(values.keys()), bound
+
+
+def build_cached_statement(cache: StatementCache, kind: str, table, where, values, json_type, build) -> tuple:
+    """
+    build(where, values) builds the statement, it is called with bound where and values when both can be bound,
+    and the statement is cached. otherwise it is called with the given where and values, and not cached.
+    return the statement and its parameters.
+    """
+    params = {}
+    if where is None:
+        where_shape, bound_where = (), None
+    else:
+        where_shape, bound_where = parameterize_where(table, where, params, json_type)
+    if values is None:
+        values_shape, bound_values = (), None
+    else:
+        values_shape, bound_values = parameterize_values(table, values, params)
+    if where_shape is None or values_shape is None:
+        cache.skip()
+        return build(where, values), {}
+    statement = cache.get((kind, table, where_shape, values_shape), lambda: build(bound_where, bound_values))
+    return statement, params
+
+
+def register_statement_cache(name: str, cache: StatementCache):
+    statement_caches[name] = cache
+
+
+def get_statement_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in statement_caches.items()}
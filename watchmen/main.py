@@ -7,7 +7,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from watchmen.config.config import settings
 from watchmen.connector.kafka import kafka_connector
 from watchmen.connector.rabbitmq import rabbit_connector
-from watchmen.routers import admin, console, common, auth, metadata, cache
+from watchmen.pipeline.core.dispatch.dispatch_queue import get_dispatch_queue, shutdown_dispatch_queue
+from watchmen.pipeline.storage.aggregate_buffer import shutdown_aggregate_buffer
+from watchmen.routers import admin, console, common, auth, metadata, cache, monitor
 
 log = logging.getLogger("app." + __name__)
 
@@ -25,6 +27,9 @@ app.add_middleware(
 
 @app.on_event("startup")
 def startup():
+    if settings.PIPELINE_DISPATCH_QUEUE_ON:
+        # replay the triggers left in spill file before accepting new events
+        get_dispatch_queue()
     if settings.CONNECTOR_KAFKA:
         asyncio.create_task(kafka_connector.consume())
     elif settings.CONNECTOR_RABBITMQ:
@@ -32,6 +37,12 @@ def startup():
         asyncio.ensure_future(rabbit_connector.consume(loop))
 
 
+@app.on_event("shutdown")
+def shutdown():
+    shutdown_dispatch_queue()
+    shutdown_aggregate_buffer()
+
+
 log.info("system init rest api")
 
 app.include_router(admin.router)
@@ -40,3 +51,4 @@ app.include_router(common.router)
 app.include_router(auth.router)
 app.include_router(metadata.router)
 app.include_router(cache.router)
+app.include_router(monitor.router)
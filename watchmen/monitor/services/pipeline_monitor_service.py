@@ -1,9 +1,10 @@
+from typing import List
 
 import watchmen.pipeline.index
 from watchmen.collection.model.topic_event import TopicEvent
 from watchmen.common.constants import pipeline_constants
 from watchmen.common.snowflake.snowflake import get_surrogate_key
-from watchmen.database.storage.storage_template import topic_data_insert_one
+from watchmen.database.storage.storage_template import topic_data_insert_one, topic_data_insert_
 
 from watchmen.monitor.model.pipeline_monitor import PipelineRunStatus
 from watchmen.pipeline.model.trigger_type import TriggerType
@@ -27,6 +28,22 @@ def sync_pipeline_monitor_data(pipeline_monitor: PipelineRunStatus):
                                              TriggerType.insert)
 
 
+def sync_pipeline_monitor_data_batch(pipeline_monitor_list: List[PipelineRunStatus]):
+    topic = get_topic("raw_pipeline_monitor")
+    if topic is None:
+        raise Exception("topic name does not exist")
+
+    monitor_data_list = []
+    raw_monitor_data_list = []
+    for pipeline_monitor in pipeline_monitor_list:
+        data = pipeline_monitor.dict()
+        add_audit_columns(data, INSERT)
+        monitor_data_list.append({pipeline_constants.NEW: data, pipeline_constants.OLD: None})
+        raw_monitor_data_list.append({"data_": data, **data})
+    topic_data_insert_(raw_monitor_data_list, topic.name)
+    watchmen.pipeline.index.trigger_pipeline_batch(topic.name, monitor_data_list, TriggerType.insert)
+
+
 def insert_monitor_topic():
     monitor_topic = get_topic_by_name("raw_pipeline_monitor")
     if monitor_topic is None:
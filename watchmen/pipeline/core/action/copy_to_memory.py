@@ -2,7 +2,7 @@ import time
 
 from watchmen.pipeline.core.context.action_context import ActionContext, set_variable, get_variables
 from watchmen.pipeline.core.monitor.model.pipeline_monitor import ActionStatus
-from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter
+from watchmen.pipeline.core.parameter.parse_parameter import parse_action_source
 
 
 def init(action_context: ActionContext):
@@ -20,7 +20,7 @@ def init(action_context: ActionContext):
         action = action_context.action
         variables = get_variables(action_context)
 
-        value_ = parse_parameter(action.source, current_data, variables)
+        value_ = parse_action_source(action_context, current_data, variables)
         set_variable(action_context, action.variableName, value_)
 
         elapsed_time = time.time() - start
@@ -3,7 +3,7 @@ import logging
 import time
 
 from watchmen.pipeline.core.context.action_context import get_variables, ActionContext
-from watchmen.pipeline.core.mapping.parse_mapping import parse_mappings
+from watchmen.pipeline.core.mapping.parse_mapping import parse_action_mappings
 from watchmen.pipeline.core.monitor.model.pipeline_monitor import ActionStatus
 from watchmen.pipeline.storage.write_topic_data import insert_topic_data
 from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
@@ -31,11 +31,11 @@ def init(action_context: ActionContext):
         variables = get_variables(action_context)
 
         log.info("target_topic name: {0}".format(target_topic.name))
-        mappings_results, having_aggregate_functions = parse_mappings(action.mapping,
-                                                                      target_topic,
-                                                                      previous_data,
-                                                                      current_data,
-                                                                      variables)
+        mappings_results, having_aggregate_functions = parse_action_mappings(action_context,
+                                                                             target_topic,
+                                                                             previous_data,
+                                                                             current_data,
+                                                                             variables)
         status.mapping = mappings_results
         trigger_pipeline_data_list = [insert_topic_data(target_topic.name,
                                                         mappings_results,
@@ -3,7 +3,7 @@ import time
 
 from watchmen.pipeline.core.by.parse_on_parameter import parse_parameter_joint
 from watchmen.pipeline.core.context.action_context import get_variables, ActionContext
-from watchmen.pipeline.core.mapping.parse_mapping import parse_mappings
+from watchmen.pipeline.core.mapping.parse_mapping import parse_action_mappings
 from watchmen.pipeline.core.monitor.model.pipeline_monitor import ActionStatus
 from watchmen.pipeline.storage.read_topic_data import query_topic_data
 from watchmen.pipeline.storage.write_topic_data import update_topic_data
@@ -34,11 +34,11 @@ def init(action_context: ActionContext):
         variables = get_variables(action_context)
 
         # if there are aggregate functions, need lock the record to update
-        mappings_results, having_aggregate_functions = parse_mappings(action.mapping,
-                                                                      target_topic,
-                                                                      previous_data,
-                                                                      current_data,
-                                                                      variables)
+        mappings_results, having_aggregate_functions = parse_action_mappings(action_context,
+                                                                             target_topic,
+                                                                             previous_data,
+                                                                             current_data,
+                                                                             variables)
         status.mapping = mappings_results
 
         where_ = parse_parameter_joint(action.by, current_data, variables, pipeline_topic, target_topic)
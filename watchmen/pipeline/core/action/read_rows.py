@@ -1,9 +1,9 @@
 import time
 
 from watchmen.pipeline.core.by.parse_on_parameter import parse_parameter_joint
-from watchmen.pipeline.core.context.action_context import ActionContext, set_variable
+from watchmen.pipeline.core.context.action_context import ActionContext, set_variable, get_variables
 from watchmen.pipeline.core.monitor.model.pipeline_monitor import ActionStatus
-from watchmen.pipeline.storage.read_topic_data import query_topic_data
+from watchmen.pipeline.storage.read_topic_data import query_multiple_topic_data
 from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
 
 
@@ -22,11 +22,14 @@ def init(action_context: ActionContext):
         action = action_context.action
 
         target_topic = get_topic_by_id(action.topicId)
+        pipeline_topic = action_context.unitContext.stageContext.pipelineContext.pipelineTopic
+
+        variables = get_variables(action_context)
 
         where_ = parse_parameter_joint(action.by, current_data, variables, pipeline_topic, target_topic)
         status.whereConditions = where_
 
-        target_data = query_topic_data(where_, target_topic.name)
+        target_data = query_multiple_topic_data(where_, target_topic.name)
 
         if target_data is not None:
             if isinstance(target_data, list):
@@ -5,7 +5,7 @@ from decimal import Decimal
 from watchmen.pipeline.core.by.parse_on_parameter import parse_parameter_joint
 from watchmen.pipeline.core.context.action_context import ActionContext, get_variables
 from watchmen.pipeline.core.monitor.model.pipeline_monitor import ActionStatus
-from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter
+from watchmen.pipeline.core.parameter.parse_parameter import parse_action_source
 from watchmen.pipeline.core.parameter.utils import check_and_convert_value_by_factor
 from watchmen.pipeline.storage.read_topic_data import query_topic_data
 from watchmen.pipeline.storage.write_topic_data import update_topic_data_one
@@ -42,17 +42,16 @@ def init(action_context: ActionContext):
                                            target_topic.name)
 
             target_factor = get_factor(action.factorId, target_topic)
-            source_ = action.source
             arithmetic = action.arithmetic
 
             result = None
-            current_value_ = check_and_convert_value_by_factor(target_factor,
-                                                               parse_parameter(source_, current_data, variables))
+            current_value_ = check_and_convert_value_by_factor(
+                target_factor, parse_action_source(action_context, current_data, variables))
             if arithmetic is None or arithmetic == "none":  # mean AS IS
                 result = {target_factor.name: current_value_}
             elif arithmetic == "sum":
-                previous_value_ = check_and_convert_value_by_factor(target_factor,
-                                                                    parse_parameter(source_, previous_data, variables))
+                previous_value_ = check_and_convert_value_by_factor(
+                    target_factor, parse_action_source(action_context, previous_data, variables))
                 if previous_value_ is None:
                     previous_value_ = 0
                 value_ = Decimal(current_value_) - Decimal(previous_value_)
@@ -54,6 +54,9 @@ def flatten(d_):
                         else:
                             values = [out[key + '.' + key2], val2]
                             out[key + '.' + key2] = values
+                    elif isinstance(val2, list):
+                        # copied on first insert, the lists extended above are never the ones of variables
+                        out[key + '.' + key2] = list(val2)
                     else:
                         out[key + '.' + key2] = val2
         else:
@@ -0,0 +1,97 @@
+from watchmen.pipeline.core.compiler.compile_parameter import compile_parameter
+from watchmen.pipeline.core.compiler.vectorize_parameter import vectorize_parameter
+from watchmen.pipeline.core.parameter.utils import check_and_convert_value_by_factor
+from watchmen.pipeline.utils.units_func import get_factor
+from watchmen.topic.topic import Topic
+
+
+def __compile_mapping(mapping, target_topic: Topic):
+    target_factor = get_factor(mapping.factorId, target_topic)
+    factor_name = target_factor.name
+    arithmetic = mapping.arithmetic
+    source_func = compile_parameter(mapping.source)
+
+    def mapping_value(previous_data, current_data, variables):
+        current_value_ = check_and_convert_value_by_factor(target_factor, source_func(current_data, variables))
+        if arithmetic is None or arithmetic == "none":  # mean AS IS
+            return {factor_name: current_value_}
+        elif arithmetic == "sum":
+            previous_value_ = check_and_convert_value_by_factor(target_factor, source_func(previous_data, variables))
+            if previous_value_ is None:
+                previous_value_ = 0
+            return {factor_name: {"_sum": current_value_ - previous_value_}}
+        elif arithmetic == "count":
+            if previous_data is None:
+                return {factor_name: {"_count": 1}}
+            else:
+                return {factor_name: {"_count": 0}}
+        elif arithmetic == "avg":
+            return {factor_name: {"_avg": current_value_}}
+        else:
+            return None
+
+    return mapping_value
+
+
+def compile_mappings(mappings, target_topic: Topic):
+    """
+    compile mappings of action to closure, which returns the same result as parse_mappings,
+    func(previous_data, current_data, variables) -> (mappings_results, having_aggregate_functions)
+    """
+    mapping_funcs = [__compile_mapping(mapping, target_topic) for mapping in mappings]
+    # same as parse_mappings, any mapping marks the aggregate flag
+    having_mappings = len(mapping_funcs) > 0
+
+    def mappings_value(previous_data, current_data, variables):
+        mappings_results = {}
+        for func in mapping_funcs:
+            mappings_results.update(func(previous_data, current_data, variables))
+        return mappings_results, having_mappings
+
+    return mappings_value
+
+
+def __compile_mapping_batch(mapping, target_topic: Topic):
+    target_factor = get_factor(mapping.factorId, target_topic)
+    factor_name = target_factor.name
+    arithmetic = mapping.arithmetic
+    source_func = vectorize_parameter(mapping.source)
+
+    def mapping_values(previous_data_list, current_data_list, variables_list):
+        current_values = [check_and_convert_value_by_factor(target_factor, value)
+                          for value in source_func(current_data_list, variables_list)]
+        if arithmetic is None or arithmetic == "none":  # mean AS IS
+            return [{factor_name: current_value_} for current_value_ in current_values]
+        elif arithmetic == "sum":
+            previous_values = [check_and_convert_value_by_factor(target_factor, value)
+                               for value in source_func(previous_data_list, variables_list)]
+            return [{factor_name: {"_sum": current_value_ - (0 if previous_value_ is None else previous_value_)}}
+                    for current_value_, previous_value_ in zip(current_values, previous_values)]
+        elif arithmetic == "count":
+            return [{factor_name: {"_count": 1 if previous_data is None else 0}}
+                    for previous_data in previous_data_list]
+        elif arithmetic == "avg":
+            return [{factor_name: {"_avg": current_value_}} for current_value_ in current_values]
+        else:
+            return [None] * len(current_values)
+
+    return mapping_values
+
+
+def compile_mappings_batch(mappings, target_topic: Topic):
+    """
+    compile mappings of action for micro-batch, the sources are evaluated by column for all rows,
+    func(previous_data_list, current_data_list, variables_list) -> list of (mappings_results, having_mappings)
+    """
+    mapping_funcs = [__compile_mapping_batch(mapping, target_topic) for mapping in mappings]
+    having_mappings = len(mapping_funcs) > 0
+
+    def mappings_values(previous_data_list, current_data_list, variables_list):
+        mappings_results_list = [{} for _ in current_data_list]
+        for func in mapping_funcs:
+            for mappings_results, result in zip(mappings_results_list,
+                                                func(previous_data_list, current_data_list, variables_list)):
+                mappings_results.update(result)
+        return [(mappings_results, having_mappings) for mappings_results in mappings_results_list]
+
+    return mappings_values
@@ -0,0 +1,250 @@
+import operator
+from decimal import Decimal
+
+import pandas as pd
+
+from watchmen.common.snowflake.snowflake import get_surrogate_key
+from watchmen.pipeline.core.by.parse_on_parameter import __week_number_of_month
+from watchmen.pipeline.core.case.function.utils import parse_constant_expression, AMP, FUNC, \
+    get_variable_with_func_pattern, DOT, get_variable_with_dot_pattern
+from watchmen.pipeline.core.case.model.parameter import Parameter, ParameterJoint
+from watchmen.pipeline.core.parameter.operator.equals import do_equals_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.in_operator import do_in_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.less import do_less_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.less_equals import do_less_equals_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.more import do_more_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.more_equals import do_more_equals_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.not_equals import do_not_equals_with_value_type_check
+from watchmen.pipeline.core.parameter.operator.not_in_operator import do_not_in_with_value_type_check
+from watchmen.pipeline.core.parameter.utils import cal_factor_value, convert_datetime, check_and_convert_value_by_factor
+from watchmen.pipeline.utils.units_func import get_factor
+from watchmen.report.model.column import Operator
+from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
+
+'''
+compile parameter and parameter joint to python closures, the closures are called as func(instance, variables)
+and return the same result as parse_parameter and parse_parameter_joint in parse_parameter module.
+'''
+
+ARITHMETIC_OPERATORS = {
+    Operator.add: operator.add,
+    Operator.subtract: operator.sub,
+    Operator.multiply: operator.mul,
+    Operator.divide: operator.truediv,
+    Operator.modulus: operator.mod
+}
+
+
+def __none(instance, variables):
+    return None
+
+
+def __to_number(value):
+    if value is None:
+        return 0
+    elif isinstance(value, str):
+        if value.lstrip('-').isdigit():
+            return Decimal(value)
+    return value
+
+
+def __raise_not_supported(instance, variables):
+    raise Exception("operator is not supported")
+
+
+def compile_parameter(parameter_: Parameter):
+    if parameter_ is None:
+        return __none
+    if parameter_.kind == "topic":
+        return __compile_topic_parameter(parameter_)
+    elif parameter_.kind == 'constant':
+        return __compile_constant_parameter(parameter_)
+    elif parameter_.kind == 'computed':
+        return __compile_computed_parameter(parameter_)
+    else:
+        return __none
+
+
+def __compile_topic_parameter(parameter_: Parameter):
+    topic = get_topic_by_id(parameter_.topicId)
+    if topic is None or get_factor(parameter_.factorId, topic) is None:
+        # resolve the factor when it is evaluated, same as parse_parameter
+        def unresolved_topic_factor(instance, variables):
+            factor_ = get_factor(parameter_.factorId, get_topic_by_id(parameter_.topicId))
+            return check_and_convert_value_by_factor(factor_, cal_factor_value(instance, factor_))
+
+        return unresolved_topic_factor
+    factor = get_factor(parameter_.factorId, topic)
+
+    def topic_factor(instance, variables):
+        return check_and_convert_value_by_factor(factor, cal_factor_value(instance, factor))
+
+    return topic_factor
+
+
+def __compile_constant_parameter(parameter_: Parameter):
+    value = parameter_.value
+    if value is None:
+        return __none
+    elif value == '':
+        return lambda instance, variables: ''
+
+    for item in parse_constant_expression(value):
+        if item.startswith('{') and item.endswith('}'):
+            return __compile_constant_variable(item.lstrip('{').rstrip('}'))
+    return lambda instance, variables: value
+
+
+def __compile_constant_variable(var_name: str):
+    if var_name.startswith(AMP):
+        real_name = var_name.lstrip('&')
+        if real_name == "nextSeq":
+            return lambda instance, variables: get_surrogate_key()
+        else:
+            return lambda instance, variables: instance.get(real_name)
+    elif var_name == "snowflake":  # use nextSeq, prepare to remove in next version todo
+        return lambda instance, variables: get_surrogate_key()
+    elif FUNC in var_name:
+        return lambda instance, variables: get_variable_with_func_pattern(var_name, variables)
+    elif DOT in var_name:
+        return lambda instance, variables: get_variable_with_dot_pattern(var_name, variables)
+    else:
+        return lambda instance, variables: variables[var_name] if var_name in variables else None
+
+
+def __compile_arithmetic(operator_func, parameter_funcs: list):
+    def arithmetic(instance, variables):
+        result = None
+        left = None
+        for func in parameter_funcs:
+            if left:
+                result = operator_func(left, __to_number(func(instance, variables)))
+            else:
+                left = __to_number(func(instance, variables))
+        return result
+
+    return arithmetic
+
+
+def __compile_date_part(date_part, parameter_func):
+    def date_part_of(instance, variables):
+        return date_part(convert_datetime(parameter_func(instance, variables)))
+
+    return date_part_of
+
+
+def __compile_nullable_date_part(date_part, parameter_func):
+    def date_part_of(instance, variables):
+        result = parameter_func(instance, variables)
+        if result is not None:
+            return date_part(convert_datetime(result))
+        else:
+            return None
+
+    return date_part_of
+
+
+def __half_year_of(value):
+    if value.month <= 6:
+        return 1
+    else:
+        return 2
+
+
+def __compile_computed_parameter(parameter_: Parameter):
+    type_ = parameter_.type
+    if type_ in ARITHMETIC_OPERATORS:
+        return __compile_arithmetic(ARITHMETIC_OPERATORS[type_],
+                                    [compile_parameter(item) for item in parameter_.parameters])
+    elif type_ == "case-then":
+        return __compile_case_then(parameter_.parameters)
+    elif type_ == "year-of":
+        return __compile_nullable_date_part(lambda value: value.year, compile_parameter(parameter_.parameters[0]))
+    elif type_ == "month-of":
+        return __compile_nullable_date_part(lambda value: value.month, compile_parameter(parameter_.parameters[0]))
+    elif type_ == "week-of-year":
+        return __compile_date_part(lambda value: value.isocalendar()[1], compile_parameter(parameter_.parameters[0]))
+    elif type_ == "day-of-week":
+        return __compile_date_part(lambda value: value.weekday(), compile_parameter(parameter_.parameters[0]))
+    elif type_ == "day-of-month":
+        return __compile_date_part(lambda value: __week_number_of_month(value.date()),
+                                   compile_parameter(parameter_.parameters[0]))
+    elif type_ == "quarter-of":
+        return __compile_date_part(lambda value: pd.Timestamp(value).quarter,
+                                   compile_parameter(parameter_.parameters[0]))
+    elif type_ == "half-year-of":
+        return __compile_date_part(__half_year_of, compile_parameter(parameter_.parameters[0]))
+    else:
+        return __raise_not_supported
+
+
+def __compile_case_then(parameters: list):
+    cases = []
+    for param in parameters:
+        if param.on:
+            cases.append((compile_parameter_joint(param.on), compile_parameter(param)))
+        else:
+            cases.append((None, compile_parameter(param)))
+
+    def case_then(instance, variables):
+        default_ = None
+        for condition, value_func in cases:
+            if condition is not None:
+                if condition(instance, variables):
+                    return value_func(instance, variables)
+            else:
+                default_ = value_func(instance, variables)
+        if default_:
+            return default_
+        else:
+            return None
+
+    return case_then
+
+
+def __is_empty(left, right):
+    if left == "":
+        return True
+    return left is None
+
+
+def __is_not_empty(left, right):
+    if left == "":
+        return False
+    return left is not None
+
+
+EXPRESSION_OPERATORS = {
+    "equals": do_equals_with_value_type_check,
+    "not-equals": do_not_equals_with_value_type_check,
+    "empty": __is_empty,
+    "not-empty": __is_not_empty,
+    "more": do_more_with_value_type_check,
+    "more-equals": do_more_equals_with_value_type_check,
+    "less": do_less_with_value_type_check,
+    "less-equals": do_less_equals_with_value_type_check,
+    "in": do_in_with_value_type_check,
+    "not-in": do_not_in_with_value_type_check
+}
+
+
+def compile_parameter_joint(joint: ParameterJoint):
+    if joint.jointType is not None:
+        filters = [compile_parameter_joint(filter_) for filter_ in joint.filters]
+        if joint.jointType == "and":
+            return lambda instance, variables: all(func(instance, variables) for func in filters)
+        elif joint.jointType == "or":
+            return lambda instance, variables: any(func(instance, variables) for func in filters)
+        else:
+            return __none
+    else:
+        if joint.operator not in EXPRESSION_OPERATORS:
+            return __raise_not_supported
+        left_func = compile_parameter(joint.left)
+        right_func = compile_parameter(joint.right)
+        operator_func = EXPRESSION_OPERATORS[joint.operator]
+
+        def expression(instance, variables):
+            return operator_func(left_func(instance, variables), right_func(instance, variables))
+
+        return expression
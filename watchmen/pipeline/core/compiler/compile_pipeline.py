@@ -0,0 +1,122 @@
+import logging
+from typing import List
+
+from watchmen.common.cache.cache_manage import cacheman, PIPELINE_PLAN_BY_ID
+from watchmen.pipeline.core.compiler.compile_mapping import compile_mappings, compile_mappings_batch
+from watchmen.pipeline.core.compiler.compile_parameter import compile_parameter_joint, compile_parameter
+from watchmen.pipeline.core.dependency.unit_dependency import build_waves, build_unit_access, build_stage_access
+from watchmen.pipeline.core.worker.action_worker import get_action_func
+from watchmen.pipeline.model.pipeline import Pipeline, Stage, ProcessUnit, UnitAction
+from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
+
+log = logging.getLogger("app." + __name__)
+
+
+class ActionPlan:
+    action: UnitAction
+    module: any
+    mapping: any = None
+    mapping_batch: any = None
+    source: any = None
+
+    def __init__(self, action, module):
+        self.action = action
+        self.module = module
+
+
+class UnitPlan:
+    unit: ProcessUnit
+    on: any
+    actions: List[ActionPlan]
+
+    def __init__(self, unit, on, actions):
+        self.unit = unit
+        self.on = on
+        self.actions = actions
+
+
+class StagePlan:
+    stage: Stage
+    on: any
+    units: List[UnitPlan]
+    # indexes of units, the units of one wave are independent of each other
+    unit_waves: List[List[int]]
+
+    def __init__(self, stage, on, units, unit_waves=None):
+        self.stage = stage
+        self.on = on
+        self.units = units
+        self.unit_waves = unit_waves or [[index] for index in range(len(units))]
+
+
+class PipelinePlan:
+    pipeline: Pipeline
+    on: any
+    stages: List[StagePlan]
+    stage_waves: List[List[int]]
+
+    def __init__(self, pipeline, on, stages, stage_waves=None):
+        self.pipeline = pipeline
+        self.on = on
+        self.stages = stages
+        self.stage_waves = stage_waves or [[index] for index in range(len(stages))]
+
+
+def __compile_on(conditional):
+    if conditional.on is None:
+        return None
+    return compile_parameter_joint(conditional.on)
+
+
+def compile_action(action: UnitAction) -> ActionPlan:
+    action_plan = ActionPlan(action, get_action_func(action))
+    if action.mapping and action.topicId is not None:
+        try:
+            action_plan.mapping = compile_mappings(action.mapping, get_topic_by_id(action.topicId))
+            action_plan.mapping_batch = compile_mappings_batch(action.mapping, get_topic_by_id(action.topicId))
+        except Exception as e:
+            # keep the interpreted mappings, the action reports the error when it runs
+            log.warning("mappings of action \"{0}\" cannot be compiled: {1}".format(action.actionId, e))
+    if action.source is not None:
+        action_plan.source = compile_parameter(action.source)
+    return action_plan
+
+
+def compile_unit(unit: ProcessUnit) -> UnitPlan:
+    actions = []
+    if unit.do is not None:
+        actions = [compile_action(action) for action in unit.do]
+    return UnitPlan(unit, __compile_on(unit), actions)
+
+
+def compile_stage(stage: Stage) -> StagePlan:
+    return StagePlan(stage, __compile_on(stage), [compile_unit(unit) for unit in stage.units],
+                     build_waves([build_unit_access(unit) for unit in stage.units]))
+
+
+def compile_pipeline(pipeline: Pipeline) -> PipelinePlan:
+    """
+    compile pipeline to a plan, which keeps the resolved action modules, factors and
+    pre-parsed conditions as closures, so the pipeline model is not interpreted again for each row.
+    """
+    return PipelinePlan(pipeline, __compile_on(pipeline), [compile_stage(stage) for stage in pipeline.stages],
+                        build_waves([build_stage_access(stage) for stage in pipeline.stages]))
+
+
+def get_pipeline_plan(pipeline: Pipeline) -> PipelinePlan:
+    """
+    plan is cached by pipeline id rather than the pipeline instance, since the pipeline by id and pipelines by topic
+    caches keep different instances of the same pipeline. the plan is dropped wherever the pipeline or topic is
+    changed, see pipeline storage, topic schema storage and cache router.
+    """
+    cached_plan = cacheman[PIPELINE_PLAN_BY_ID].get(pipeline.pipelineId)
+    if cached_plan is not None:
+        return cached_plan
+    plan = compile_pipeline(pipeline)
+    cacheman[PIPELINE_PLAN_BY_ID].set(pipeline.pipelineId, plan)
+    log.debug("compile pipeline \"{0}\"".format(pipeline.name))
+    return plan
+
+
+def clear_pipeline_plans():
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
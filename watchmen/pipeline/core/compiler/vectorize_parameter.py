@@ -0,0 +1,293 @@
+import operator
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from watchmen.pipeline.core.case.function.utils import parse_constant_expression
+from watchmen.pipeline.core.case.model.parameter import Parameter
+from watchmen.pipeline.core.compiler.compile_parameter import compile_parameter, compile_parameter_joint
+from watchmen.pipeline.core.parameter.utils import convert_datetime, cal_factor_value
+from watchmen.pipeline.utils.units_func import get_factor
+from watchmen.report.model.column import Operator
+from watchmen.topic.factor.factor_index import get_factor_path
+from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
+
+'''
+compile parameter to column functions for micro-batch, the functions are called as func(instances, variables_list)
+and return the values of all rows, same as calling the closure of compile_parameter row by row.
+columns are numpy object arrays, so the values keep their python types, e.g. Decimal, and none is not turned to nan.
+the functions without column form, e.g. day-of-month, and the values read from instance or variables are
+evaluated row by row by the closures of compile_parameter.
+'''
+
+ARITHMETIC_UFUNCS = {
+    Operator.add: np.frompyfunc(operator.add, 2, 1),
+    Operator.subtract: np.frompyfunc(operator.sub, 2, 1),
+    Operator.multiply: np.frompyfunc(operator.mul, 2, 1),
+    Operator.divide: np.frompyfunc(operator.truediv, 2, 1),
+    Operator.modulus: np.frompyfunc(operator.mod, 2, 1)
+}
+
+__is_instance = np.frompyfunc(isinstance, 2, 1)
+__is = np.frompyfunc(operator.is_, 2, 1)
+__to_decimal = np.frompyfunc(Decimal, 1, 1)
+__to_datetime = np.frompyfunc(convert_datetime, 1, 1)
+__type_of = np.frompyfunc(type, 1, 1)
+
+# converters of factor types, same as check_and_convert_value_by_factor for the values which are not empty
+FACTOR_COLUMN_CONVERTERS = {
+    "text": np.frompyfunc(str, 1, 1),
+    "number": __to_decimal,
+    "unsigned": __to_decimal,
+    "datetime": __to_datetime,
+    "year": np.frompyfunc(int, 1, 1),
+    "month": np.frompyfunc(int, 1, 1)
+}
+
+
+def __column(values: list) -> np.ndarray:
+    # filled one by one, so the list or tuple values are kept as elements rather than nested dimensions
+    column = np.empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        column[index] = value
+    return column
+
+
+def __nones(size: int) -> np.ndarray:
+    return np.full(size, None, dtype=object)
+
+
+def __is_none(column: np.ndarray) -> np.ndarray:
+    # identity check, comparing decimal with none by equals is much slower
+    return __is(column, None).astype(bool)
+
+
+def __is_true(column: np.ndarray) -> np.ndarray:
+    return column.astype(bool)
+
+
+def __to_number(column: np.ndarray) -> np.ndarray:
+    """
+    none is 0 and the text of integer is decimal, others are kept as they are
+    """
+    column = column.copy()
+    column[__is_none(column)] = 0
+    strings = np.flatnonzero(__is_instance(column, str).astype(bool))
+    if len(strings):
+        digits = pd.Series(column[strings], dtype=object).str.lstrip('-').str.isdigit().to_numpy(dtype=bool)
+        if digits.any():
+            column[strings[digits]] = __to_decimal(column[strings[digits]])
+    return column
+
+
+def __select(rows: np.ndarray, instances: list, variables_list: list) -> tuple:
+    return [instances[row] for row in rows], [variables_list[row] for row in rows]
+
+
+def vectorize_parameter(parameter_: Parameter):
+    column_func = __vectorize(parameter_)
+
+    def evaluate(instances: list, variables_list: list) -> list:
+        return column_func(instances, variables_list).tolist()
+
+    return evaluate
+
+
+def __vectorize(parameter_: Parameter):
+    if parameter_ is None:
+        return __constant(None)
+    if parameter_.kind == "topic":
+        return __vectorize_topic(parameter_)
+    elif parameter_.kind == 'constant':
+        return __vectorize_constant(parameter_)
+    elif parameter_.kind == 'computed':
+        return __vectorize_computed(parameter_)
+    else:
+        return __constant(None)
+
+
+def __constant(value):
+    def constant(instances, variables_list):
+        column = np.empty(len(instances), dtype=object)
+        column.fill(value)
+        return column
+
+    return constant
+
+
+def __row_by_row(func):
+    def row_by_row(instances, variables_list):
+        return __column([func(instance, variables) for instance, variables in zip(instances, variables_list)])
+
+    return row_by_row
+
+
+def __vectorize_topic(parameter_: Parameter):
+    scalar_func = compile_parameter(parameter_)
+    topic = get_topic_by_id(parameter_.topicId)
+    factor = None if topic is None else get_factor(parameter_.factorId, topic)
+    if factor is None or len(get_factor_path(factor.name)) != 1 or factor.type not in FACTOR_COLUMN_CONVERTERS:
+        return __row_by_row(scalar_func)
+    name = factor.name
+    converter = FACTOR_COLUMN_CONVERTERS[factor.type]
+
+    def topic_factor(instances, variables_list):
+        """
+        read the factor of record structure by column, the tree structure is read row by row
+        """
+        column = __column([instance.get(name) if type(instance) is dict else None for instance in instances])
+        for row in np.flatnonzero(__type_of(column) == list):
+            # same as cal_factor_value, a list of one value is the value, an empty list is none
+            value = column[row]
+            column[row] = value[0] if len(value) == 1 else (None if len(value) == 0 else value)
+        for row, instance in enumerate(instances):
+            if type(instance) is not dict:
+                column[row] = cal_factor_value(instance, factor)
+        types = __type_of(column)
+        empty = __is_none(column)
+        strings = np.flatnonzero(types == str)
+        if len(strings):
+            empty[strings] = np.equal(column[strings], "").astype(bool)
+        present = ~empty
+        result = __nones(len(column))
+        if present.any():
+            try:
+                result[present] = converter(column[present])
+            except Exception:
+                # raises the same error as the scalar path
+                return __row_by_row(scalar_func)(instances, variables_list)
+        return result
+
+    return topic_factor
+
+
+def __vectorize_constant(parameter_: Parameter):
+    if __is_literal(parameter_):
+        return __constant(parameter_.value)
+    # read from instance or variables of each row
+    return __row_by_row(compile_parameter(parameter_))
+
+
+def __vectorize_computed(parameter_: Parameter):
+    type_ = parameter_.type
+    if type_ in ARITHMETIC_UFUNCS:
+        return __vectorize_arithmetic(ARITHMETIC_UFUNCS[type_],
+                                      [__vectorize_number(item) for item in parameter_.parameters])
+    elif type_ == "case-then":
+        return __vectorize_case_then(parameter_.parameters)
+    elif type_ == "year-of":
+        return __vectorize_date_part(lambda index: index.year, parameter_, True)
+    elif type_ == "month-of":
+        return __vectorize_date_part(lambda index: index.month, parameter_, True)
+    elif type_ == "week-of-year":
+        return __vectorize_date_part(lambda index: index.isocalendar().week, parameter_, False)
+    elif type_ == "day-of-week":
+        return __vectorize_date_part(lambda index: index.weekday, parameter_, False)
+    elif type_ == "quarter-of":
+        return __vectorize_date_part(lambda index: index.quarter, parameter_, False)
+    elif type_ == "half-year-of":
+        return __vectorize_date_part(lambda index: np.where(index.month <= 6, 1, 2), parameter_, False)
+    else:
+        return __row_by_row(compile_parameter(parameter_))
+
+
+def __is_literal(parameter_: Parameter) -> bool:
+    if parameter_ is None:
+        return True
+    if parameter_.kind != 'constant':
+        return parameter_.kind not in ["topic", "computed"]
+    if parameter_.value is None or parameter_.value == '':
+        return True
+    return not any(item.startswith('{') and item.endswith('}') for item in parse_constant_expression(parameter_.value))
+
+
+def __vectorize_number(parameter_: Parameter):
+    """
+    the column func of arithmetic operand, the operand is converted to number by column.
+    literal is converted once when compiled.
+    """
+    if __is_literal(parameter_):
+        return __constant(__to_number(__column([compile_parameter(parameter_)(None, None)]))[0])
+    column_func = __vectorize(parameter_)
+    return lambda instances, variables_list: __to_number(column_func(instances, variables_list))
+
+
+def __vectorize_arithmetic(ufunc, column_funcs: list):
+    def arithmetic(instances, variables_list):
+        """
+        same as the closure of compile_parameter, the result is left operated with the last right,
+        and a falsy left is replaced by the next value
+        """
+        result = __nones(len(instances))
+        left = None
+        for column_func in column_funcs:
+            value = column_func(instances, variables_list)
+            if left is None:
+                left = value
+                continue
+            applied = __is_true(left)
+            if applied.any():
+                result[applied] = ufunc(left[applied], value[applied])
+            left = np.where(applied, left, value)
+        return result
+
+    return arithmetic
+
+
+def __vectorize_date_part(date_part, parameter_: Parameter, nullable: bool):
+    column_func = __vectorize(parameter_.parameters[0])
+    scalar_func = compile_parameter(parameter_)
+
+    def date_part_of(instances, variables_list):
+        column = column_func(instances, variables_list)
+        present = ~__is_none(column)
+        if not nullable and not present.all():
+            # raises the same error on none as the scalar path
+            return __row_by_row(scalar_func)(instances, variables_list)
+        result = __nones(len(column))
+        if present.any():
+            try:
+                index = pd.DatetimeIndex(__to_datetime(column[present]))
+            except pd.errors.OutOfBoundsDatetime:
+                return __row_by_row(scalar_func)(instances, variables_list)
+            result[present] = np.asarray(date_part(index), dtype=np.int64).astype(object)
+        return result
+
+    return date_part_of
+
+
+def __vectorize_case_then(parameters: list):
+    cases = []
+    for param in parameters:
+        if param.on:
+            cases.append((compile_parameter_joint(param.on), __vectorize(param)))
+        else:
+            cases.append((None, __vectorize(param)))
+
+    def case_then(instances, variables_list):
+        """
+        conditions are evaluated row by row, the values are evaluated by column for the rows which reach them
+        """
+        size = len(instances)
+        result = __nones(size)
+        default_ = __nones(size)
+        remaining = np.ones(size, dtype=bool)
+        for condition, column_func in cases:
+            rows = np.flatnonzero(remaining)
+            if not len(rows):
+                break
+            row_instances, row_variables_list = __select(rows, instances, variables_list)
+            if condition is not None:
+                matched = np.array([bool(condition(instance, variables))
+                                    for instance, variables in zip(row_instances, row_variables_list)], dtype=bool)
+                if matched.any():
+                    result[rows[matched]] = column_func(*__select(rows[matched], instances, variables_list))
+                    remaining[rows[matched]] = False
+            else:
+                default_[rows] = column_func(row_instances, row_variables_list)
+        fallback = remaining & __is_true(default_)
+        result[fallback] = default_[fallback]
+        return result
+
+    return case_then
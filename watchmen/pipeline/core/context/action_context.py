@@ -1,4 +1,5 @@
-import copy
+from collections import ChainMap
+from typing import Mapping
 
 from watchmen.pipeline.core.context.unit_context import UnitContext
 
@@ -11,24 +12,40 @@ class ActionContext:
     actionStatus: any
     delegateVariableName: str = None
     delegateValue: any = None
+    actionPlan: any = None
+    mappingResult: any = None
 
-    def __init__(self, unitContext, action):
+    def __init__(self, unitContext, action, actionPlan=None):
         self.unitContext = unitContext
         self.action = action
+        self.actionPlan = actionPlan
         self.previousOfTriggerData = unitContext.stageContext.pipelineContext.previousOfTriggerData
         self.currentOfTriggerData = unitContext.stageContext.pipelineContext.currentOfTriggerData
 
 
-def get_variables(actionContext: ActionContext) -> dict:
-    variables = copy.deepcopy(actionContext.unitContext.stageContext.pipelineContext.variables)
-    delegateVariableName = actionContext.delegateVariableName
+def get_variables(actionContext: ActionContext) -> Mapping:
+    """
+    layered scope of variables for action, the delegate variable of loop unit is in the local layer,
+    and the pipeline variables are the parent layer, so nothing is copied.
 
-    delegateValue = actionContext.delegateValue
+    writes on the scope just stay in the local layer, and set_variable replaces the pipeline variables
+    instead of updating them (copy on write), so the scope keeps the variables as they were when it was created.
+    """
+    local_variables = {}
+    delegateVariableName = actionContext.delegateVariableName
     if delegateVariableName is not None and delegateVariableName != "":
-        variables[delegateVariableName] = delegateValue
-    return variables
+        local_variables[delegateVariableName] = actionContext.delegateValue
+    return ChainMap(local_variables, actionContext.unitContext.stageContext.pipelineContext.variables)
 
 
 def set_variable(actionContext: ActionContext, variable_name, variable_value):
-    variables = actionContext.unitContext.stageContext.pipelineContext.variables
-    variables[variable_name] = variable_value
+    """
+    copy on write, each write copies the pipeline variables, it is O(n) on the count of variables.
+    variables are written by copy-to-memory and the read actions (read-row, read-rows, read-factor,
+    read-factors and exists), once per action at most, and a pipeline has a few dozens of them,
+    while they are read by every action, so the reads are kept free of copy and the writes pay for it.
+    the scopes created before the write are not changed by it. it is not synchronized, so the loops with
+    these actions are never run in parallel, see loop executor.
+    """
+    pipeline_context = actionContext.unitContext.stageContext.pipelineContext
+    pipeline_context.variables = {**pipeline_context.variables, variable_name: variable_value}
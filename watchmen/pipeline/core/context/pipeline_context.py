@@ -1,4 +1,5 @@
 from watchmen.monitor.model.pipeline_monitor import PipelineRunStatus
+from watchmen.pipeline.core.context.trigger_buffer import TriggerBuffer
 from watchmen.pipeline.model.pipeline import Pipeline
 from watchmen.topic.topic import Topic
 
@@ -13,7 +14,7 @@ class PipelineContext:
     instanceId: str
     pipelineTopic: Topic
     pipelineStatus: PipelineRunStatus
-    pipeline_trigger_merge_list = []
+    triggerBuffer: TriggerBuffer
 
     def __init__(self, pipeline, data):
         self.pipeline = pipeline
@@ -21,3 +22,4 @@ class PipelineContext:
         self.previousOfTriggerData = data.get("old")
         self.currentOfTriggerData = data.get("new")
         self.variables = {}
+        self.triggerBuffer = TriggerBuffer()
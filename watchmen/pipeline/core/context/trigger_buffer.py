@@ -0,0 +1,85 @@
+import threading
+from collections import deque
+
+from watchmen.database.storage.utils.bulk_utils import estimate_row_size
+
+
+def estimate_trigger_size(trigger_data) -> int:
+    size = 0
+    for value in (trigger_data.data or {}).values():
+        if isinstance(value, dict):
+            size = size + estimate_row_size(value)
+    return size
+
+
+class TriggerBuffer:
+    """
+    the trigger data written by one pipeline run, owned by pipeline context and drained once by the scheduler
+    """
+
+    def __init__(self):
+        self.items = deque()
+        self.count = 0
+        self.bytes = 0
+
+    def append(self, trigger_data):
+        self.items.append(trigger_data)
+        self.count = self.count + 1
+        self.bytes = self.bytes + estimate_trigger_size(trigger_data)
+
+    def extend(self, trigger_data_list):
+        for trigger_data in trigger_data_list:
+            self.append(trigger_data)
+
+    def drain(self) -> list:
+        items = list(self.items)
+        self.items.clear()
+        self.count = 0
+        self.bytes = 0
+        return items
+
+    def __len__(self):
+        return self.count
+
+
+class TriggerBufferStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.count = 0
+        self.bytes = 0
+        self.max_count = 0
+        self.max_bytes = 0
+
+    def record(self, count: int, size: int):
+        with self.lock:
+            self.runs = self.runs + 1
+            self.count = self.count + count
+            self.bytes = self.bytes + size
+            self.max_count = max(self.max_count, count)
+            self.max_bytes = max(self.max_bytes, size)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"runs": self.runs, "count": self.count, "bytes": self.bytes,
+                    "maxCount": self.max_count, "maxBytes": self.max_bytes}
+
+
+trigger_buffer_stats = TriggerBufferStats()
+
+
+def drain_trigger_buffers(buffers: list) -> list:
+    """
+    drain the buffers of one pipeline run, or of all rows of a micro-batch, and record their counters
+    """
+    count = sum(buffer.count for buffer in buffers)
+    size = sum(buffer.bytes for buffer in buffers)
+    trigger_buffer_stats.record(count, size)
+    trigger_data_list = []
+    for buffer in buffers:
+        trigger_data_list.extend(buffer.drain())
+    return trigger_data_list
+
+
+def get_trigger_buffer_stats() -> dict:
+    return trigger_buffer_stats.to_dict()
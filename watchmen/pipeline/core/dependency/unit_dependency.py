@@ -0,0 +1,126 @@
+import re
+
+from watchmen.pipeline.model.pipeline import ProcessUnit, Stage
+
+WRITE_TOPIC_ACTION_TYPES = ["insert-row", "insert-or-merge-row", "merge-row", "write-factor"]
+READ_TOPIC_ACTION_TYPES = ["read-row", "read-rows", "read-factor", "read-factors", "exists"]
+MEMORY_ACTION_TYPES = ["copy-to-memory", "alarm"]
+
+VARIABLE_PATTERN = re.compile(r"\{([^{}]*)\}")
+
+
+class Access:
+    """
+    the variables and topics read and written by a unit or stage.
+    opaque when it cannot be analyzed, e.g. an unknown action type, then it conflicts with all others.
+    """
+
+    def __init__(self):
+        self.read_variables = set()
+        self.write_variables = set()
+        self.read_topics = set()
+        self.write_topics = set()
+        self.opaque = False
+
+    def merge(self, other):
+        self.read_variables |= other.read_variables
+        self.write_variables |= other.write_variables
+        self.read_topics |= other.read_topics
+        self.write_topics |= other.write_topics
+        self.opaque = self.opaque or other.opaque
+
+    def conflicts(self, other) -> bool:
+        if self.opaque or other.opaque:
+            return True
+        if self.write_variables & (other.read_variables | other.write_variables) \
+                or other.write_variables & self.read_variables:
+            return True
+        return bool(self.write_topics & (other.read_topics | other.write_topics)
+                    or other.write_topics & self.read_topics)
+
+
+def __collect_text_variables(text, names: set):
+    if not text:
+        return
+    for name in VARIABLE_PATTERN.findall(text):
+        # "&" refers to trigger data, others are variables, "a.b" and "a.&count" read variable a
+        if not name.startswith("&"):
+            names.add(name.split(".")[0].strip())
+
+
+def __collect_parameter_variables(parameter, names: set):
+    if parameter is None:
+        return
+    if parameter.kind == "constant":
+        __collect_text_variables(parameter.value, names)
+    for sub_parameter in parameter.parameters or []:
+        __collect_parameter_variables(sub_parameter, names)
+    __collect_joint_variables(parameter.on, names)
+
+
+def __collect_joint_variables(joint, names: set):
+    if joint is None:
+        return
+    __collect_parameter_variables(joint.left, names)
+    __collect_parameter_variables(joint.right, names)
+    for filter_ in joint.filters or []:
+        __collect_joint_variables(filter_, names)
+
+
+def collect_joint_variables(joint) -> set:
+    """
+    the names of variables read by joint
+    """
+    names = set()
+    __collect_joint_variables(joint, names)
+    return names
+
+
+def build_unit_access(unit: ProcessUnit) -> Access:
+    access = Access()
+    if unit.loopVariableName:
+        access.read_variables.add(unit.loopVariableName)
+    __collect_joint_variables(unit.on, access.read_variables)
+    for action in unit.do or []:
+        __collect_joint_variables(action.on, access.read_variables)
+        __collect_joint_variables(action.by, access.read_variables)
+        __collect_parameter_variables(action.source, access.read_variables)
+        for mapping in action.mapping or []:
+            __collect_parameter_variables(mapping.source, access.read_variables)
+        if action.type in WRITE_TOPIC_ACTION_TYPES:
+            access.write_topics.add(action.topicId)
+        elif action.type in READ_TOPIC_ACTION_TYPES:
+            access.read_topics.add(action.topicId)
+        elif action.type == "alarm":
+            __collect_text_variables(action.message, access.read_variables)
+        elif action.type not in MEMORY_ACTION_TYPES:
+            access.opaque = True
+        if action.variableName:
+            access.write_variables.add(action.variableName)
+    return access
+
+
+def build_stage_access(stage: Stage) -> Access:
+    access = Access()
+    __collect_joint_variables(stage.on, access.read_variables)
+    for unit in stage.units or []:
+        access.merge(build_unit_access(unit))
+    return access
+
+
+def build_waves(accesses: list) -> list:
+    """
+    group the indexes into waves, an item is put in the wave after all earlier items it conflicts with.
+    the items of one wave are independent of each other, the waves are run one by one.
+    """
+    levels = []
+    for index, access in enumerate(accesses):
+        level = 0
+        for earlier in range(index):
+            if levels[earlier] >= level and access.conflicts(accesses[earlier]):
+                level = levels[earlier] + 1
+        levels.append(level)
+    waves = [[] for _ in range(max(levels) + 1)] if levels else []
+    for index, level in enumerate(levels):
+        waves[level].append(index)
+    return waves
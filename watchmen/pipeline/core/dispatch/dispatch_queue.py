@@ -0,0 +1,253 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from watchmen.auth.user import User
+from watchmen.config.config import settings
+from watchmen.pipeline.core.index import trigger_pipeline_2, trigger_pipeline_batch_2
+from watchmen.pipeline.model.trigger_type import TriggerType
+
+log = logging.getLogger("app." + __name__)
+
+
+class DispatchQueueFullError(Exception):
+    pass
+
+
+class PipelineTrigger:
+    def __init__(self, seq: int, topic_name: str, instances: list, trigger_type: TriggerType, current_user=None,
+                 batch: bool = False):
+        self.seq = seq
+        self.topic_name = topic_name
+        self.instances = instances
+        self.trigger_type = trigger_type
+        self.current_user = current_user
+        self.batch = batch
+        self.enqueued = time.monotonic()
+
+    def to_record(self) -> dict:
+        return {"seq": self.seq, "topic": self.topic_name, "instances": self.instances,
+                "type": self.trigger_type.value, "batch": self.batch,
+                "user": None if self.current_user is None else self.current_user.dict()}
+
+    @staticmethod
+    def from_record(record: dict):
+        user = None if record["user"] is None else User.parse_obj(record["user"])
+        return PipelineTrigger(record["seq"], record["topic"], record["instances"], TriggerType(record["type"]),
+                               user, record["batch"])
+
+
+class SpillFile:
+    """
+    append only journal of pipeline triggers, a trigger is written when enqueued and acknowledged when done.
+    the triggers not acknowledged are replayed after restart, the journal is truncated when the queue is drained.
+    the values which are not json, e.g. datetime, are replayed as their text.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def recover(self) -> list:
+        records = OrderedDict()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line is partial when process crashed while writing
+                        continue
+                    if "ack" in record:
+                        records.pop(record["ack"], None)
+                    else:
+                        records[record["seq"]] = record
+        self.file = open(self.path, "a", encoding="utf-8")
+        return list(records.values())
+
+    def append(self, trigger: PipelineTrigger):
+        self.__write(json.dumps(trigger.to_record(), default=str))
+
+    def ack(self, trigger: PipelineTrigger):
+        self.__write(json.dumps({"ack": trigger.seq}))
+
+    def truncate(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.truncate(0)
+            self.file.seek(0)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __write(self, line: str):
+        with self.lock:
+            if self.file is None:
+                # closed by shutdown, the trigger is replayed after restart
+                return
+            self.file.write(line + "\n")
+            self.file.flush()
+
+
+class PipelineDispatchQueue:
+    """
+    pipeline triggers are enqueued by ingestion and run by worker threads, so the caller is acknowledged after
+    raw data is saved. the queue is bounded, submit waits at most put timeout and then raises queue full error.
+    """
+
+    def __init__(self, workers: int, max_size: int, put_timeout: float, spill_path: str = None):
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.triggers = queue.Queue(maxsize=max_size)
+        self.seq = itertools.count(1)
+        self.lock = threading.Lock()
+        self.pending_by_topic = {}
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.spill_file = None if not spill_path else SpillFile(spill_path)
+        self.threads = []
+
+    def start(self):
+        recovered = []
+        if self.spill_file is not None:
+            recovered = [PipelineTrigger.from_record(record) for record in self.spill_file.recover()]
+            if recovered:
+                log.info("{0} pipeline triggers are recovered from spill file".format(len(recovered)))
+                self.seq = itertools.count(max(trigger.seq for trigger in recovered) + 1)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.__run, name="pipeline-dispatch-{0}".format(index), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        for trigger in recovered:
+            with self.lock:
+                self.__track(trigger)
+            # recovered triggers are in journal already, wait for free slot rather than reject them
+            self.triggers.put(trigger)
+
+    def check_capacity(self):
+        """
+        reject before raw data is saved, so the rejected event can be sent again without duplicate
+        """
+        if self.triggers.full():
+            with self.lock:
+                self.rejected = self.rejected + 1
+            raise DispatchQueueFullError("pipeline dispatch queue is full, size {0}".format(self.triggers.maxsize))
+
+    def submit(self, topic_name: str, instances: list, trigger_type: TriggerType, current_user=None,
+               batch: bool = False, block: bool = True):
+        trigger = PipelineTrigger(next(self.seq), topic_name, instances, trigger_type, current_user, batch)
+        with self.lock:
+            self.__track(trigger)
+            if self.spill_file is not None:
+                self.spill_file.append(trigger)
+        try:
+            self.triggers.put(trigger, block=block, timeout=self.put_timeout if block else None)
+        except queue.Full:
+            with self.lock:
+                self.__done(trigger)
+                self.rejected = self.rejected + 1
+            raise DispatchQueueFullError("pipeline dispatch queue is full, size {0}".format(self.triggers.maxsize))
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            topics = {topic_name: {"pending": len(pending),
+                                   "lag": now - next(iter(pending.values())) if pending else 0}
+                      for topic_name, pending in self.pending_by_topic.items()}
+            return {"depth": self.triggers.qsize(), "maxsize": self.triggers.maxsize, "workers": self.workers,
+                    "processed": self.processed, "failed": self.failed, "rejected": self.rejected,
+                    "topics": topics}
+
+    def shutdown(self, timeout: float = None):
+        """
+        wait for the queued triggers, the ones not done in time are kept in spill file
+        """
+        for _ in self.threads:
+            try:
+                self.triggers.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(timeout)
+        if self.spill_file is not None:
+            self.spill_file.close()
+
+    def __track(self, trigger: PipelineTrigger):
+        self.pending_by_topic.setdefault(trigger.topic_name, OrderedDict())[trigger.seq] = trigger.enqueued
+
+    def __done(self, trigger: PipelineTrigger):
+        """
+        called with lock held, so no trigger is appended to spill file between the drained check and truncate
+        """
+        pending = self.pending_by_topic.get(trigger.topic_name)
+        if pending is not None:
+            pending.pop(trigger.seq, None)
+            if not pending:
+                del self.pending_by_topic[trigger.topic_name]
+        if self.spill_file is not None:
+            if not self.pending_by_topic:
+                self.spill_file.truncate()
+            else:
+                self.spill_file.ack(trigger)
+
+    def __run(self):
+        while True:
+            trigger = self.triggers.get()
+            if trigger is None:
+                break
+            try:
+                if trigger.batch:
+                    trigger_pipeline_batch_2(trigger.topic_name, trigger.instances, trigger.trigger_type,
+                                             trigger.current_user)
+                else:
+                    for instance in trigger.instances:
+                        trigger_pipeline_2(trigger.topic_name, instance, trigger.trigger_type, trigger.current_user)
+                with self.lock:
+                    self.processed = self.processed + 1
+            except Exception as e:
+                log.exception(e)
+                with self.lock:
+                    self.failed = self.failed + 1
+            finally:
+                with self.lock:
+                    self.__done(trigger)
+
+
+dispatch_queue: PipelineDispatchQueue = None
+dispatch_queue_lock = threading.Lock()
+
+
+def get_dispatch_queue() -> PipelineDispatchQueue:
+    global dispatch_queue
+    if dispatch_queue is None:
+        with dispatch_queue_lock:
+            if dispatch_queue is None:
+                dispatch = PipelineDispatchQueue(settings.PIPELINE_DISPATCH_WORKERS,
+                                                 settings.PIPELINE_DISPATCH_QUEUE_SIZE,
+                                                 settings.PIPELINE_DISPATCH_PUT_TIMEOUT,
+                                                 settings.PIPELINE_DISPATCH_SPILL_FILE)
+                dispatch.start()
+                dispatch_queue = dispatch
+    return dispatch_queue
+
+
+def get_dispatch_queue_stats() -> dict:
+    if dispatch_queue is None:
+        return {}
+    return dispatch_queue.stats()
+
+
+def shutdown_dispatch_queue():
+    if dispatch_queue is not None:
+        dispatch_queue.shutdown(settings.PIPELINE_DISPATCH_SHUTDOWN_TIMEOUT)
@@ -1,7 +1,8 @@
 import logging
 
 from watchmen.pipeline.core.context.pipeline_context import PipelineContext
-from watchmen.pipeline.core.worker.pipeline_worker import run_pipeline
+from watchmen.pipeline.core.worker.pipeline_worker import run_pipeline, run_pipeline_batch
+from watchmen.pipeline.core.worker.trigger_scheduler import trigger_cascade
 from watchmen.pipeline.model.trigger_type import TriggerType
 from watchmen.pipeline.storage.pipeline_storage import load_pipeline_by_topic_id
 from watchmen.topic.storage.topic_schema_storage import get_topic
@@ -23,7 +24,19 @@ def __match_trigger_type(trigger_type, pipeline):
 def trigger_pipeline_2(topic_name, instance, trigger_type: TriggerType, current_user=None):
     topic = get_topic(topic_name, current_user)
     pipeline_list = load_pipeline_by_topic_id(topic.topicId, current_user)
-    for pipeline in pipeline_list:
-        if __match_trigger_type(trigger_type, pipeline):
-            pipeline_context = PipelineContext(pipeline, instance)
-            run_pipeline(pipeline_context)
+    with trigger_cascade():
+        for pipeline in pipeline_list:
+            if __match_trigger_type(trigger_type, pipeline):
+                pipeline_context = PipelineContext(pipeline, instance)
+                run_pipeline(pipeline_context)
+
+
+def trigger_pipeline_batch_2(topic_name, instances: list, trigger_type: TriggerType, current_user=None):
+    if not instances:
+        return
+    topic = get_topic(topic_name, current_user)
+    pipeline_list = load_pipeline_by_topic_id(topic.topicId, current_user)
+    with trigger_cascade():
+        for pipeline in pipeline_list:
+            if __match_trigger_type(trigger_type, pipeline):
+                run_pipeline_batch(pipeline, instances)
@@ -1,6 +1,7 @@
 
 from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter
 from watchmen.pipeline.core.parameter.utils import check_and_convert_value_by_factor
+from watchmen.topic.factor.factor_index import get_factor_index
 from watchmen.topic.topic import Topic
 
 
@@ -44,7 +45,19 @@ def parse_mappings(mappings, target_topic, previous_data, current_data, variable
     return mappings_results, having_aggregate_functions
 
 
+def parse_action_mappings(action_context, target_topic, previous_data, current_data, variables):
+    """
+    use the mappings evaluated for micro-batch or the compiled mappings of action plan if exists,
+    otherwise interpret the mappings of action
+    """
+    if action_context.mappingResult is not None:
+        mappings_results, having_aggregate_functions = action_context.mappingResult
+        return dict(mappings_results), having_aggregate_functions
+    action_plan = action_context.actionPlan
+    if action_plan is not None and action_plan.mapping is not None:
+        return action_plan.mapping(previous_data, current_data, variables)
+    return parse_mappings(action_context.action.mapping, target_topic, previous_data, current_data, variables)
+
+
 def get_factor(factor_id, target_topic: Topic):
-    for factor in target_topic.factors:
-        if factor.factorId == factor_id:
-            return factor
+    return get_factor_index(target_topic).by_id.get(factor_id)
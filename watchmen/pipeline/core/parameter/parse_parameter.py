@@ -203,6 +203,16 @@ def parse_parameter(parameter_: Parameter, instance, variables):
             raise Exception("operator is not supported")
 
 
+def parse_action_source(action_context, instance, variables):
+    """
+    use the compiled source of action plan if exists, otherwise interpret the source of action
+    """
+    action_plan = action_context.actionPlan
+    if action_plan is not None and action_plan.source is not None:
+        return action_plan.source(instance, variables)
+    return parse_parameter(action_context.action.source, instance, variables)
+
+
 def parse_mapper_case_then(parameters: List[Parameter], instance, variables) -> any:
     default_ = None
     for param in parameters:
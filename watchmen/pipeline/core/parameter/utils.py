@@ -4,6 +4,7 @@ from decimal import Decimal
 import arrow
 
 from watchmen.topic.factor.factor import Factor
+from watchmen.topic.factor.factor_index import get_factor_path
 
 
 def convert_date(value):
@@ -45,20 +46,26 @@ def cal_factor_value(data_, factor):
 
     if not get value, return None
     """
-    prefix = None
-    result = {}
-    data = data_
-    for name in factor.name.split("."):
-        data, prefix = get_factor_value(data, name, prefix, result)
-    if type(result[factor.name]) is list:
-        if len(result[factor.name]) == 1:
-            return result[factor.name][0]
-        elif len(result[factor.name]) == 0:
+    path = get_factor_path(factor.name)
+    if len(path) == 1 and type(data_) is dict:
+        # record structure, no need to walk the tree
+        value = data_.get(factor.name, None)
+    else:
+        prefix = None
+        result = {}
+        data = data_
+        for name in path:
+            data, prefix = get_factor_value(data, name, prefix, result)
+        value = result[factor.name]
+    if type(value) is list:
+        if len(value) == 1:
+            return value[0]
+        elif len(value) == 0:
             return None
         else:
-            return result[factor.name]
+            return value
     else:
-        return result[factor.name]
+        return value
 
 
 def get_factor_value(data, name, prefix, result):
@@ -165,6 +172,9 @@ def flatten(d_):
                         else:
                             values = [out[key + '.' + key2], val2]
                             out[key + '.' + key2] = values
+                    elif isinstance(val2, list):
+                        # copied on first insert, the lists extended above are never the ones of variables
+                        out[key + '.' + key2] = list(val2)
                     else:
                         out[key + '.' + key2] = val2
 
@@ -1,24 +1,32 @@
 import logging
+import random
 import time
 
 from pydantic import BaseModel
 
+from watchmen.config.config import settings
 from watchmen.database.storage.exception.exception import OptimisticLockError
 
 log = logging.getLogger("app." + __name__)
 
 
 class RetryPolicy(BaseModel):
-    max_attempts: int = 3
+    max_attempts: int = settings.PIPELINE_RETRY_MAX_ATTEMPTS
 
 
 class BackoffPolicy(BaseModel):
-    sleep: int = 1
+    initial: float = settings.PIPELINE_RETRY_BACKOFF_INITIAL
+    maximum: float = settings.PIPELINE_RETRY_BACKOFF_MAX
+    multiplier: float = settings.PIPELINE_RETRY_BACKOFF_MULTIPLIER
 
 
-def backoff(backoffpolicy: BackoffPolicy):
-    seconds_ = backoffpolicy.sleep
-    time.sleep(seconds_)
+def backoff(backoffpolicy: BackoffPolicy, count_: int = 0):
+    """
+    exponential backoff with full jitter, sleep a random time between 0 and initial * multiplier ^ count,
+    the conflicting workers are spread out instead of retrying at the same time.
+    """
+    ceiling = min(backoffpolicy.maximum, backoffpolicy.initial * (backoffpolicy.multiplier ** count_))
+    time.sleep(random.uniform(0, ceiling))
 
 
 def retry_or_not(count_: int, retry_policy: RetryPolicy):
@@ -28,26 +36,28 @@ def retry_or_not(count_: int, retry_policy: RetryPolicy):
         return False
 
 
-def retry_template(retry_callback: tuple, recovery_callback: tuple, retry_policy: RetryPolicy):
+def retry_template(retry_callback: tuple, recovery_callback: tuple, retry_policy: RetryPolicy,
+                   backoff_policy: BackoffPolicy = None):
+    if backoff_policy is None:
+        backoff_policy = BackoffPolicy()
+
     def execute():
         need_retry = True
         count_ = 0
         while need_retry:
             try:
-                retry_callback[0](*retry_callback[1])
-                need_retry = False
+                return retry_callback[0](*retry_callback[1])
             except OptimisticLockError as err:
                 try:
                     if retry_or_not(count_, retry_policy):
                         need_retry = True
-                        count_ = count_ + 1
                         log.info("this can be retried")
-                        backoff(BackoffPolicy())
+                        backoff(backoff_policy, count_)
+                        count_ = count_ + 1
                     else:
                         need_retry = False
                 except Exception as e:
                     raise RuntimeError("update retry failed")
-        if count_ == 3:
-            return recovery_callback[0](*recovery_callback[1])
+        return recovery_callback[0](*recovery_callback[1])
 
     return execute
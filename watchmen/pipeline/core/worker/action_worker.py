@@ -4,10 +4,20 @@ import time
 import traceback
 from functools import lru_cache
 
+from watchmen.config.config import settings
+from watchmen.pipeline.core.by.parse_on_parameter import parse_parameter_joint
+from watchmen.pipeline.core.context.action_context import get_variables
+from watchmen.pipeline.storage.topic_data_batch import current_batch
+from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
+
 PIPELINE_CORE_ACTION_ = "watchmen.pipeline.core.action."
 
 log = logging.getLogger("app." + __name__)
 
+PREFETCH_ACTION_TYPES = ["read-row", "read-rows", "read-factor", "read-factors", "exists"]
+
+DEFERRED_INSERT_ACTION_TYPES = ["insert-row"]
+
 
 @lru_cache(maxsize=16)
 def convert_action_type(action_type: str):
@@ -20,8 +30,10 @@ def get_action_func(action):
 
 
 def run_action(action_context):
-    action = action_context.action
-    stage_method = get_action_func(action)
+    if action_context.actionPlan is not None:
+        stage_method = action_context.actionPlan.module
+    else:
+        stage_method = get_action_func(action_context.action)
     func = stage_method.init(action_context)
     try:
         action_run_status, trigger_pipeline_data_list = func()
@@ -30,3 +42,51 @@ def run_action(action_context):
     except Exception as e:
         log.error(traceback.format_exc())
         raise e
+
+
+def __prefetch_lookups(batch, action_context_list):
+    action = action_context_list[0].action
+    target_topic = get_topic_by_id(action.topicId)
+    where_list = []
+    for action_context in action_context_list:
+        pipeline_topic = action_context.unitContext.stageContext.pipelineContext.pipelineTopic
+        variables = get_variables(action_context)
+        where_list.append(parse_parameter_joint(action.by, action_context.currentOfTriggerData, variables,
+                                                pipeline_topic, target_topic))
+    batch.prefetch(target_topic.name, where_list)
+
+
+def __evaluate_mappings(action_context_list):
+    mapping_batch = action_context_list[0].actionPlan.mapping_batch
+    previous_data_list = [action_context.previousOfTriggerData for action_context in action_context_list]
+    current_data_list = [action_context.currentOfTriggerData for action_context in action_context_list]
+    variables_list = [get_variables(action_context) for action_context in action_context_list]
+    for action_context, mapping_result in zip(action_context_list,
+                                              mapping_batch(previous_data_list, current_data_list, variables_list)):
+        action_context.mappingResult = mapping_result
+
+
+def run_action_batch(action_context_list):
+    """
+    run one action for all rows of micro-batch, the lookups of read actions are prefetched before
+    and the rows of insert-row action are flushed after the whole batch.
+    """
+    if not action_context_list:
+        return []
+    action = action_context_list[0].action
+    batch = current_batch.get()
+    if batch is not None:
+        if action.type in PREFETCH_ACTION_TYPES and action.by is not None:
+            __prefetch_lookups(batch, action_context_list)
+        batch.defer_inserts = action.type in DEFERRED_INSERT_ACTION_TYPES
+    action_plan = action_context_list[0].actionPlan
+    try:
+        if settings.PIPELINE_VECTORIZE_ON and action_plan is not None and action_plan.mapping_batch is not None \
+                and len(action_context_list) >= settings.PIPELINE_VECTORIZE_MIN_ROWS:
+            __evaluate_mappings(action_context_list)
+        return [run_action(action_context) for action_context in action_context_list]
+    finally:
+        if batch is not None:
+            batch.defer_inserts = False
+            batch.clear_lookups()
+            batch.flush_inserts()
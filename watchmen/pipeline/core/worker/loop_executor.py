@@ -0,0 +1,98 @@
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from watchmen.config.config import settings
+from watchmen.pipeline.core.context.action_context import ActionContext
+from watchmen.pipeline.core.dependency.unit_dependency import collect_joint_variables
+from watchmen.pipeline.core.worker.action_worker import run_action
+
+log = logging.getLogger("app." + __name__)
+
+# the actions which write pipeline variables. the elements of loop share one pipeline context,
+# so an element may read the variable written by another one, and the concurrent writes may be lost
+SEQUENTIAL_ACTION_TYPES = ["copy-to-memory", "read-row", "read-rows", "read-factor", "read-factors", "exists"]
+# the write actions which find target rows by "by" joint
+MERGE_ACTION_TYPES = ["insert-or-merge-row", "merge-row", "write-factor"]
+# the arithmetics which increase the target row by its current value
+AGGREGATE_ARITHMETICS = ["sum", "count", "avg"]
+
+LOOP_THREAD_NAME_PREFIX = "pipeline-loop"
+
+loop_executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_LOOP_WORKERS,
+                                   thread_name_prefix=LOOP_THREAD_NAME_PREFIX)
+
+
+def is_parallel_loop(unit_plan, values: list) -> bool:
+    if len(values) < 2 * settings.PIPELINE_LOOP_MIN_CHUNK_SIZE:
+        return False
+    if threading.current_thread().name.startswith(LOOP_THREAD_NAME_PREFIX):
+        # nested in a loop worker, waiting on the same pool may exhaust it
+        return False
+    loop_variable_name = unit_plan.unit.loopVariableName
+    return not any(__is_sequential_action(action_plan.action, loop_variable_name) for action_plan in unit_plan.actions)
+
+
+def __is_sequential_action(action, loop_variable_name: str) -> bool:
+    """
+    the elements of loop depend on each other when the action writes a variable,
+    or they may write the same row concurrently, when the row is aggregated,
+    or found by a "by" joint which is not on the loop variable, so all elements find the same row
+    """
+    if action.type in SEQUENTIAL_ACTION_TYPES or action.variableName:
+        return True
+    if action.type not in MERGE_ACTION_TYPES:
+        return False
+    if action.arithmetic in AGGREGATE_ARITHMETICS \
+            or any(mapping.arithmetic in AGGREGATE_ARITHMETICS for mapping in action.mapping or []):
+        return True
+    return loop_variable_name not in collect_joint_variables(action.by)
+
+
+def partition_loop(values: list, workers: int, min_chunk_size: int) -> list:
+    """
+    split the values into at most workers chunks in order, each chunk has at least min chunk size values
+    """
+    chunk_size = max(math.ceil(len(values) / workers), min_chunk_size)
+    return [values[index:index + chunk_size] for index in range(0, len(values), chunk_size)]
+
+
+def __run_chunk(unit_context, unit_plan, loop_variable_name: str, values: list) -> list:
+    """
+    run the whole unit for each value of chunk, return (action status list, trigger data list) of each value.
+    only the loop values are passed to worker, the contexts are shared in process and not serialized.
+    """
+    results = []
+    for value in values:
+        action_status_list = []
+        trigger_data_list = []
+        for action_plan in unit_plan.actions:
+            action_context = ActionContext(unit_context, action_plan.action, action_plan)
+            action_context.delegateVariableName = loop_variable_name
+            action_context.delegateValue = value
+            result, trigger_pipeline_data_list = run_action(action_context)
+            action_status_list.append(result.actionStatus)
+            if trigger_pipeline_data_list:
+                trigger_data_list.extend(trigger_pipeline_data_list)
+        results.append((action_status_list, trigger_data_list))
+    return results
+
+
+def run_loop_parallel(loop_variable_name: str, unit_context, unit_plan, values: list) -> list:
+    """
+    the chunks of loop values are run by worker threads, the results are returned in the order of values,
+    so the merged action status and trigger data are same as the sequential run.
+    the elements should be independent of each other, e.g. not write the same row.
+    """
+    chunks = partition_loop(values, settings.PIPELINE_LOOP_WORKERS, settings.PIPELINE_LOOP_MIN_CHUNK_SIZE)
+    futures = [loop_executor.submit(__run_chunk, unit_context, unit_plan, loop_variable_name, chunk)
+               for chunk in chunks]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+
+def run_loop_sequential(loop_variable_name: str, unit_context, unit_plan, values: list) -> list:
+    return __run_chunk(unit_context, unit_plan, loop_variable_name, values)
@@ -0,0 +1,76 @@
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from watchmen.config.config import settings
+from watchmen.pipeline.core.context.trigger_buffer import TriggerBuffer
+
+log = logging.getLogger("app." + __name__)
+
+PARALLEL_THREAD_NAME_PREFIX = "pipeline-parallel"
+
+parallel_executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_PARALLEL_WORKERS,
+                                       thread_name_prefix=PARALLEL_THREAD_NAME_PREFIX)
+
+
+def is_parallel_run(waves: list) -> bool:
+    if not settings.PIPELINE_PARALLEL_ON or all(len(wave) < 2 for wave in waves):
+        return False
+    # nested in a parallel worker, waiting on the same pool may exhaust it
+    return not threading.current_thread().name.startswith(PARALLEL_THREAD_NAME_PREFIX)
+
+
+def fork_pipeline_context(pipeline_context):
+    """
+    the fork starts with the variables of parent, the written variables and triggered data are kept in fork
+    """
+    forked = copy.copy(pipeline_context)
+    forked.triggerBuffer = TriggerBuffer()
+    return forked
+
+
+def join_pipeline_context(pipeline_context, forked, base_variables: dict):
+    """
+    merge the variables written by fork back to parent. set_variable replaces the variables of fork on write,
+    so the written ones are those not identical to the base variables which the fork was created with.
+    """
+    if forked.variables is base_variables:
+        return
+    written = {name: value for name, value in forked.variables.items()
+               if name not in base_variables or base_variables[name] is not value}
+    if written:
+        pipeline_context.variables = {**pipeline_context.variables, **written}
+
+
+def run_waves(pipeline_context, waves: list, run) -> dict:
+    """
+    run(index, forked pipeline context) for each index, waves one by one and the indexes of one wave concurrently.
+    the forks of a wave are created when it starts, so they see the variables written by earlier waves,
+    and the variables written by them are merged back in declaration order after the wave.
+    the first error in declaration order is raised after the whole wave is done.
+    return the forks by index, their triggered data are merged by caller with the run status.
+    """
+    forks = {}
+    for wave in waves:
+        base_variables = pipeline_context.variables
+        for index in wave:
+            forks[index] = fork_pipeline_context(pipeline_context)
+        errors = []
+        if len(wave) == 1:
+            try:
+                run(wave[0], forks[wave[0]])
+            except Exception as e:
+                errors.append(e)
+        else:
+            futures = [parallel_executor.submit(run, index, forks[index]) for index in wave]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+        for index in sorted(wave):
+            join_pipeline_context(pipeline_context, forks[index], base_variables)
+        if errors:
+            raise errors[0]
+    return forks
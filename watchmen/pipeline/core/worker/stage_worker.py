@@ -1,28 +1,61 @@
 import logging
 
-from watchmen.monitor.model.pipeline_monitor import UnitRunStatus
+from watchmen.monitor.model.pipeline_monitor import UnitRunStatus, StageRunStatus
 from watchmen.pipeline.core.context.stage_context import StageContext
 from watchmen.pipeline.core.context.unit_context import UnitContext
-from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter_joint
-from watchmen.pipeline.core.worker.unit_worker import run_unit
+from watchmen.pipeline.core.worker.parallel_executor import is_parallel_run, run_waves
+from watchmen.pipeline.core.worker.unit_worker import run_unit, run_unit_batch
 
 log = logging.getLogger("app." + __name__)
 
 
-def should_run(stageContext: StageContext) -> bool:
-    stage_ = stageContext.stage
-    if stage_.on is None:
+def should_run(stageContext: StageContext, condition) -> bool:
+    if condition is None:
         return True
     current_data = stageContext.pipelineContext.currentOfTriggerData
     variables = stageContext.pipelineContext.variables
-    return parse_parameter_joint(stage_.on, current_data, variables)
+    return condition(current_data, variables)
 
 
-def run_stage(stageContext: StageContext):
-    if should_run(stageContext):
-        stage = stageContext.stage
-        for unit in stage.units:
+def run_stage(stageContext: StageContext, stage_plan):
+    if should_run(stageContext, stage_plan.on):
+        if is_parallel_run(stage_plan.unit_waves):
+            run_units_parallel(stageContext, stage_plan)
+            return
+        for unit_plan in stage_plan.units:
             unit_run_status = UnitRunStatus()
-            unitContext = UnitContext(stageContext, unit, unit_run_status)
-            run_unit(unitContext)
+            unitContext = UnitContext(stageContext, unit_plan.unit, unit_run_status)
+            run_unit(unitContext, unit_plan)
             stageContext.stageStatus.units.append(unitContext.unitStatus)
+
+
+def run_units_parallel(stage_context: StageContext, stage_plan):
+    """
+    the independent units are run concurrently, each on a forked pipeline context.
+    unit status and triggered data are merged in declaration order.
+    """
+    unit_context_list = [None] * len(stage_plan.units)
+
+    def run(index, forked):
+        unit_plan = stage_plan.units[index]
+        unit_context_list[index] = UnitContext(StageContext(forked, stage_context.stage, stage_context.stageStatus),
+                                               unit_plan.unit, UnitRunStatus())
+        run_unit(unit_context_list[index], unit_plan)
+
+    forks = run_waves(stage_context.pipelineContext, stage_plan.unit_waves, run)
+    pipeline_context = stage_context.pipelineContext
+    for index, unit_context in enumerate(unit_context_list):
+        pipeline_context.triggerBuffer.extend(forks[index].triggerBuffer.drain())
+        stage_context.stageStatus.units.append(unit_context.unitStatus)
+
+
+def run_stage_batch(stage_plan, pipeline_context_list):
+    stage = stage_plan.stage
+    stage_context_list = []
+    for pipeline_context in pipeline_context_list:
+        stage_context = StageContext(pipeline_context, stage, StageRunStatus(name=stage.name))
+        pipeline_context.pipelineStatus.stages.append(stage_context.stageStatus)
+        if should_run(stage_context, stage_plan.on):
+            stage_context_list.append(stage_context)
+    for unit_plan in stage_plan.units:
+        run_unit_batch(unit_plan, stage_context_list)
@@ -0,0 +1,128 @@
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import watchmen
+from watchmen.common.constants import pipeline_constants
+from watchmen.config.config import settings
+from watchmen.pipeline.model.trigger_type import TriggerType
+
+log = logging.getLogger("app." + __name__)
+
+
+def get_unique_key_name() -> str:
+    if settings.STORAGE_ENGINE == "mongo":
+        return "_id"
+    else:
+        return "id_"
+
+
+class TriggerWave:
+    """
+    the trigger data written by the pipelines of one wave, grouped by topic in the order of first write.
+    the updates of same row are merged into one, the old value is the first one and the new value is the last one.
+    """
+
+    def __init__(self):
+        self.topics = OrderedDict()
+
+    def add(self, trigger_data):
+        topic = self.topics.setdefault(trigger_data.topicName, {TriggerType.update: OrderedDict(),
+                                                                TriggerType.insert: []})
+        data = trigger_data.data
+        if trigger_data.triggerType == TriggerType.update:
+            pk = data[pipeline_constants.OLD][get_unique_key_name()]
+            updates = topic[TriggerType.update]
+            if pk in updates:
+                updates[pk][pipeline_constants.NEW].update(data[pipeline_constants.NEW])
+            else:
+                updates[pk] = {pipeline_constants.NEW: dict(data[pipeline_constants.NEW]),
+                               pipeline_constants.OLD: data[pipeline_constants.OLD]}
+        elif trigger_data.triggerType == TriggerType.insert:
+            topic[TriggerType.insert].append(data)
+
+    def is_empty(self) -> bool:
+        return not self.topics
+
+    def size(self) -> int:
+        return sum(len(topic[TriggerType.update]) + len(topic[TriggerType.insert]) for topic in self.topics.values())
+
+
+class TriggerCascade:
+    """
+    run the downstream pipelines breadth first. the trigger data of all pipelines run in one wave are collected,
+    then the next wave is run by topic, until no data is written or max depth is reached.
+    """
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self.depth = 0
+        self.next_wave = TriggerWave()
+
+    def add(self, trigger_data_list: list):
+        for trigger_data in trigger_data_list:
+            self.next_wave.add(trigger_data)
+
+    def run(self):
+        while not self.next_wave.is_empty():
+            if self.depth >= self.max_depth:
+                log.error("pipeline trigger cascade reaches max depth {0}, {1} triggers of {2} are dropped".format(
+                    self.max_depth, self.next_wave.size(), list(self.next_wave.topics.keys())))
+                return
+            wave, self.next_wave = self.next_wave, TriggerWave()
+            self.depth = self.depth + 1
+            for topic_name, topic in wave.topics.items():
+                if topic[TriggerType.update]:
+                    self.__trigger(topic_name, list(topic[TriggerType.update].values()), TriggerType.update)
+                if topic[TriggerType.insert]:
+                    self.__trigger(topic_name, topic[TriggerType.insert], TriggerType.insert)
+
+    @staticmethod
+    def __trigger(topic_name: str, instances: list, trigger_type: TriggerType):
+        """
+        the rows are run one by one, so each row sees the rows written by the pipelines of rows before it.
+        they are run as micro-batch only when it is turned on, since the rows of a wave are not known to be
+        independent of each other.
+        """
+        if settings.PIPELINE_MICRO_BATCH_ON:
+            watchmen.pipeline.index.trigger_pipeline_batch(topic_name, instances, trigger_type)
+        else:
+            for instance in instances:
+                watchmen.pipeline.index.trigger_pipeline(topic_name, instance, trigger_type)
+
+
+current_cascade: ContextVar = ContextVar("current_cascade", default=None)
+
+
+@contextmanager
+def trigger_cascade():
+    """
+    the pipelines run in this block are the first wave, their downstream pipelines are run when the block exits.
+    nested blocks join the outer cascade.
+    """
+    if current_cascade.get() is not None:
+        yield
+        return
+    cascade = TriggerCascade(settings.PIPELINE_TRIGGER_MAX_DEPTH)
+    token = current_cascade.set(cascade)
+    try:
+        yield
+        cascade.run()
+    finally:
+        current_cascade.reset(token)
+
+
+def schedule_triggers(trigger_data_list: list):
+    """
+    add the trigger data to the next wave of current cascade, or run a cascade for them when not in one,
+    e.g. the pipeline is rerun directly.
+    """
+    if not trigger_data_list:
+        return
+    cascade = current_cascade.get()
+    if cascade is not None:
+        cascade.add(trigger_data_list)
+    else:
+        with trigger_cascade():
+            current_cascade.get().add(trigger_data_list)
@@ -1,96 +1,112 @@
 import logging
 
-from distributed import as_completed
-
-from watchmen.common.dask.client import get_dask_client
 from watchmen.config.config import settings
 from watchmen.monitor.model.pipeline_monitor import UnitRunStatus
 from watchmen.pipeline.core.context.action_context import ActionContext
 from watchmen.pipeline.core.context.unit_context import UnitContext
-from watchmen.pipeline.core.parameter.parse_parameter import parse_parameter_joint
-from watchmen.pipeline.core.worker.action_worker import run_action
+from watchmen.pipeline.core.worker.action_worker import run_action, run_action_batch
+from watchmen.pipeline.core.worker.loop_executor import is_parallel_loop, run_loop_parallel, run_loop_sequential
 
 log = logging.getLogger("app." + __name__)
 
 
-def should_run(unit_context: UnitContext) -> bool:
-    unit = unit_context.unit
-    if unit.on is None:
+def should_run(unit_context: UnitContext, condition) -> bool:
+    if condition is None:
         return True
     current_data = unit_context.stageContext.pipelineContext.currentOfTriggerData
     variables = unit_context.stageContext.pipelineContext.variables
-    return parse_parameter_joint(unit.on, current_data, variables)
+    return condition(current_data, variables)
 
 
-def run_unit(unit_context: UnitContext):
+def run_unit(unit_context: UnitContext, unit_plan):
     loop_variable_name = unit_context.unit.loopVariableName
     if loop_variable_name is not None and loop_variable_name != "":
         loop_variable = unit_context.stageContext.pipelineContext.variables[loop_variable_name]
         if isinstance(loop_variable, list):
-            if settings.DASK_ON:
-                run_loop_with_dask(loop_variable_name, unit_context)
+            if settings.PIPELINE_LOOP_PARALLEL_ON or settings.DASK_ON:
+                run_loop_in_chunks(loop_variable_name, unit_context, unit_plan)
             else:
-                run_loop_actions(loop_variable_name, unit_context)
+                run_loop_actions(loop_variable_name, unit_context, unit_plan)
         elif loop_variable is not None:  # the loop variable just have one element.
             if unit_context.unit.do is not None:
-                if should_run(unit_context):
+                if should_run(unit_context, unit_plan.on):
                     unit_context.unitStatus = UnitRunStatus()
-                    for action in unit_context.unit.do:
-                        action_context = ActionContext(unit_context, action)
+                    for action_plan in unit_plan.actions:
+                        action_context = ActionContext(unit_context, action_plan.action, action_plan)
                         action_context.delegateVariableName = loop_variable_name
                         action_context.delegateValue = loop_variable
                         result, trigger_pipeline_data_list = run_action(action_context)
                         if trigger_pipeline_data_list:
-                            unit_context.stageContext.pipelineContext.pipeline_trigger_merge_list = [
-                                *action_context.unitContext.stageContext.pipelineContext.pipeline_trigger_merge_list,
-                                *trigger_pipeline_data_list]
+                            unit_context.stageContext.pipelineContext.triggerBuffer.extend(trigger_pipeline_data_list)
                         unit_context.unitStatus.actions.append(result.actionStatus)
     else:
         if unit_context.unit.do is not None:
-            if should_run(unit_context):
+            if should_run(unit_context, unit_plan.on):
                 unit_context.unitStatus = UnitRunStatus()
-                for action in unit_context.unit.do:
-                    action_context = ActionContext(unit_context, action)
+                for action_plan in unit_plan.actions:
+                    action_context = ActionContext(unit_context, action_plan.action, action_plan)
                     result, trigger_pipeline_data_list = run_action(action_context)
                     if trigger_pipeline_data_list:
-                        unit_context.stageContext.pipelineContext.pipeline_trigger_merge_list = [
-                            *action_context.unitContext.stageContext.pipelineContext.pipeline_trigger_merge_list,
-                            *trigger_pipeline_data_list]
+                        unit_context.stageContext.pipelineContext.triggerBuffer.extend(trigger_pipeline_data_list)
                     unit_context.unitStatus.actions.append(result.actionStatus)
 
 
-def run_loop_actions(loop_variable_name, unit_context):
+def run_loop_actions(loop_variable_name, unit_context, unit_plan):
     for value in unit_context.stageContext.pipelineContext.variables[loop_variable_name]:
         if unit_context.unit.do is not None:
-            if should_run(unit_context):
+            if should_run(unit_context, unit_plan.on):
                 unit_context.unitStatus = UnitRunStatus()
-                for action in unit_context.unit.do:
-                    action_context = ActionContext(unit_context, action)
+                for action_plan in unit_plan.actions:
+                    action_context = ActionContext(unit_context, action_plan.action, action_plan)
                     action_context.delegateVariableName = loop_variable_name
                     action_context.delegateValue = value
                     result, trigger_pipeline_data_list = run_action(action_context)
                     if trigger_pipeline_data_list:
-                        unit_context.stageContext.pipelineContext.pipeline_trigger_merge_list = [
-                            *action_context.unitContext.stageContext.pipelineContext.pipeline_trigger_merge_list,
-                            *trigger_pipeline_data_list]
+                        unit_context.stageContext.pipelineContext.triggerBuffer.extend(trigger_pipeline_data_list)
                     unit_context.unitStatus.actions.append(result.actionStatus)
 
 
-def run_loop_with_dask(loop_variable_name, unit_context):
-    futures = []
-    for value in unit_context.stageContext.pipelineContext.variables[loop_variable_name]:
-        if unit_context.unit.do is not None:
-            if should_run(unit_context):
-                unit_context.unitStatus = UnitRunStatus()
-                for action in unit_context.unit.do:
-                    action_context = ActionContext(unit_context, action)
-                    action_context.delegateVariableName = loop_variable_name
-                    action_context.delegateValue = value
-                    futures.append(get_dask_client().submit(run_action, action_context))
-    for future in as_completed(futures):
-        result, trigger_pipeline_data_list = future.result()
+def run_loop_in_chunks(loop_variable_name, unit_context, unit_plan):
+    """
+    the loop values are split into chunks, each chunk runs the whole unit for its values on a worker thread.
+    results are merged in the order of values.
+    """
+    if unit_context.unit.do is None or not should_run(unit_context, unit_plan.on):
+        return
+    values = unit_context.stageContext.pipelineContext.variables[loop_variable_name]
+    if is_parallel_loop(unit_plan, values):
+        results = run_loop_parallel(loop_variable_name, unit_context, unit_plan, values)
+    else:
+        results = run_loop_sequential(loop_variable_name, unit_context, unit_plan, values)
+    unit_context.unitStatus = UnitRunStatus()
+    pipeline_context = unit_context.stageContext.pipelineContext
+    for action_status_list, trigger_pipeline_data_list in results:
         if trigger_pipeline_data_list:
-            unit_context.stageContext.pipelineContext.pipeline_trigger_merge_list = [
-                *action_context.unitContext.stageContext.pipelineContext.pipeline_trigger_merge_list,
-                *trigger_pipeline_data_list]
-        unit_context.unitStatus.actions.append(result.actionStatus)
+            pipeline_context.triggerBuffer.extend(trigger_pipeline_data_list)
+        unit_context.unitStatus.actions.extend(action_status_list)
+
+
+def run_unit_batch(unit_plan, stage_context_list):
+    """
+    run one unit for all rows of micro-batch, action by action.
+    the unit with loop variable depends on the variables of each row, so it is still run row by row.
+    """
+    unit = unit_plan.unit
+    unit_context_list = [UnitContext(stage_context, unit, UnitRunStatus()) for stage_context in stage_context_list]
+    loop_variable_name = unit.loopVariableName
+    if loop_variable_name is not None and loop_variable_name != "":
+        for unit_context in unit_context_list:
+            run_unit(unit_context, unit_plan)
+    elif unit.do is not None:
+        run_unit_context_list = [unit_context for unit_context in unit_context_list
+                                 if should_run(unit_context, unit_plan.on)]
+        for action_plan in unit_plan.actions:
+            action_context_list = [ActionContext(unit_context, action_plan.action, action_plan)
+                                   for unit_context in run_unit_context_list]
+            for result, trigger_pipeline_data_list in run_action_batch(action_context_list):
+                unit_context = result.unitContext
+                if trigger_pipeline_data_list:
+                    unit_context.stageContext.pipelineContext.triggerBuffer.extend(trigger_pipeline_data_list)
+                unit_context.unitStatus.actions.append(result.actionStatus)
+    for unit_context in unit_context_list:
+        unit_context.stageContext.stageStatus.units.append(unit_context.unitStatus)
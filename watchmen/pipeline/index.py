@@ -1,10 +1,15 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from watchmen.pipeline.core.index import trigger_pipeline_2
+from watchmen.config.config import settings
+from watchmen.pipeline.core.index import trigger_pipeline_2, trigger_pipeline_batch_2
 from watchmen.pipeline.model.trigger_type import TriggerType
 
 log = logging.getLogger("app." + __name__)
 
+pipeline_executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_ASYNC_WORKERS, thread_name_prefix="pipeline")
+
 
 def __match_trigger_type(trigger_type, pipeline):
     if trigger_type == TriggerType.insert and (pipeline.type == "insert-or-merge" or pipeline.type == "insert"):
@@ -19,3 +24,22 @@ def __match_trigger_type(trigger_type, pipeline):
 
 def trigger_pipeline(topic_name, instance, trigger_type: TriggerType, current_user=None):
     trigger_pipeline_2(topic_name, instance, trigger_type, current_user)
+
+
+def trigger_pipeline_batch(topic_name, instances: list, trigger_type: TriggerType, current_user=None):
+    trigger_pipeline_batch_2(topic_name, instances, trigger_type, current_user)
+
+
+async def trigger_pipeline_async(topic_name, instance, trigger_type: TriggerType, current_user=None):
+    """
+    run pipelines in worker thread, the event loop is free to accept other events while pipelines are running.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(pipeline_executor, trigger_pipeline_2, topic_name, instance, trigger_type,
+                               current_user)
+
+
+async def trigger_pipeline_batch_async(topic_name, instances: list, trigger_type: TriggerType, current_user=None):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(pipeline_executor, trigger_pipeline_batch_2, topic_name, instances, trigger_type,
+                               current_user)
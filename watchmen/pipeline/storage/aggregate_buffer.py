@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import watchmen
+from watchmen.config.config import settings
+from watchmen.database.storage.utils.aggregate_utils import merge_delta
+from watchmen.pipeline.storage.write_topic_data import merge_aggregate_topic_data
+
+log = logging.getLogger("app." + __name__)
+
+
+def build_where_key(where_: dict) -> str:
+    return json.dumps(where_, sort_keys=True, default=str)
+
+
+class PendingAggregate:
+    def __init__(self, topic_name: str, where_: dict, mapping_result: dict, pipeline_uid: str):
+        self.topic_name = topic_name
+        self.where = where_
+        self.mapping_result = mapping_result
+        self.pipeline_uid = pipeline_uid
+        self.merges = 1
+        self.attempts = 0
+        self.created = time.monotonic()
+
+
+class AggregateBuffer:
+    """
+    coalesce the writes to same aggregate row in process.
+
+    the mapping results of same (topic, where) are merged, _sum and _count are added up and _avg is weighted,
+    and written by one atomic update when the row is older than flush interval or merged max merges times.
+    the pending rows are bounded by max rows, the oldest one is written by caller when the buffer is full.
+    a failed write is merged back to the buffer and retried after flush interval, the delta is never dropped
+    silently, it is raised to the writer when max attempts are exhausted.
+    """
+
+    def __init__(self, flush_interval: float, max_merges: int, max_rows: int, max_attempts: int = 3):
+        self.flush_interval = flush_interval
+        self.max_merges = max_merges
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__run, name="aggregate-buffer-flush", daemon=True)
+        self.thread.start()
+
+    def add(self, topic_name: str, where_: dict, mapping_result: dict, pipeline_uid: str):
+        key = (topic_name, build_where_key(where_))
+        flush_list = []
+        with self.lock:
+            pending = self.pending.get(key)
+            if pending is None:
+                if len(self.pending) >= self.max_rows:
+                    flush_list.append(self.pending.popitem(last=False)[1])
+                self.pending[key] = PendingAggregate(topic_name, where_, {**mapping_result}, pipeline_uid)
+            else:
+                pending.mapping_result = merge_delta(pending.mapping_result, mapping_result)
+                pending.pipeline_uid = pipeline_uid
+                pending.merges = pending.merges + 1
+                if pending.merges >= self.max_merges:
+                    flush_list.append(self.pending.pop(key))
+        self.__write(flush_list)
+
+    def flush(self, expired_only: bool = False):
+        now = time.monotonic()
+        flush_list = []
+        with self.lock:
+            while self.pending:
+                key, pending = next(iter(self.pending.items()))
+                if expired_only and now - pending.created < self.flush_interval:
+                    # pending rows are in created order, the rest are not expired either
+                    break
+                flush_list.append(self.pending.pop(key))
+        self.__write(flush_list)
+
+    def shutdown(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        # the failed writes are merged back, flush until they are written or their attempts are exhausted
+        error = None
+        while self.pending:
+            try:
+                self.flush()
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+
+    def __run(self):
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush(expired_only=True)
+            except Exception as e:
+                log.exception(e)
+
+    def __requeue(self, failed: PendingAggregate):
+        """
+        merge the failed delta back, the delta added after it is merged on it, and the retry waits a flush interval
+        """
+        key = (failed.topic_name, build_where_key(failed.where))
+        with self.lock:
+            pending = self.pending.pop(key, None)
+            if pending is not None:
+                failed.mapping_result = merge_delta(failed.mapping_result, pending.mapping_result)
+                failed.pipeline_uid = pending.pipeline_uid
+                failed.merges = failed.merges + pending.merges
+            failed.created = time.monotonic()
+            self.pending[key] = failed
+
+    def __write(self, flush_list: list):
+        if not flush_list:
+            return
+        trigger_data_by_topic = {}
+        exhausted = []
+        for pending in flush_list:
+            try:
+                trigger_data = merge_aggregate_topic_data(pending.topic_name, pending.where, pending.mapping_result,
+                                                          pending.pipeline_uid)
+                trigger_data_by_topic.setdefault((pending.topic_name, trigger_data.triggerType), []).append(
+                    trigger_data.data)
+            except Exception:
+                pending.attempts = pending.attempts + 1
+                log.exception("aggregate buffer flush failed {0} times, topic {1} where {2} mapping {3}".format(
+                    pending.attempts, pending.topic_name, pending.where, pending.mapping_result))
+                if pending.attempts < self.max_attempts:
+                    self.__requeue(pending)
+                else:
+                    exhausted.append(pending)
+        for (topic_name, trigger_type), data_list in trigger_data_by_topic.items():
+            try:
+                if settings.PIPELINE_MICRO_BATCH_ON:
+                    watchmen.pipeline.index.trigger_pipeline_batch(topic_name, data_list, trigger_type)
+                else:
+                    for data in data_list:
+                        watchmen.pipeline.index.trigger_pipeline(topic_name, data, trigger_type)
+            except Exception as e:
+                log.exception(e)
+        if exhausted:
+            raise RuntimeError("aggregate buffer write failed after {0} attempts, the deltas are lost: {1}".format(
+                self.max_attempts, [(pending.topic_name, pending.where, pending.mapping_result)
+                                    for pending in exhausted]))
+
+
+aggregate_buffer: AggregateBuffer = None
+aggregate_buffer_lock = threading.Lock()
+
+
+def get_aggregate_buffer() -> AggregateBuffer:
+    global aggregate_buffer
+    if aggregate_buffer is None:
+        with aggregate_buffer_lock:
+            if aggregate_buffer is None:
+                buffer = AggregateBuffer(settings.AGGREGATE_BUFFER_FLUSH_INTERVAL,
+                                         settings.AGGREGATE_BUFFER_MAX_MERGES,
+                                         settings.AGGREGATE_BUFFER_MAX_ROWS,
+                                         settings.AGGREGATE_BUFFER_MAX_ATTEMPTS)
+                buffer.start()
+                aggregate_buffer = buffer
+    return aggregate_buffer
+
+
+def shutdown_aggregate_buffer():
+    if aggregate_buffer is not None:
+        aggregate_buffer.shutdown()
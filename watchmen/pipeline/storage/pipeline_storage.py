@@ -1,4 +1,4 @@
-from watchmen.common.cache.cache_manage import cacheman, PIPELINES_BY_TOPIC_ID, PIPELINE_BY_ID
+from watchmen.common.cache.cache_manage import cacheman, PIPELINES_BY_TOPIC_ID, PIPELINE_BY_ID, PIPELINE_PLAN_BY_ID
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 from watchmen.database.storage.storage_template import insert_one, update_one, find_, update_, delete_one, find_one
 from watchmen.pipeline.model.pipeline import Pipeline
@@ -21,6 +21,7 @@ def update_pipeline(pipeline: Pipeline) -> Pipeline:
     result = update_one(pipeline, Pipeline, PIPELINES)
     cacheman[PIPELINE_BY_ID].delete(result.pipelineId)
     cacheman[PIPELINES_BY_TOPIC_ID].delete(result.topicId)
+    cacheman[PIPELINE_PLAN_BY_ID].delete(result.pipelineId)
     return result
 
 
@@ -59,12 +60,14 @@ def update_pipeline_status(pipeline_id, enabled):
     update_({"pipelineId": pipeline_id}, {"enabled": enabled}, Pipeline, PIPELINES)
     cacheman[PIPELINE_BY_ID].delete(pipeline_id)
     cacheman[PIPELINES_BY_TOPIC_ID].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].delete(pipeline_id)
 
 
 def update_pipeline_name(pipeline_id, name):
     update_({"pipelineId": pipeline_id}, {"name": name}, Pipeline, PIPELINES)
     cacheman[PIPELINE_BY_ID].delete(pipeline_id)
     cacheman[PIPELINES_BY_TOPIC_ID].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].delete(pipeline_id)
 
 
 def load_pipeline_list(current_user):
@@ -91,3 +94,4 @@ def import_pipeline_to_db(pipeline):
     insert_one(pipeline, Pipeline, PIPELINES)
     cacheman[PIPELINE_BY_ID].clear()
     cacheman[PIPELINES_BY_TOPIC_ID].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
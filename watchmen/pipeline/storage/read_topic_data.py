@@ -1,9 +1,23 @@
 from watchmen.database.storage.storage_template import topic_data_find_one, topic_data_find_
+from watchmen.pipeline.storage.topic_data_batch import current_batch
+
+
+def __find_prefetched(where_, topic_name):
+    batch = current_batch.get()
+    if batch is None:
+        return None
+    return batch.find_prefetched(where_, topic_name)
 
 
 def query_topic_data(where_, topic_name):
+    rows = __find_prefetched(where_, topic_name)
+    if rows:
+        return dict(rows[0])
     return topic_data_find_one(where_, topic_name)
 
 
 def query_multiple_topic_data(where_, topic_name):
+    rows = __find_prefetched(where_, topic_name)
+    if rows:
+        return [dict(row) for row in rows]
     return topic_data_find_(where_, topic_name)
@@ -0,0 +1,118 @@
+import logging
+from contextvars import ContextVar
+
+from watchmen.database.storage.storage_template import topic_data_find_, topic_data_insert_
+
+log = logging.getLogger("app." + __name__)
+
+AND = "and"
+OR = "or"
+EQUALS = "="
+IN = "in"
+
+
+def parse_equals_condition(where_: dict):
+    """
+    get the factor names and values from where condition which just use "equals" operator, like:
+        {"name": {"=": "value"}}
+        {"and": [{"name1": {"=": "value1"}}, {"name2": {"=": "value2"}}]}
+
+    return None if the where condition has other operators or nested joints
+    """
+    if where_ is None:
+        return None
+    if len(where_) == 1 and AND in where_:
+        items = where_[AND]
+    else:
+        items = [where_]
+    names = []
+    values = []
+    for item in items:
+        if not isinstance(item, dict) or len(item) != 1:
+            return None
+        name, expression = next(iter(item.items()))
+        if name == AND or name == OR:
+            return None
+        if not isinstance(expression, dict) or list(expression.keys()) != [EQUALS]:
+            return None
+        value = expression[EQUALS]
+        if value is None or isinstance(value, (list, dict)):
+            return None
+        names.append(name)
+        values.append(value)
+    if len(names) == 0:
+        return None
+    return tuple(names), tuple(values)
+
+
+class TopicDataBatch:
+    """
+    topic data access of one micro-batch pipeline run.
+
+    the lookups of read actions are prefetched by one query for the whole batch,
+    and the rows of insert-row actions are written by one bulk insert per topic.
+    """
+
+    def __init__(self):
+        self.lookups = {}
+        self.inserts = {}
+        self.defer_inserts = False
+
+    def prefetch(self, topic_name, where_list: list):
+        key_names = None
+        key_values = []
+        for where_ in where_list:
+            condition = parse_equals_condition(where_)
+            if condition is None:
+                return
+            names, values = condition
+            if key_names is None:
+                key_names = names
+            elif key_names != names:
+                return
+            key_values.append(values)
+        if key_names is None:
+            return
+
+        distinct_values = list(dict.fromkeys(key_values))
+        if len(key_names) == 1:
+            batch_where = {key_names[0]: {IN: [values[0] for values in distinct_values]}}
+        else:
+            batch_where = {OR: [{AND: [{name: {EQUALS: value}} for name, value in zip(key_names, values)]}
+                                for values in distinct_values]}
+        rows = topic_data_find_(batch_where, topic_name)
+        lookup = {}
+        if rows is not None:
+            for row in rows:
+                key = tuple(row.get(name) for name in key_names)
+                lookup.setdefault(key, []).append(row)
+        self.lookups[topic_name] = (key_names, lookup)
+        log.debug("prefetch {0} rows of topic {1} for {2} lookups".format(
+            sum(len(rows_) for rows_ in lookup.values()), topic_name, len(where_list)))
+
+    def find_prefetched(self, where_, topic_name):
+        """
+        return the prefetched rows, or None when the rows should be queried from storage
+        """
+        if topic_name not in self.lookups:
+            return None
+        key_names, lookup = self.lookups[topic_name]
+        condition = parse_equals_condition(where_)
+        if condition is None or condition[0] != key_names:
+            return None
+        return lookup.get(condition[1])
+
+    def clear_lookups(self):
+        self.lookups = {}
+
+    def add_insert(self, topic_name, data):
+        self.inserts.setdefault(topic_name, []).append(data)
+
+    def flush_inserts(self):
+        inserts = self.inserts
+        self.inserts = {}
+        for topic_name, data_list in inserts.items():
+            topic_data_insert_(data_list, topic_name)
+
+
+current_batch: ContextVar = ContextVar("current_batch", default=None)
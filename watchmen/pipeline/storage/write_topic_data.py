@@ -1,12 +1,22 @@
+import logging
+
 from watchmen.common.constants import pipeline_constants
 from watchmen.common.utils.data_utils import get_id_name
+from watchmen.config.config import settings
+from watchmen.database.storage.exception.exception import InsertConflictError, OptimisticLockError
 from watchmen.database.storage.storage_template import topic_data_find_by_id, \
-    topic_data_insert_one, topic_data_update_, topic_data_update_one
+    topic_data_insert_one, topic_data_update_, topic_data_update_one, topic_data_upsert_one, \
+    topic_data_aggregate_one
 from watchmen.database.storage.storage_template import topic_data_update_one_with_version
+from watchmen.database.storage.utils.aggregate_utils import having_avg, merge_avg
+from watchmen.pipeline.core.retry.retry_template import RetryPolicy, retry_template
 from watchmen.pipeline.model.trigger_type import TriggerType
 from watchmen.pipeline.model.trigger_data import TriggerData
+from watchmen.pipeline.storage.topic_data_batch import current_batch
 from watchmen.pipeline.utils.units_func import add_audit_columns, add_trace_columns, INSERT, UPDATE
 
+log = logging.getLogger("app." + __name__)
+
 
 def __build_trigger_pipeline_data(topic_name: str, data, trigger_type):
     return TriggerData(topicName=topic_name, triggerType=trigger_type, data=data)
@@ -15,12 +25,88 @@ def __build_trigger_pipeline_data(topic_name: str, data, trigger_type):
 def insert_topic_data(topic_name, mapping_result, pipeline_uid):
     add_audit_columns(mapping_result, INSERT)
     add_trace_columns(mapping_result, "insert_row", pipeline_uid)
-    topic_data_insert_one(mapping_result, topic_name)
+    batch = current_batch.get()
+    if batch is not None and batch.defer_inserts:
+        batch.add_insert(topic_name, mapping_result)
+    else:
+        topic_data_insert_one(mapping_result, topic_name)
     return __build_trigger_pipeline_data(topic_name,
                                          {pipeline_constants.NEW: mapping_result, pipeline_constants.OLD: None},
                                          TriggerType.insert)
 
 
+def upsert_topic_data(topic_name, where, mapping_result, pipeline_uid):
+    insert_one = {**mapping_result}
+    add_audit_columns(insert_one, INSERT)
+    add_trace_columns(insert_one, "insert_row", pipeline_uid)
+    update_one = {**mapping_result}
+    add_audit_columns(update_one, UPDATE)
+    add_trace_columns(update_one, "update_row", pipeline_uid)
+    try:
+        old_data, data = topic_data_upsert_one(where, insert_one, update_one, topic_name)
+    except InsertConflictError:
+        # the row of same key is inserted by another writer after it is not found, update it this time
+        log.info("the upsert is conflicted with another insert, try again")
+        old_data, data = topic_data_upsert_one(where, insert_one, update_one, topic_name)
+    if old_data is None:
+        return __build_trigger_pipeline_data(topic_name,
+                                             {pipeline_constants.NEW: data, pipeline_constants.OLD: None},
+                                             TriggerType.insert)
+    else:
+        return __build_trigger_pipeline_data(topic_name,
+                                             {pipeline_constants.NEW: data, pipeline_constants.OLD: old_data},
+                                             TriggerType.update)
+
+
+def aggregate_topic_data(topic_name, where, mapping_result, pipeline_uid):
+    update_one = {**mapping_result}
+    add_audit_columns(update_one, UPDATE)
+    add_trace_columns(update_one, "update_row", pipeline_uid)
+    result = topic_data_aggregate_one(where, update_one, topic_name)
+    if result is None:
+        return None
+    old_data, data = result
+    return __build_trigger_pipeline_data(topic_name,
+                                         {pipeline_constants.NEW: data, pipeline_constants.OLD: old_data},
+                                         TriggerType.update)
+
+
+def __aggregate_retry_callback(topic_name, where, mapping_result, pipeline_uid):
+    trigger_data = aggregate_topic_data(topic_name, where, mapping_result, pipeline_uid)
+    if trigger_data is None:
+        raise OptimisticLockError("the row of {0} is not found to aggregate".format(topic_name))
+    return trigger_data
+
+
+def __aggregate_recovery_callback():
+    raise RuntimeError("The maximum number of retry times ({0}) is exceeded, retry failed".format(
+        settings.PIPELINE_RETRY_MAX_ATTEMPTS))
+
+
+def merge_aggregate_topic_data(topic_name, where, mapping_result, pipeline_uid):
+    """
+    increase the aggregate row in one atomic update, insert it when the row is not there.
+    when the insert is conflicted with another writer, retry the update with backoff.
+    the new row has a new id_, so the insert is conflicted only when the target table has a unique index
+    on the factors of "by" joint. without it, the concurrent first inserts of same key are not detected
+    and each of them creates a row, the later updates increase one of them.
+    """
+    trigger_data = aggregate_topic_data(topic_name, where, mapping_result, pipeline_uid)
+    if trigger_data is not None:
+        return trigger_data
+    insert_one = {**mapping_result}
+    if having_avg(insert_one):
+        insert_one = merge_avg({}, insert_one)
+    try:
+        return insert_topic_data(topic_name, insert_one, pipeline_uid)
+    except InsertConflictError:
+        log.info("the insert failed because of conflict, try to update operator")
+    retry_callback = (__aggregate_retry_callback, [topic_name, where, mapping_result, pipeline_uid])
+    recovery_callback = (__aggregate_recovery_callback, [])
+    execute_ = retry_template(retry_callback, recovery_callback, RetryPolicy())
+    return execute_()
+
+
 def update_topic_data(topic_name, mapping_result, target_data, pipeline_uid, mongo_query):
     old_data = topic_data_find_by_id(target_data[get_id_name()], topic_name)
     add_audit_columns(mapping_result, UPDATE)
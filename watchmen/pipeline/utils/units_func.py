@@ -7,6 +7,7 @@ import arrow
 from watchmen.common.constants import parameter_constants, pipeline_constants
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 from watchmen.topic.factor.factor import Factor
+from watchmen.topic.factor.factor_index import get_factor_index
 from watchmen.topic.topic import Topic
 
 log = logging.getLogger("app." + __name__)
@@ -189,22 +190,15 @@ def convert_date(value):
 
 
 def build_factor_dict(topic: Topic):
-    factor_dict = {}
-    for factor in topic.factors:
-        factor_dict[factor.factorId] = factor
-    return factor_dict
+    return dict(get_factor_index(topic).by_id)
 
 
 def get_factor(factor_id, target_topic):
-    for factor in target_topic.factors:
-        if factor.factorId == factor_id:
-            return factor
+    return get_factor_index(target_topic).by_id.get(factor_id)
 
 
 def get_factor_by_name(factor_name, target_topic):
-    for factor in target_topic.factors:
-        if factor.name == factor_name:
-            return factor
+    return get_factor_index(target_topic).by_name.get(factor_name)
 
 
 def get_execute_time(start_time):
@@ -1,15 +1,26 @@
+import asyncio
+import logging
 from typing import List
 
 from watchmen.common.constants import pipeline_constants
 from watchmen.common.utils.data_utils import is_raw
+from watchmen.config.config import settings
+from watchmen.database.storage.utils.bulk_utils import build_bulk_result
+from watchmen.pipeline.core.dispatch.dispatch_queue import get_dispatch_queue
 from watchmen.pipeline.core.parameter.utils import check_and_convert_value_by_factor
-from watchmen.pipeline.index import trigger_pipeline
+from watchmen.pipeline.index import trigger_pipeline_async, trigger_pipeline_batch_async
 from watchmen.pipeline.model.trigger_type import TriggerType
 from watchmen.pipeline.utils.units_func import INSERT, add_audit_columns
 from watchmen.topic.factor.factor import Factor
-from watchmen.topic.storage.topic_data_storage import save_topic_instance
+from watchmen.topic.factor.factor_index import get_factor_index
+from watchmen.topic.storage.topic_data_storage import save_topic_instance_async, save_topic_instances_bulk
 from watchmen.topic.storage.topic_schema_storage import get_topic
 
+log = logging.getLogger("app." + __name__)
+
+RECEIVED = "received"
+FAILED = "failed"
+
 
 async def import_raw_topic_data(topic_event, current_user):
     topic = get_topic(topic_event.code, current_user)
@@ -20,12 +31,121 @@ async def import_raw_topic_data(topic_event, current_user):
     if not isinstance(topic_event.data, dict):
         raise ValueError("topic_event data should be dict, now it is {0}".format(topic_event.data))
     '''
+    if settings.PIPELINE_DISPATCH_QUEUE_ON:
+        get_dispatch_queue().check_capacity()
     raw_data = await get_input_data(topic, topic_event)
     add_audit_columns(raw_data, INSERT)
-    flatten_fields = get_flatten_field(topic_event.data, topic.factors)
+    flatten_fields = get_flatten_field(topic_event.data, get_factor_index(topic).flatten_factors)
     raw_data.update(flatten_fields)
-    save_topic_instance(topic_event.code, raw_data)
-    __trigger_pipeline(topic_event, current_user)
+    await save_topic_instance_async(topic_event.code, raw_data)
+    await __trigger_pipeline(topic_event, current_user)
+
+
+def import_raw_topic_data_bulk(topic_name, data_list: list, current_user, chunk_size: int = None) -> dict:
+    """
+    the data are saved by bulk insert without triggering pipelines, the failed ones are reported by index
+    """
+    topic = get_topic(topic_name, current_user)
+    if topic is None:
+        raise Exception(topic_name + " topic name does not exist")
+    flatten_factors = get_factor_index(topic).flatten_factors
+    invalid = []
+    indexes = []
+    instances = []
+    for index, data in enumerate(data_list):
+        if not isinstance(data, dict):
+            invalid.append({"index": index, "error": "data should be dict"})
+            continue
+        if is_raw(topic):
+            instance = {"data_": data}
+        else:
+            instance = data
+        add_audit_columns(instance, INSERT)
+        instance.update(get_flatten_field(data, flatten_factors))
+        indexes.append(index)
+        instances.append(instance)
+    if instances:
+        result = save_topic_instances_bulk(topic_name, instances, chunk_size)
+    else:
+        result = build_bulk_result()
+    # the failures of bulk insert are by the position of saved instances, report them by the index of data
+    failed = invalid + [{**failure, "index": indexes[failure["index"]]} for failure in result["failed"]]
+    result["failed"] = sorted(failed, key=lambda failure: failure["index"])
+    return result
+
+
+def build_batch_status(index: int, status: str, error=None) -> dict:
+    result = {"index": index, "status": status}
+    if error is not None:
+        result["error"] = str(error)
+    return result
+
+
+async def import_raw_topic_data_batch(topic_events: list, current_user) -> list:
+    """
+    the events are grouped by topic, raw rows of each topic are saved by one bulk insert,
+    then pipelines are run over the saved events one by one, or as a micro-batch when it is turned on.
+    topic_events is a list of (index, topic event), the status of each event is returned by its index.
+    """
+    if settings.PIPELINE_DISPATCH_QUEUE_ON:
+        get_dispatch_queue().check_capacity()
+    statuses = {}
+    events_by_topic = {}
+    for index, topic_event in topic_events:
+        events_by_topic.setdefault(topic_event.code, []).append((index, topic_event))
+    loop = asyncio.get_running_loop()
+    for topic_name, events in events_by_topic.items():
+        topic = get_topic(topic_name, current_user)
+        if topic is None:
+            for index, _ in events:
+                statuses[index] = build_batch_status(index, FAILED, "topic \"{0}\" does not exist".format(topic_name))
+            continue
+        valid_events = []
+        instances = []
+        for index, topic_event in events:
+            if not isinstance(topic_event.data, dict):
+                statuses[index] = build_batch_status(index, FAILED, "data should be dict")
+                continue
+            raw_data = await get_input_data(topic, topic_event)
+            add_audit_columns(raw_data, INSERT)
+            raw_data.update(get_flatten_field(topic_event.data, get_factor_index(topic).flatten_factors))
+            valid_events.append((index, topic_event))
+            instances.append(raw_data)
+        if not instances:
+            continue
+        try:
+            result = await loop.run_in_executor(None, save_topic_instances_bulk, topic_name, instances)
+        except Exception as e:
+            log.exception(e)
+            for index, _ in valid_events:
+                statuses[index] = build_batch_status(index, FAILED, e)
+            continue
+        failed = {failure["index"]: failure["error"] for failure in result["failed"]}
+        saved_events = []
+        for position, (index, topic_event) in enumerate(valid_events):
+            if position in failed:
+                statuses[index] = build_batch_status(index, FAILED, failed[position])
+            else:
+                statuses[index] = build_batch_status(index, RECEIVED)
+                saved_events.append((index, topic_event))
+        # raw rows are saved, the pipeline error is reported on the saved events
+        if settings.PIPELINE_DISPATCH_QUEUE_ON or settings.PIPELINE_MICRO_BATCH_ON:
+            try:
+                await __trigger_pipeline_batch(topic_name, [
+                    {pipeline_constants.NEW: topic_event.data, pipeline_constants.OLD: None}
+                    for _, topic_event in saved_events], current_user)
+            except Exception as e:
+                log.exception(e)
+                for index, _ in saved_events:
+                    statuses[index]["error"] = str(e)
+        else:
+            for index, topic_event in saved_events:
+                try:
+                    await __trigger_pipeline(topic_event, current_user)
+                except Exception as e:
+                    log.exception(e)
+                    statuses[index]["error"] = str(e)
+    return [statuses[index] for index in sorted(statuses)]
 
 
 async def get_input_data( topic, topic_event):
@@ -36,9 +156,26 @@ async def get_input_data( topic, topic_event):
     return raw_data
 
 
-def __trigger_pipeline(topic_event, current_user):
-    trigger_pipeline(topic_event.code, {pipeline_constants.NEW: topic_event.data, pipeline_constants.OLD: None},
-                     TriggerType.insert, current_user)
+async def __trigger_pipeline(topic_event, current_user):
+    instance = {pipeline_constants.NEW: topic_event.data, pipeline_constants.OLD: None}
+    if settings.PIPELINE_DISPATCH_QUEUE_ON:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, get_dispatch_queue().submit, topic_event.code, [instance],
+                                   TriggerType.insert, current_user)
+    else:
+        await trigger_pipeline_async(topic_event.code, instance, TriggerType.insert, current_user)
+
+
+async def __trigger_pipeline_batch(topic_name, instances: list, current_user):
+    """
+    the instances are run as micro-batch only when it is turned on, otherwise the queue runs them one by one
+    """
+    if settings.PIPELINE_DISPATCH_QUEUE_ON:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, get_dispatch_queue().submit, topic_name, instances, TriggerType.insert,
+                                   current_user, settings.PIPELINE_MICRO_BATCH_ON)
+    else:
+        await trigger_pipeline_batch_async(topic_name, instances, TriggerType.insert, current_user)
 
 
 def get_flatten_field(data: dict, factors: List[Factor]):
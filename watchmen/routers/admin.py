@@ -22,6 +22,7 @@ from watchmen.common.security.pat.pat_service import createPAT, queryPAT, delete
 from watchmen.common.snowflake.snowflake import get_surrogate_key
 from watchmen.common.utils.data_utils import check_fake_id, add_tenant_id_to_model, \
     compare_tenant, clean_password
+from watchmen.config.config import settings
 from watchmen.console_space.storage.last_snapshot_storage import load_last_snapshot
 from watchmen.dashborad.model.dashborad import ConsoleDashboard
 from watchmen.dashborad.storage.dashborad_storage import load_dashboard_by_id
@@ -42,6 +43,8 @@ from watchmen.space.service.admin import create_space, update_space_by_id, sync_
 from watchmen.space.space import Space
 from watchmen.space.storage.space_storage import query_space_with_pagination, get_space_by_id, get_space_list_by_ids, \
     load_space_list_by_name, load_space_by_name
+from watchmen.topic.service.topic_index_service import build_topic_index_report, maintain_topic_indexes, \
+    ensure_pipeline_indexes
 from watchmen.topic.service.topic_service import create_topic_schema, update_topic_schema, build_topic
 from watchmen.topic.storage.topic_schema_storage import query_topic_list_with_pagination, get_topic_by_id, \
     get_topic_list_by_ids, load_all_topic_list, load_topic_list_by_name, load_all_topic, load_topic_by_name
@@ -321,9 +324,12 @@ async def load_user_list_by_name_list(name_list: List[str], current_user: User =
 async def save_pipeline(pipeline: Pipeline, current_user: User = Depends(deps.get_current_user)):
     pipeline = add_tenant_id_to_model(pipeline, current_user)
     if check_fake_id(pipeline.pipelineId):
-        return create_pipeline(pipeline)
+        result = create_pipeline(pipeline)
     else:
-        return update_pipeline(pipeline)
+        result = update_pipeline(pipeline)
+    if settings.TOPIC_INDEX_AUTO_CREATE:
+        ensure_pipeline_indexes(result, current_user)
+    return result
 
 
 @router.get("/pipeline", tags=["admin"], response_model=PipelineFlow)
@@ -372,6 +378,16 @@ async def save_pipeline_graph(pipeline_graph: PipelinesGraphics, current_user: U
         return update_pipeline_graph(pipeline_graph)
 
 
+@router.get("/topic/index/report", tags=["admin"])
+async def load_topic_index_report(current_user: User = Depends(deps.get_current_user)):
+    return build_topic_index_report(current_user)
+
+
+@router.post("/topic/index/maintain", tags=["admin"])
+async def maintain_topic_index(drop_unused: bool = False, current_user: User = Depends(deps.get_current_user)):
+    return maintain_topic_indexes(current_user, drop_unused)
+
+
 @router.get("/pipeline/graphics/delete", tags=["admin"])
 async def delete_pipeline_graph(pipeline_graph_id: str):
     remove_pipeline_graph(pipeline_graph_id)
@@ -3,8 +3,8 @@ from fastapi import APIRouter, Body, Depends
 from watchmen.auth.user import User
 from watchmen.common import deps
 from watchmen.common.cache.cache_manage import cacheman, TOPIC_BY_NAME, TOPIC_BY_ID, PIPELINE_BY_ID, \
-    PIPELINES_BY_TOPIC_ID, COLUMNS_BY_TABLE_NAME, TOPIC_DICT_BY_NAME
-from watchmen.database.storage.storage_template import clear_metadata
+    PIPELINES_BY_TOPIC_ID, COLUMNS_BY_TABLE_NAME, TOPIC_DICT_BY_NAME, PIPELINE_PLAN_BY_ID
+from watchmen.database.storage.storage_template import clear_metadata, clear_topic_table
 
 router = APIRouter()
 
@@ -30,6 +30,8 @@ def clear_topics_cache(current_user: User = Depends(deps.get_current_user)):
     cacheman[TOPIC_DICT_BY_NAME].clear()
     cacheman[TOPIC_BY_ID].clear()
     cacheman[COLUMNS_BY_TABLE_NAME].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
+    clear_topic_table()
 
 
 '''
@@ -48,6 +50,7 @@ def clear_pipelines_cache(topic_id, current_user: User = Depends(deps.get_curren
 def clear_pipelines_cache(current_user: User = Depends(deps.get_current_user)):
     cacheman[PIPELINES_BY_TOPIC_ID].clear()
     cacheman[PIPELINE_BY_ID].clear()
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
 
 
 '''
@@ -1,7 +1,9 @@
+import json
 import logging
 from typing import List, Any
 
-from fastapi import APIRouter, Depends, Body
+from fastapi import APIRouter, Depends, Body, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from watchmen.auth.service import tenant_service
@@ -21,14 +23,16 @@ from watchmen.database.mongo.index import delete_topic_collection
 from watchmen.database.storage.storage_template import clear_metadata, DataPage
 from watchmen.pipeline.core.context.pipeline_context import PipelineContext
 from watchmen.pipeline.core.dependency.caculate_dependency_new import pipelineExecutionPath
+from watchmen.pipeline.core.dispatch.dispatch_queue import DispatchQueueFullError
 from watchmen.pipeline.core.worker.pipeline_worker import run_pipeline
 from watchmen.pipeline.storage.pipeline_storage import load_pipeline_by_topic_id
 from watchmen.pipeline.utils.units_func import get_factor
-from watchmen.raw_data.service.import_raw_data import import_raw_topic_data
+from watchmen.raw_data.service.import_raw_data import import_raw_topic_data, import_raw_topic_data_bulk, \
+    import_raw_topic_data_batch, build_batch_status, FAILED
 from watchmen.report.engine.dataset_engine import get_factor_value_by_subject_and_condition
 from watchmen.report.model.filter import Filter
 from watchmen.topic.storage.topic_data_storage import find_topic_data_by_id_and_topic_name, \
-    update_topic_instance, get_topic_instances_all
+    update_topic_instance, get_topic_instances_all, iter_topic_instances_all
 from watchmen.topic.storage.topic_schema_storage import get_topic, get_topic_by_id
 
 router = APIRouter()
@@ -49,13 +53,84 @@ async def health():
 @router.post("/topic/data", tags=["common"])
 async def save_topic_data(topic_event: TopicEvent, current_user: User = Depends(deps.get_current_user)):
     # TODO user check URP
-    await import_raw_topic_data(topic_event, current_user)
+    try:
+        await import_raw_topic_data(topic_event, current_user)
+    except DispatchQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     # fire_and_forget(task)
     return {"received": True}
 
 
+async def __read_ndjson_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def __read_topic_event_items(request: Request):
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        async for line in __read_ndjson_lines(request):
+            yield line
+    else:
+        items = await request.json()
+        if not isinstance(items, list):
+            raise ValueError("body should be an array of topic events")
+        for item in items:
+            yield item
+
+
+@router.post("/topic/data/batch", tags=["common"])
+async def save_topic_data_batch(request: Request, topic_name: str = None,
+                                current_user: User = Depends(deps.get_current_user)):
+    """
+    accept an array of topic events, or one topic event per line when content type is application/x-ndjson.
+    topic name is used as the code of events which have no code.
+    returns the status of each event by its index.
+    """
+    statuses = []
+    topic_events = []
+    index = 0
+    async for item in __read_topic_event_items(request):
+        try:
+            topic_event = TopicEvent.parse_obj(json.loads(item) if isinstance(item, bytes) else item)
+            if topic_event.code is None:
+                topic_event.code = topic_name
+            if topic_event.code is None:
+                raise ValueError("code of topic event is missing")
+            topic_events.append((index, topic_event))
+        except Exception as e:
+            statuses.append(build_batch_status(index, FAILED, e))
+        index = index + 1
+    try:
+        statuses.extend(await import_raw_topic_data_batch(topic_events, current_user))
+    except DispatchQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return sorted(statuses, key=lambda status: status["index"])
+
+
+@router.post("/topic/data/import", tags=["common"])
+def import_topic_data(topic_name: str, data: List[Any] = Body(...), chunk_size: int = None,
+                      current_user: User = Depends(deps.get_current_user)):
+    # pipelines are not triggered, returns the inserted count and the failed rows by index
+    return import_raw_topic_data_bulk(topic_name, data, current_user, chunk_size)
+
+
+def __stream_topic_instances(topic_name):
+    for result in iter_topic_instances_all(topic_name):
+        yield TopicInstance(data=result).json() + "\n"
+
+
 @router.get("/topic/data/all", tags=["common"], response_model=List[TopicInstance])
-async def load_topic_instance(topic_name, current_user: User = Depends(deps.get_current_user)):
+async def load_topic_instance(topic_name, stream: bool = False, current_user: User = Depends(deps.get_current_user)):
+    if stream:
+        # one instance per line, rows are read by server side cursor and not loaded in memory at once
+        return StreamingResponse(__stream_topic_instances(topic_name), media_type="application/x-ndjson")
     results = get_topic_instances_all(topic_name)
     instances = []
     for result in results:
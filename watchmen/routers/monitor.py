@@ -1,3 +1,36 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from watchmen.auth.user import User
+from watchmen.common import deps
+from watchmen.connector.kafka.kafka_connector import get_kafka_consumer_stats
+from watchmen.database.storage.pool_monitor import get_pool_stats
+from watchmen.database.storage.utils.statement_cache import get_statement_cache_stats
+from watchmen.pipeline.core.context.trigger_buffer import get_trigger_buffer_stats
+from watchmen.pipeline.core.dispatch.dispatch_queue import get_dispatch_queue_stats
 
 router = APIRouter()
+
+
+@router.get("/monitor/pool", tags=["admin"])
+def load_pool_stats(current_user: User = Depends(deps.get_current_user)):
+    return get_pool_stats()
+
+
+@router.get("/monitor/statement-cache", tags=["admin"])
+def load_statement_cache_stats(current_user: User = Depends(deps.get_current_user)):
+    return get_statement_cache_stats()
+
+
+@router.get("/monitor/pipeline/dispatch", tags=["admin"])
+def load_dispatch_queue_stats(current_user: User = Depends(deps.get_current_user)):
+    return get_dispatch_queue_stats()
+
+
+@router.get("/monitor/kafka", tags=["admin"])
+def load_kafka_consumer_stats(current_user: User = Depends(deps.get_current_user)):
+    return get_kafka_consumer_stats()
+
+
+@router.get("/monitor/pipeline/trigger-buffer", tags=["admin"])
+def load_trigger_buffer_stats(current_user: User = Depends(deps.get_current_user)):
+    return get_trigger_buffer_stats()
@@ -0,0 +1,70 @@
+from functools import lru_cache
+from typing import List, Dict
+
+from watchmen.topic.factor.factor import Factor
+
+FACTOR_PATH_SEPARATOR = "."
+
+
+class FactorIndex:
+    """
+    dict indexes of topic factors by factor id and by factor name,
+    keep the first factor if the id or name is duplicated, same as the linear scan.
+    """
+    factors: List[Factor]
+    size: int
+    by_id: Dict[str, Factor]
+    by_name: Dict[str, Factor]
+    flatten_factors: List[Factor]
+
+    def __init__(self, factors: List[Factor]):
+        self.factors = factors
+        self.size = len(factors)
+        self.by_id = {}
+        self.by_name = {}
+        for factor in factors:
+            self.by_id.setdefault(factor.factorId, factor)
+            self.by_name.setdefault(factor.name, factor)
+        self.flatten_factors = [factor for factor in factors if factor.flatten]
+
+
+def get_factor_index(topic) -> FactorIndex:
+    """
+    the index is kept in topic, rebuild it when the factors of topic are replaced or changed
+    """
+    index = getattr(topic, "_factor_index", None)
+    if index is None or index.factors is not topic.factors or index.size != len(topic.factors):
+        index = FactorIndex(topic.factors)
+        topic._factor_index = index
+    return index
+
+
+class FactorNameIndex:
+    """
+    names of the factor dicts of topic kept by storage in declaration order, with their column names
+    """
+    names: tuple
+    columns: tuple
+
+    def __init__(self, factors: List[dict], to_column_name=str.lower):
+        self.names = tuple(factor['name'] for factor in factors)
+        self.columns = tuple((name, to_column_name(name)) for name in self.names)
+
+
+FACTOR_NAME_INDEX = "_factor_name_index"
+
+
+def get_factor_name_index(topic: dict, load_factors, to_column_name=str.lower) -> FactorNameIndex:
+    """
+    the index is kept in the cached topic dict, the dict is dropped from cache when topic is changed
+    """
+    index = topic.get(FACTOR_NAME_INDEX)
+    if index is None:
+        index = FactorNameIndex(load_factors(topic), to_column_name)
+        topic[FACTOR_NAME_INDEX] = index
+    return index
+
+
+@lru_cache(maxsize=2048)
+def get_factor_path(factor_name: str) -> tuple:
+    return tuple(factor_name.split(FACTOR_PATH_SEPARATOR))
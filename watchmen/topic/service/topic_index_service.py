@@ -0,0 +1,160 @@
+import hashlib
+import logging
+from typing import List
+
+from watchmen.database.storage.storage_template import topic_data_list_indexes, topic_data_create_index, \
+    topic_data_drop_index
+from watchmen.pipeline.model.pipeline import Pipeline
+from watchmen.pipeline.storage.pipeline_storage import load_pipeline_list
+from watchmen.pipeline.utils.units_func import get_factor
+from watchmen.topic.storage.topic_schema_storage import get_topic_by_id
+
+log = logging.getLogger("app." + __name__)
+
+# the actions which find rows of target topic by the "by" joint
+ACTION_TYPES_WITH_BY = ["insert-or-merge-row", "merge-row", "write-factor", "read-row", "read-rows", "read-factor",
+                        "read-factors", "exists"]
+
+# the operators which can be served by the leading columns of index
+INDEXED_OPERATORS = ["equals", "in"]
+
+# the indexes created by index service, others are never dropped
+INDEX_PREFIX = "idx_wm_"
+
+
+def build_index_name(topic_name: str, factor_names: list) -> str:
+    """
+    the name is unique in schema and short enough for oracle, which is 30 bytes before 12.2
+    """
+    key = "{0}:{1}".format(topic_name, ",".join(factor_names)).encode("utf-8")
+    return INDEX_PREFIX + hashlib.sha1(key).hexdigest()[:16]
+
+
+def __collect_by_factor_ids(joint, target_topic_id: str, factor_ids: list):
+    """
+    the factors of target topic compared by equals or in, or joint is skipped since one index cannot serve it
+    """
+    if joint is None:
+        return
+    if joint.jointType is not None:
+        if joint.jointType == "and":
+            for filter_ in joint.filters:
+                __collect_by_factor_ids(filter_, target_topic_id, factor_ids)
+    elif joint.operator in INDEXED_OPERATORS:
+        for parameter in [joint.left, joint.right]:
+            if parameter is not None and parameter.kind == "topic" and parameter.topicId == target_topic_id \
+                    and parameter.factorId not in factor_ids:
+                factor_ids.append(parameter.factorId)
+
+
+def derive_topic_indexes(pipelines: List[Pipeline], current_user=None) -> dict:
+    """
+    the factor names used by the "by" joints of enabled pipelines, grouped by target topic name
+    """
+    result = {}
+    topics = {}
+    for pipeline in pipelines:
+        if pipeline.enabled is False:
+            continue
+        for stage in pipeline.stages:
+            for unit in stage.units:
+                for action in unit.do:
+                    if action.type not in ACTION_TYPES_WITH_BY or action.by is None or action.topicId is None:
+                        continue
+                    factor_ids = []
+                    __collect_by_factor_ids(action.by, action.topicId, factor_ids)
+                    if not factor_ids:
+                        continue
+                    if action.topicId not in topics:
+                        topics[action.topicId] = get_topic_by_id(action.topicId, current_user)
+                    topic = topics[action.topicId]
+                    if topic is None or topic.type == "raw":
+                        continue
+                    factors = [get_factor(factor_id, topic) for factor_id in factor_ids]
+                    factor_names = tuple(factor.name for factor in factors if factor is not None)
+                    if factor_names:
+                        result.setdefault(topic.name, set()).add(factor_names)
+    return result
+
+
+def __is_covered(factor_names: tuple, index: dict) -> bool:
+    """
+    the index covers the lookup when its leading columns are the factors, in any order
+    """
+    columns = [column.lower() for column in index["columns"]]
+    return len(columns) >= len(factor_names) and \
+        set(columns[:len(factor_names)]) == {name.lower() for name in factor_names}
+
+
+def build_topic_index_report(current_user) -> list:
+    """
+    missing: the factors used by pipelines which are not covered by any index.
+    unused: the indexes created by index service which are not required by pipelines any more,
+    they can be dropped by index service.
+    idle: the other indexes never accessed, they are reported only and never dropped,
+    since the usage statistics is reset when database restarts and starts from zero for new indexes.
+    """
+    report = []
+    for topic_name, factor_names_set in derive_topic_indexes(load_pipeline_list(current_user), current_user).items():
+        indexes = topic_data_list_indexes(topic_name)
+        required = [list(factor_names) for factor_names in sorted(factor_names_set)]
+        missing = [factor_names for factor_names in required
+                   if not any(__is_covered(tuple(factor_names), index) for index in indexes)]
+        unused = []
+        idle = []
+        for index in indexes:
+            if index["name"].lower().startswith(INDEX_PREFIX):
+                if not any(__is_covered(tuple(factor_names), index) for factor_names in required):
+                    unused.append(index["name"])
+                    continue
+            if index["accesses"] == 0:
+                idle.append(index["name"])
+        report.append({"topicName": topic_name, "required": required, "missing": missing, "unused": unused,
+                       "idle": idle, "indexes": indexes})
+    return report
+
+
+def maintain_topic_indexes(current_user, drop_unused: bool = False) -> list:
+    """
+    create the missing indexes, and drop the unused ones created by index service when drop_unused is true
+    """
+    report = build_topic_index_report(current_user)
+    for item in report:
+        created = []
+        dropped = []
+        failed = []
+        for factor_names in item["missing"]:
+            index_name = build_index_name(item["topicName"], factor_names)
+            try:
+                topic_data_create_index(item["topicName"], index_name, factor_names)
+                created.append(index_name)
+            except Exception as e:
+                log.exception(e)
+                failed.append(index_name)
+        if drop_unused:
+            for index_name in item["unused"]:
+                try:
+                    topic_data_drop_index(item["topicName"], index_name)
+                    dropped.append(index_name)
+                except Exception as e:
+                    log.exception(e)
+                    failed.append(index_name)
+        item["created"] = created
+        item["dropped"] = dropped
+        item["failed"] = failed
+    return report
+
+
+def ensure_pipeline_indexes(pipeline: Pipeline, current_user):
+    """
+    create the indexes which are required by given pipeline and missing
+    """
+    for topic_name, factor_names_set in derive_topic_indexes([pipeline], current_user).items():
+        indexes = topic_data_list_indexes(topic_name)
+        for factor_names in factor_names_set:
+            if not any(__is_covered(factor_names, index) for index in indexes):
+                try:
+                    topic_data_create_index(topic_name, build_index_name(topic_name, list(factor_names)),
+                                            list(factor_names))
+                except Exception as e:
+                    log.exception(e)
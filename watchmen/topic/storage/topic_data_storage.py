@@ -1,5 +1,6 @@
+from watchmen.database.storage import async_storage_template
 from watchmen.database.storage.storage_template import topic_data_insert_one, topic_data_insert_, topic_data_update_one, \
-    topic_data_find_, topic_data_list_all, topic_data_find_by_id
+    topic_data_find_, topic_data_list_all, topic_data_find_by_id, topic_data_scan_, topic_data_insert_bulk
 from watchmen.topic.topic import Topic
 
 
@@ -7,10 +8,18 @@ def save_topic_instance(topic_name, instance):
     return topic_data_insert_one(instance, topic_name)
 
 
+async def save_topic_instance_async(topic_name, instance):
+    return await async_storage_template.topic_data_insert_one(instance, topic_name)
+
+
 def save_topic_instances(topic_name, instances):
     return topic_data_insert_(instances, topic_name)
 
 
+def save_topic_instances_bulk(topic_name, instances, chunk_size=None, chunk_bytes=None):
+    return topic_data_insert_bulk(instances, topic_name, chunk_size, chunk_bytes)
+
+
 def update_topic_instance(topic_name, instance, instance_id):
     return topic_data_update_one(instance_id, instance, topic_name)
 
@@ -23,6 +32,10 @@ def get_topic_instances_all(topic_name):
     return topic_data_list_all(topic_name)
 
 
+def iter_topic_instances_all(topic_name):
+    return topic_data_scan_(topic_name)
+
+
 def find_topic_data_by_id_and_topic_name(topic_name, object_id) -> Topic:
     return topic_data_find_by_id(object_id, topic_name)
 
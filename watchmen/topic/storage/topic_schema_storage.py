@@ -1,12 +1,13 @@
 from typing import List
 from watchmen.common.cache.cache_manage import cacheman, TOPIC_BY_ID, TOPIC_BY_NAME, COLUMNS_BY_TABLE_NAME, \
-    TOPIC_DICT_BY_NAME
+    TOPIC_DICT_BY_NAME, PIPELINE_PLAN_BY_ID
 from watchmen.common.data_page import DataPage
 from watchmen.common.pagination import Pagination
 from watchmen.common.utils.data_utils import build_collection_name
 from watchmen.database.storage.storage_interface import OrderType
 from watchmen.database.storage.storage_template import insert_one, update_one, find_one, \
-    page_, find_
+    page_, find_, clear_topic_table
+from watchmen.topic.factor.factor_index import get_factor_index
 from watchmen.topic.topic import Topic
 
 TOPICS = "topics"
@@ -64,12 +65,14 @@ def get_topic_by_id(topic_id: str, current_user=None) -> Topic:
     if current_user is None:
         result = find_one({"topicId": topic_id}, Topic, TOPICS)
         if result is not None:
+            get_factor_index(result)
             cacheman[TOPIC_BY_ID].set(topic_id, result)
         return result
 
     else:
         result = find_one({"and": [{"topicId": topic_id}, {"tenantId": current_user.tenantId}]}, Topic, TOPICS)
         if result is not None:
+            get_factor_index(result)
             cacheman[TOPIC_BY_ID].set(topic_id, result)
         return result
 
@@ -92,18 +95,29 @@ def query_topic_list_with_pagination(query_name: str, pagination: Pagination, cu
         return page_({"tenantId": current_user.tenantId}, sort_dict, pagination, Topic, TOPICS)
 
 
+def __clear_topic_cache(topic_id: str, topic_name: str):
+    cacheman[TOPIC_BY_NAME].delete(topic_name)
+    cacheman[TOPIC_DICT_BY_NAME].delete(topic_name)
+    cacheman[TOPIC_BY_ID].delete(topic_id)
+    cacheman[COLUMNS_BY_TABLE_NAME].delete(build_collection_name(topic_name))
+    # the reflected table is forgotten with its row decoders, and the statement cache is cleared
+    clear_topic_table(topic_name)
+
+
 def update_topic(topic_id: str, topic: Topic) -> Topic:
+    # the caches of old name are cleared too when topic is renamed
+    old_topic = find_one({"topicId": topic_id}, Topic, TOPICS)
     result = update_one(topic, Topic, TOPICS)
-    cacheman[TOPIC_BY_NAME].delete(topic.name)
-    cacheman[TOPIC_DICT_BY_NAME].delete(topic.name)
-    cacheman[TOPIC_BY_ID].delete(topic_id)
-    cacheman[COLUMNS_BY_TABLE_NAME].delete(build_collection_name(topic.name))
+    if old_topic is not None and old_topic.name != topic.name:
+        __clear_topic_cache(topic_id, old_topic.name)
+    __clear_topic_cache(topic_id, topic.name)
+    # the compiled pipelines keep the resolved factors of topic
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
     return result
 
 
 def import_topic_to_db(topic: Topic) -> Topic:
     insert_one(topic, Topic, TOPICS)
-    cacheman[TOPIC_BY_NAME].delete(topic.name)
-    cacheman[TOPIC_DICT_BY_NAME].delete(topic.name)
-    cacheman[TOPIC_BY_ID].delete(topic.topicId)
-    cacheman[COLUMNS_BY_TABLE_NAME].delete(build_collection_name(topic.name))
+    __clear_topic_cache(topic.topicId, topic.name)
+    # the compiled pipelines keep the resolved factors of topic
+    cacheman[PIPELINE_PLAN_BY_ID].clear()
@@ -1,8 +1,11 @@
 from enum import Enum
 from typing import List
 
+from pydantic import PrivateAttr
+
 from watchmen.common.watchmen_model import WatchmenModel
 from watchmen.topic.factor.factor import Factor
+from watchmen.topic.factor.factor_index import FactorIndex
 
 
 class TopicType(Enum):
@@ -25,6 +28,8 @@ class Topic(WatchmenModel):
     description: str = None
     tenantId: str = None
     # factorIds: list = []
+    # built by get_factor_index, not serialized
+    _factor_index: FactorIndex = PrivateAttr(default=None)
 
     '''
     indexKey : List[str] = None